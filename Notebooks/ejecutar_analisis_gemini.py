@@ -201,6 +201,131 @@ Ejemplo: "3|Media|Baja|Media|Pregunta ambigua sin contexto"
         else:
             return {'score': 0, 'claridad': 'Error', 'especificidad': 'Error', 'complejidad': 'Error', 'comentario': str(e)[:30]}
 
+# ===== ANÁLISIS FUSIONADO: categoría + calidad en UNA llamada JSON =====
+NIVELES = ["Alta", "Media", "Baja"]
+
+ESQUEMA_ANALISIS = {
+    "type": "object",
+    "properties": {
+        "categoria": {"type": "string", "enum": CATEGORIAS_TEMATICAS},
+        "score": {"type": "integer"},
+        "claridad": {"type": "string", "enum": NIVELES},
+        "especificidad": {"type": "string", "enum": NIVELES},
+        "complejidad": {"type": "string", "enum": NIVELES},
+        "comentario": {"type": "string"},
+    },
+    "required": ["categoria", "score", "claridad", "especificidad", "complejidad", "comentario"],
+}
+
+def validar_analisis(datos):
+    """
+    Valida la respuesta JSON contra ESQUEMA_ANALISIS y la normaliza.
+    Lanza ValueError si falta un campo o un valor está fuera del esquema.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError(f"Se esperaba un objeto JSON, llegó {type(datos).__name__}")
+    faltantes = [c for c in ESQUEMA_ANALISIS["required"] if c not in datos]
+    if faltantes:
+        raise ValueError(f"Campos faltantes: {faltantes}")
+
+    resultado = {}
+    for campo, regla in ESQUEMA_ANALISIS["properties"].items():
+        valor = datos[campo]
+        if regla["type"] == "integer":
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or int(valor) != valor:
+                raise ValueError(f"{campo} debe ser entero: {valor!r}")
+            valor = int(valor)
+        else:
+            valor = str(valor).strip()
+        if "enum" in regla and valor not in regla["enum"]:
+            # Tolera "3, Transacciones y Pagos" o mayúsculas distintas
+            candidatos = [e for e in regla["enum"] if e.lower() == valor.split(',', 1)[-1].strip().lower()]
+            if not candidatos:
+                raise ValueError(f"{campo} fuera del esquema: {valor!r}")
+            valor = candidatos[0]
+        resultado[campo] = valor
+
+    if not 1 <= resultado["score"] <= 5:
+        raise ValueError(f"score fuera de rango 1-5: {resultado['score']}")
+    resultado["comentario"] = resultado["comentario"][:50]
+    return resultado
+
+def analizar_pregunta_fusionada(pregunta):
+    """
+    Clasificación temática + análisis de calidad en una sola llamada con salida JSON.
+    No reintenta: los errores se propagan para que analizar_lote_fusionado re-encole.
+    """
+    prompt = f"""Analiza la siguiente pregunta de un usuario de banca.
+
+1. Clasifícala en UNA de estas categorías:
+{chr(10).join([f'- {cat}' for cat in CATEGORIAS_TEMATICAS])}
+
+2. Evalúa su calidad:
+- score: número del 1 (muy mala) al 5 (excelente)
+- claridad (¿se entiende qué pregunta?): Alta/Media/Baja
+- especificidad (¿tiene detalles suficientes?): Alta/Media/Baja
+- complejidad (¿qué tan compleja es la consulta?): Alta/Media/Baja
+- comentario: una frase corta (máximo 50 caracteres)
+
+Pregunta: "{pregunta}"
+
+Responde SOLO con un objeto JSON con las claves: categoria, score, claridad, especificidad, complejidad, comentario.
+Ejemplo: {{"categoria": "Transacciones y Pagos", "score": 3, "claridad": "Media", "especificidad": "Baja", "complejidad": "Media", "comentario": "Pregunta ambigua sin contexto"}}
+"""
+    response = model.generate_content(
+        prompt,
+        generation_config={"response_mime_type": "application/json", "response_schema": ESQUEMA_ANALISIS},
+    )
+    texto = response.text.strip()
+    if texto.startswith('```'):
+        texto = texto.strip('`').strip()
+        if texto.lower().startswith('json'):
+            texto = texto[4:].strip()
+    return validar_analisis(json.loads(texto))
+
+def analizar_lote_fusionado(preguntas, max_intentos=3, delay=0.5, espera_cuota=5, on_resultado=None):
+    """
+    Procesa {clave: pregunta} con una cola: cada fallo se re-encola al final
+    (sin recursión) hasta max_intentos. Ante un 429/cuota se pausa la cola con
+    backoff exponencial, ya que la cuota es compartida por todas las preguntas.
+
+    Returns:
+        dict: {clave: resultado}; los agotados llevan score 0 y valores 'Error'
+    """
+    from collections import deque
+
+    cola = deque((clave, pregunta, 1) for clave, pregunta in preguntas.items())
+    resultados = {}
+    pausas_cuota = 0
+    llamadas = 0
+
+    while cola:
+        clave, pregunta, intento = cola.popleft()
+        try:
+            llamadas += 1
+            resultados[clave] = analizar_pregunta_fusionada(pregunta)
+            pausas_cuota = 0
+        except Exception as e:
+            es_cuota = "429" in str(e) or "quota" in str(e).lower() or "ResourceExhausted" in type(e).__name__
+            if intento < max_intentos:
+                cola.append((clave, pregunta, intento + 1))
+                if es_cuota:
+                    wait_time = (2 ** pausas_cuota) * espera_cuota
+                    pausas_cuota += 1
+                    print(f"  ⏱️  Rate limit alcanzado, pausando la cola {wait_time}s ({len(cola)} pendientes)...")
+                    time.sleep(wait_time)
+            else:
+                motivo = 'Rate limit' if es_cuota else str(e)[:30]
+                print(f"  ❌ Sin resultado tras {max_intentos} intentos: {str(e)[:100]}")
+                resultados[clave] = {'categoria': 'Error: ' + motivo, 'score': 0, 'claridad': 'Error',
+                                     'especificidad': 'Error', 'complejidad': 'Error', 'comentario': motivo}
+        if clave in resultados and on_resultado:
+            on_resultado(clave, resultados[clave])
+        time.sleep(delay)
+
+    print(f"  📞 Llamadas al modelo: {llamadas} para {len(preguntas)} preguntas")
+    return resultados
+
 print(f"\n✅ Funciones de análisis IA configuradas")
 
 # ===== 4. TEST DE CONEXIÓN =====
@@ -211,11 +336,17 @@ print("="*80)
 test_pregunta = "¿Cómo puedo activar mi tarjeta de crédito?"
 print(f"\nPregunta de prueba: '{test_pregunta}'")
 
+# Modo fusionado: una sola llamada JSON por pregunta (la mitad de llamadas y de cuota)
+MODO_FUSIONADO = True
+
 try:
-    test_categoria = clasificar_pregunta_gemini(test_pregunta)
+    if MODO_FUSIONADO:
+        test_calidad = analizar_pregunta_fusionada(test_pregunta)
+        test_categoria = test_calidad['categoria']
+    else:
+        test_categoria = clasificar_pregunta_gemini(test_pregunta)
+        test_calidad = analizar_calidad_gemini(test_pregunta)
     print(f"✅ Categoría detectada: {test_categoria}")
-
-    test_calidad = analizar_calidad_gemini(test_pregunta)
     print(f"✅ Análisis de calidad:")
     print(f"   - Score: {test_calidad['score']}/5")
     print(f"   - Claridad: {test_calidad['claridad']}")
@@ -240,3 +371,4 @@ print(f"   3. El análisis procesará ~400 preguntas con Gemini 2.5 Flash")
 print(f"\n   Configuración actual: {GOOGLE_API_KEY[:10]}...***")
 print(f"   Modelo: gemini-2.5-flash")
 print(f"   Autenticación: {'Service Account' if USE_SERVICE_ACCOUNT else 'API Key'}")
+print(f"   Modo: {'Fusionado (1 llamada JSON por pregunta)' if MODO_FUSIONADO else 'Separado (2 llamadas por pregunta)'}")
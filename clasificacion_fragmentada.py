@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Clasificación fragmentada por hash de conversation_id en varias máquinas.
+
+Re-etiquetar un backlog grande (p. ej. el histórico tras cambiar SYSTEM_PROMPT)
+queda limitado por un solo proceso con la cuota de una sola credencial. Este
+módulo reparte el trabajo en N fragmentos estables:
+
+- preparar_corrida: el notebook escribe la corrida (manifest.json +
+  pendientes.csv) con el cuerpo del prompt de cada interacción (build_prompt
+  sin el SYSTEM_PROMPT, que va una sola vez en el manifest) y el fragmento de
+  cada conversation_id = crc32(id) % N. Todas las interacciones de una
+  conversación caen en el mismo fragmento, así que el orden dentro de la
+  conversación (merge por cumcount en la auditoría) se conserva.
+- trabajador: cada máquina procesa sólo su fragmento con sus propias
+  credenciales y su propio límite de solicitudes por minuto, y escribe un
+  archivo de resultados local al fragmento (reanudable: omite lo ya escrito).
+- combinar: une los fragmentos, verifica cobertura (sin faltantes ni
+  duplicados) y produce clasificacion_total en el orden de los pendientes.
+- simulador / prueba-local: servidor HTTP que imita el modelo (latencia y cuota
+  por credencial) para medir localmente cómo escala con varios procesos.
+
+Uso:
+    python clasificacion_fragmentada.py trabajador Archivos/Fragmentos/<corrida> --fragmento 0 --credenciales cuenta0.json [--max-por-minuto 60]
+    python clasificacion_fragmentada.py trabajador Archivos/Fragmentos/<corrida> --fragmento 1 --url http://localhost:8765 --api-key clave1
+    python clasificacion_fragmentada.py combinar Archivos/Fragmentos/<corrida>
+    python clasificacion_fragmentada.py simulador [--puerto 8765] [--latencia 0.05] [--max-por-minuto 600]
+    python clasificacion_fragmentada.py prueba-local [--trabajadores 1 2 4] [--filas 300]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+RUTA_CORRIDAS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Fragmentos'
+)
+COLUMNA_ID = 'fk_tbl_conversaciones_conecta2'
+ARCHIVO_MANIFEST = 'manifest.json'
+ARCHIVO_PENDIENTES = 'pendientes.csv'
+ARCHIVO_TOTAL = 'clasificacion_total.csv'
+COLUMNAS_RESULTADO = ['orden', 'conversation_id', 'category', 'rationale']
+
+MAX_POR_MINUTO_POR_DEFECTO = 60
+GCP_REGION_POR_DEFECTO = 'us-central1'
+MODELO_POR_DEFECTO = 'gemini-2.0-flash-001'
+
+
+class CuotaExcedida(Exception):
+    """El servicio del modelo rechazó la solicitud por cuota (429 / ResourceExhausted)."""
+
+
+# ============================================================
+# ASIGNACIÓN DE FRAGMENTOS
+# ============================================================
+
+def fragmento_de(ids, n_fragmentos):
+    """
+    Fragmento estable de cada conversation_id: crc32(str(id)) % n_fragmentos.
+
+    No depende del proceso, la máquina ni el orden de los datos.
+
+    Args:
+        ids: Iterable de conversation_id
+        n_fragmentos: Cantidad de fragmentos
+
+    Returns:
+        np.ndarray: Fragmento de cada id
+    """
+    ids = pd.Series(list(ids))
+    unicos = ids.drop_duplicates()
+    claves = unicos.map(lambda v: str(int(v)) if isinstance(v, (int, float, np.integer, np.floating)) else str(v))
+    mapa = dict(zip(unicos, [zlib.crc32(c.encode('utf-8')) % n_fragmentos for c in claves]))
+    return ids.map(mapa).to_numpy(dtype=np.int64)
+
+
+def _archivo_fragmento(ruta_corrida, fragmento, n_fragmentos):
+    return os.path.join(ruta_corrida, f'fragmento_{fragmento:03d}_de_{n_fragmentos:03d}.csv')
+
+
+# ============================================================
+# CORRIDA (notebook)
+# ============================================================
+
+def preparar_corrida(pendientes, n_fragmentos, construir_prompt, system_prompt, categorias, alias=None,
+                     resultados_locales=None, modelo=MODELO_POR_DEFECTO, region=GCP_REGION_POR_DEFECTO,
+                     nombre=None, ruta=RUTA_CORRIDAS, columna_id=COLUMNA_ID):
+    """
+    Escribe una corrida fragmentada a disco.
+
+    Args:
+        pendientes: DataFrame de interacciones a clasificar (en el orden en que se auditan)
+        n_fragmentos: Cantidad de trabajadores / fragmentos
+        construir_prompt: build_prompt del notebook (fila -> prompt completo)
+        system_prompt: SYSTEM_PROMPT (se guarda una vez; se quita del inicio de cada prompt)
+        categorias: Categorías válidas (VALID_CATEGORIES)
+        alias: CATEGORY_ALIASES
+        resultados_locales: Lista alineada con pendientes con {'category', 'rationale'} ya
+                            resueltos (pre-clasificador) o None para enviar al modelo
+        modelo, region: Modelo de Vertex AI que usan todos los trabajadores
+
+    Returns:
+        str: Ruta de la corrida
+    """
+    nombre = nombre or datetime.now().strftime('corrida_%Y%m%d_%H%M%S')
+    ruta_corrida = os.path.join(ruta, nombre)
+    os.makedirs(ruta_corrida, exist_ok=True)
+    if any(a.startswith('fragmento_') for a in os.listdir(ruta_corrida)):
+        raise ValueError(f"La corrida {ruta_corrida} ya tiene resultados de fragmentos; usar otro nombre")
+
+    filas = pendientes.to_dict(orient='records')
+    locales = resultados_locales if resultados_locales is not None else [None] * len(filas)
+    cuerpos = []
+    for fila, local in zip(filas, locales):
+        if local is not None:
+            cuerpos.append('')
+            continue
+        prompt = construir_prompt(fila)
+        cuerpos.append(prompt[len(system_prompt):] if prompt.startswith(system_prompt) else prompt)
+
+    tabla = pd.DataFrame({
+        'orden': np.arange(len(filas)),
+        'conversation_id': pendientes[columna_id].to_numpy(),
+        'fragmento': fragmento_de(pendientes[columna_id], n_fragmentos),
+        'cuerpo': cuerpos,
+        'category_local': [l['category'] if l is not None else None for l in locales],
+        'rationale_local': [l['rationale'] if l is not None else None for l in locales],
+    })
+    tabla.to_csv(os.path.join(ruta_corrida, ARCHIVO_PENDIENTES), index=False)
+
+    manifest = {
+        'nombre': nombre,
+        'creada': datetime.now().isoformat(timespec='seconds'),
+        'n_fragmentos': n_fragmentos,
+        'system_prompt': system_prompt,
+        'categorias': sorted(categorias),
+        'alias': alias or {},
+        'modelo': modelo,
+        'region': region,
+        'filas': len(tabla),
+        'filas_modelo': int((tabla['cuerpo'] != '').sum()),
+    }
+    with open(os.path.join(ruta_corrida, ARCHIVO_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    por_fragmento = tabla[tabla['cuerpo'] != ''].groupby('fragmento').size().reindex(range(n_fragmentos), fill_value=0)
+    print(f"✅ Corrida preparada: {ruta_corrida}")
+    print(f"   Filas: {len(tabla):,} | Al modelo: {manifest['filas_modelo']:,} | "
+          f"Por fragmento: min {por_fragmento.min():,} / max {por_fragmento.max():,}")
+    return ruta_corrida
+
+
+def cargar_corrida(ruta_corrida):
+    """
+    Returns:
+        tuple: (manifest dict, pendientes DataFrame)
+    """
+    with open(os.path.join(ruta_corrida, ARCHIVO_MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    pendientes = pd.read_csv(
+        os.path.join(ruta_corrida, ARCHIVO_PENDIENTES),
+        dtype={'cuerpo': str, 'category_local': str, 'rationale_local': str}, keep_default_na=False,
+    )
+    return manifest, pendientes
+
+
+def parsear_respuesta(texto, categorias, alias=None):
+    """
+    Interpreta el JSON del modelo (mismas reglas que parse_gemini_json + alias de categoría).
+
+    Returns:
+        tuple: (category, rationale)
+
+    Raises:
+        ValueError: JSON inválido o categoría fuera de las permitidas
+    """
+    limpio = texto.strip()
+    if limpio.startswith('```'):
+        limpio = limpio[3:].lstrip()
+        if limpio.lower().startswith('json'):
+            limpio = limpio[4:].lstrip()
+        if limpio.endswith('```'):
+            limpio = limpio[:-3]
+    if limpio.lower().startswith('json'):
+        limpio = limpio[4:].lstrip()
+    try:
+        datos = json.loads(limpio)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f'JSON inválido: {exc}') from exc
+    crudo = str(datos.get('category') or '').strip()
+    categoria = (alias or {}).get(crudo.lower(), crudo)
+    if categoria not in categorias:
+        raise ValueError(f'Categoría no válida recibida: {crudo}')
+    return categoria, str(datos.get('rationale') or '').strip()
+
+
+# ============================================================
+# CLIENTES DEL MODELO (trabajador)
+# ============================================================
+
+def cliente_vertex(credenciales, modelo=MODELO_POR_DEFECTO, region=GCP_REGION_POR_DEFECTO):
+    """
+    Cliente de Gemini en Vertex AI con la cuenta de servicio del trabajador.
+
+    Returns:
+        function: prompt -> texto de la respuesta
+    """
+    from google.api_core import exceptions
+    from google.oauth2 import service_account
+    import vertexai
+    from vertexai.generative_models import GenerativeModel
+
+    with open(credenciales, 'r') as f:
+        project_id = json.load(f).get('project_id')
+    vertexai.init(project=project_id, location=region,
+                  credentials=service_account.Credentials.from_service_account_file(credenciales))
+    model = GenerativeModel(modelo)
+
+    def generar(prompt):
+        try:
+            response = model.generate_content(prompt)
+        except exceptions.ResourceExhausted as exc:
+            raise CuotaExcedida(str(exc)) from exc
+        texto = ''
+        if response.candidates:
+            for part in response.candidates[0].content.parts:
+                if getattr(part, 'text', None):
+                    texto += part.text
+        return texto
+
+    return generar
+
+
+def cliente_http(url, api_key, timeout=60):
+    """
+    Cliente del servidor simulado (POST {"prompt"} -> {"text"}).
+
+    Returns:
+        function: prompt -> texto de la respuesta
+    """
+    def generar(prompt):
+        solicitud = urllib.request.Request(
+            url, data=json.dumps({'prompt': prompt}).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'X-Api-Key': api_key},
+        )
+        try:
+            with urllib.request.urlopen(solicitud, timeout=timeout) as respuesta:
+                return json.loads(respuesta.read().decode('utf-8'))['text']
+        except urllib.error.HTTPError as exc:
+            if exc.code == 429:
+                raise CuotaExcedida(f'429 para {api_key}') from exc
+            raise
+
+    return generar
+
+
+def _limitador(max_por_minuto):
+    return {'intervalo': 60.0 / max_por_minuto, 'siguiente': time.monotonic(), 'lock': threading.Lock()}
+
+
+def _esperar_turno(limitador):
+    """Espaciado uniforme de solicitudes compartido entre los hilos del trabajador."""
+    with limitador['lock']:
+        ahora = time.monotonic()
+        turno = max(ahora, limitador['siguiente'])
+        limitador['siguiente'] = turno + limitador['intervalo']
+    if turno > ahora:
+        time.sleep(turno - ahora)
+
+
+def _depurar_fragmento(archivo, pendientes, fragmento):
+    """
+    Reescribe el archivo del fragmento sin órdenes repetidos ni filas de otro fragmento.
+
+    Los duplicados aparecen si dos trabajadores corrieron el mismo fragmento a
+    la vez; como el archivo sólo se agrega, hay que limpiarlo al reanudar.
+
+    Returns:
+        set: Órdenes ya resueltos en el fragmento
+    """
+    if not os.path.exists(archivo):
+        return set()
+    resultados = pd.read_csv(archivo, keep_default_na=False)
+    propios = resultados['orden'].isin(pendientes.loc[pendientes['fragmento'] == fragmento, 'orden'])
+    limpios = resultados[propios & ~resultados['orden'].duplicated(keep='first')]
+    if len(limpios) < len(resultados):
+        limpios.to_csv(archivo + '.tmp', index=False)
+        os.replace(archivo + '.tmp', archivo)
+        print(f"🧹 {os.path.basename(archivo)}: {len(resultados) - len(limpios):,} filas duplicadas "
+              f"o de otro fragmento eliminadas")
+    return set(limpios['orden'])
+
+
+def ejecutar_fragmento(ruta_corrida, fragmento, generar, max_por_minuto=MAX_POR_MINUTO_POR_DEFECTO,
+                       hilos=4, max_intentos=3, espera_cuota=30.0):
+    """
+    Clasifica las filas de un fragmento y las agrega a su archivo de resultados.
+
+    Las filas ya presentes en el archivo del fragmento se omiten (reanudable);
+    al empezar se quitan del archivo los órdenes repetidos y las filas de otro
+    fragmento. Las filas que agotan los intentos quedan fuera y se reportan;
+    volver a ejecutar el trabajador las reintenta. Debe haber un solo
+    trabajador por fragmento a la vez.
+
+    Args:
+        ruta_corrida: Carpeta de la corrida
+        fragmento: Número de fragmento de este trabajador
+        generar: Función prompt -> texto (cliente_vertex / cliente_http)
+        max_por_minuto: Límite de solicitudes de esta credencial
+        hilos: Solicitudes concurrentes (el límite por minuto se comparte)
+
+    Returns:
+        dict: fragmento, procesadas, fallidas, omitidas, segundos
+    """
+    manifest, pendientes = cargar_corrida(ruta_corrida)
+    n_fragmentos = manifest['n_fragmentos']
+    if not 0 <= fragmento < n_fragmentos:
+        raise ValueError(f'Fragmento {fragmento} fuera de rango (0..{n_fragmentos - 1})')
+
+    archivo = _archivo_fragmento(ruta_corrida, fragmento, n_fragmentos)
+    hechas = _depurar_fragmento(archivo, pendientes, fragmento)
+    propias = pendientes[(pendientes['fragmento'] == fragmento) & (pendientes['cuerpo'] != '')]
+    tareas = propias[~propias['orden'].isin(hechas)]
+    print(f"🔹 Fragmento {fragmento}/{n_fragmentos}: {len(propias):,} filas, "
+          f"{len(propias) - len(tareas):,} ya hechas, {len(tareas):,} por procesar")
+
+    categorias, alias = set(manifest['categorias']), manifest['alias']
+    limitador = _limitador(max_por_minuto)
+    lock_archivo = threading.Lock()
+    estado = {'procesadas': 0, 'fallidas': []}
+
+    def procesar(fila):
+        prompt = manifest['system_prompt'] + fila['cuerpo']
+        ultimo_error = None
+        for intento in range(max_intentos):
+            _esperar_turno(limitador)
+            try:
+                categoria, rationale = parsear_respuesta(generar(prompt), categorias, alias)
+            except CuotaExcedida as exc:
+                ultimo_error = exc
+                time.sleep(espera_cuota)
+                continue
+            except Exception as exc:
+                ultimo_error = exc
+                time.sleep(min(2.0 * (intento + 1), espera_cuota))
+                continue
+            with lock_archivo:
+                pd.DataFrame([[fila['orden'], fila['conversation_id'], categoria, rationale]],
+                             columns=COLUMNAS_RESULTADO).to_csv(
+                    archivo, mode='a', header=not os.path.exists(archivo), index=False)
+                estado['procesadas'] += 1
+            return
+        with lock_archivo:
+            estado['fallidas'].append((fila['orden'], str(ultimo_error)))
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        list(executor.map(procesar, tareas.to_dict(orient='records')))
+    segundos = time.monotonic() - inicio
+
+    print(f"✅ Fragmento {fragmento}: {estado['procesadas']:,} procesadas, "
+          f"{len(estado['fallidas']):,} fallidas en {segundos:.1f}s")
+    for orden, error in estado['fallidas'][:5]:
+        print(f"   ⚠️  orden {orden}: {error}")
+    return {'fragmento': fragmento, 'procesadas': estado['procesadas'], 'fallidas': len(estado['fallidas']),
+            'omitidas': len(propias) - len(tareas), 'segundos': round(segundos, 2)}
+
+
+# ============================================================
+# COMBINACIÓN
+# ============================================================
+
+def combinar_fragmentos(ruta_corrida, forzar=False, guardar=True):
+    """
+    Une los archivos de fragmentos y verifica cobertura.
+
+    Cada fila de pendientes debe tener exactamente un resultado (del modelo o
+    local) y cada resultado debe venir del fragmento que le corresponde.
+
+    Args:
+        ruta_corrida: Carpeta de la corrida
+        forzar: Si True, combina aunque haya faltantes (quedan fuera) o duplicados (se deja el primero)
+        guardar: Escribir clasificacion_total.csv en la corrida
+
+    Returns:
+        tuple: (clasificacion_total DataFrame conversation_id/category/rationale, cobertura dict)
+
+    Raises:
+        ValueError: Faltantes, duplicados o resultados en el fragmento equivocado (sin forzar)
+    """
+    manifest, pendientes = cargar_corrida(ruta_corrida)
+    n_fragmentos = manifest['n_fragmentos']
+
+    partes, sin_archivo = [], []
+    for k in range(n_fragmentos):
+        archivo = _archivo_fragmento(ruta_corrida, k, n_fragmentos)
+        if os.path.exists(archivo):
+            partes.append(pd.read_csv(archivo, keep_default_na=False).assign(fragmento_archivo=k))
+        else:
+            sin_archivo.append(k)
+    modelo = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_RESULTADO + ['fragmento_archivo'])
+
+    locales = pendientes.loc[pendientes['cuerpo'] == '', ['orden', 'conversation_id', 'category_local', 'rationale_local']]
+    locales = locales.rename(columns={'category_local': 'category', 'rationale_local': 'rationale'})
+
+    esperado = pendientes.set_index('orden')['fragmento']
+    mal_ubicadas = int((modelo['fragmento_archivo'].to_numpy() != esperado.reindex(modelo['orden']).to_numpy()).sum())
+    duplicadas = modelo['orden'].duplicated(keep='first')
+    resultados = pd.concat([locales, modelo.loc[~duplicadas, COLUMNAS_RESULTADO]], ignore_index=True)
+    faltantes = pendientes.loc[~pendientes['orden'].isin(resultados['orden'])]
+
+    cobertura = {
+        'filas': len(pendientes),
+        'locales': len(locales),
+        'del_modelo': int((~duplicadas).sum()),
+        'faltantes': len(faltantes),
+        'duplicadas': int(duplicadas.sum()),
+        'mal_ubicadas': mal_ubicadas,
+        'fragmentos_sin_archivo': sin_archivo,
+        'conversaciones_faltantes': int(faltantes['conversation_id'].nunique()),
+    }
+    print(f"📊 Cobertura: {cobertura['locales'] + cobertura['del_modelo']:,}/{cobertura['filas']:,} filas | "
+          f"faltantes {cobertura['faltantes']:,} | duplicadas {cobertura['duplicadas']:,} | "
+          f"mal ubicadas {mal_ubicadas:,}")
+    if sin_archivo:
+        print(f"   ⚠️  Fragmentos sin archivo: {sin_archivo}")
+
+    if (cobertura['faltantes'] or cobertura['duplicadas'] or mal_ubicadas) and not forzar:
+        raise ValueError(
+            f"Cobertura incompleta en {ruta_corrida}: {cobertura['faltantes']} faltantes, "
+            f"{cobertura['duplicadas']} duplicadas, {mal_ubicadas} mal ubicadas. "
+            f"Reejecutar (uno por fragmento) los trabajadores de los fragmentos afectados: al reanudar "
+            f"procesan las faltantes y limpian duplicadas/mal ubicadas de su archivo. O usar forzar=True."
+        )
+
+    clasificacion_total = (
+        resultados.sort_values('orden', kind='stable')
+        [['conversation_id', 'category', 'rationale']]
+        .reset_index(drop=True)
+    )
+    if guardar:
+        clasificacion_total.to_csv(os.path.join(ruta_corrida, ARCHIVO_TOTAL), index=False)
+        print(f"💾 {os.path.join(ruta_corrida, ARCHIVO_TOTAL)}")
+    return clasificacion_total, cobertura
+
+
+# ============================================================
+# SERVIDOR SIMULADO Y PRUEBA LOCAL
+# ============================================================
+
+def servidor_simulado(puerto=8765, latencia=0.05, max_por_minuto=600, categorias=None):
+    """
+    Servidor HTTP que imita al modelo: latencia fija y cuota por X-Api-Key.
+
+    Responde JSON válido con una categoría determinística por prompt. Si una
+    clave supera max_por_minuto en una ventana deslizante de 60 s responde 429.
+
+    Returns:
+        ThreadingHTTPServer: Servidor (usar serve_forever / shutdown)
+    """
+    categorias = sorted(categorias or ['Pregunta valida', 'Sin información', 'Pregunta no valida', 'Solicitud Paso Experto'])
+    ventanas, lock = {}, threading.Lock()
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_POST(self):
+            clave = self.headers.get('X-Api-Key', '')
+            ahora = time.monotonic()
+            with lock:
+                ventana = ventanas.setdefault(clave, deque())
+                while ventana and ahora - ventana[0] > 60:
+                    ventana.popleft()
+                excedida = len(ventana) >= max_por_minuto
+                if not excedida:
+                    ventana.append(ahora)
+            cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if excedida:
+                self.send_response(429)
+                self.end_headers()
+                return
+            time.sleep(latencia)
+            prompt = json.loads(cuerpo.decode('utf-8'))['prompt']
+            categoria = categorias[zlib.crc32(prompt.encode('utf-8')) % len(categorias)]
+            texto = json.dumps({'conversation_id': 0, 'category': categoria, 'rationale': 'Respuesta simulada'})
+            salida = json.dumps({'text': texto}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(salida)))
+            self.end_headers()
+            self.wfile.write(salida)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+
+
+def prueba_local(trabajadores=(1, 2, 4), filas=300, conversaciones=None, max_por_minuto=600, latencia=0.05,
+                 puerto=8765, ruta=RUTA_CORRIDAS):
+    """
+    Mide el tiempo de re-etiquetado con 1..N procesos trabajadores contra el servidor simulado.
+
+    Cada proceso usa su propia clave (cuota independiente) y su límite por
+    minuto; con la cuota como cuello de botella el tiempo debe bajar ~1/N.
+
+    El fragmento más cargado (max_filas_fragmento) y el arranque de cada
+    proceso explican la diferencia con la aceleración ideal.
+
+    Returns:
+        DataFrame: trabajadores, segundos, filas_por_segundo, max_filas_fragmento, aceleracion
+    """
+    servidor = servidor_simulado(puerto, latencia, max_por_minuto)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{puerto}'
+
+    rng = np.random.default_rng(0)
+    pendientes = pd.DataFrame({
+        COLUMNA_ID: rng.integers(1, conversaciones or max(filas // 3, 1) + 1, filas),
+        'pregunta': [f'pregunta {i}' for i in range(filas)],
+    })
+    system_prompt = 'Clasifica la interacción.\n\n'
+    mediciones = []
+    try:
+        for n in trabajadores:
+            anterior = os.path.join(ruta, f'prueba_local_{n}')
+            for archivo in (os.listdir(anterior) if os.path.isdir(anterior) else []):
+                if archivo.startswith('fragmento_'):
+                    os.remove(os.path.join(anterior, archivo))
+            ruta_corrida = preparar_corrida(
+                pendientes, n, lambda f: f"{system_prompt}Pregunta: {f['pregunta']}", system_prompt,
+                ['Pregunta valida', 'Sin información', 'Pregunta no valida', 'Solicitud Paso Experto'],
+                nombre=f'prueba_local_{n}', ruta=ruta,
+            )
+            inicio = time.monotonic()
+            procesos = [
+                subprocess.Popen([sys.executable, os.path.abspath(__file__), 'trabajador', ruta_corrida,
+                                  '--fragmento', str(k), '--url', url, '--api-key', f'clave_{k}',
+                                  '--max-por-minuto', str(max_por_minuto)],
+                                 stdout=subprocess.DEVNULL)
+                for k in range(n)
+            ]
+            codigos = [p.wait() for p in procesos]
+            segundos = time.monotonic() - inicio
+            if any(codigos):
+                raise RuntimeError(f'Trabajadores con error: {codigos}')
+            total, _ = combinar_fragmentos(ruta_corrida)
+            _, tabla = cargar_corrida(ruta_corrida)
+            mediciones.append({'trabajadores': n, 'segundos': round(segundos, 2),
+                               'filas_por_segundo': round(len(total) / segundos, 1),
+                               'max_filas_fragmento': int(tabla['fragmento'].value_counts().max())})
+    finally:
+        servidor.shutdown()
+
+    resultado = pd.DataFrame(mediciones)
+    resultado['aceleracion'] = (resultado['segundos'].iloc[0] / resultado['segundos']).round(2)
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clasificación fragmentada por hash de conversation_id')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_t = sub.add_parser('trabajador', help='Procesa un fragmento con sus propias credenciales')
+    p_t.add_argument('corrida', help='Carpeta de la corrida (manifest.json + pendientes.csv)')
+    p_t.add_argument('--fragmento', type=int, required=True)
+    p_t.add_argument('--credenciales', help='Cuenta de servicio de Vertex AI de este trabajador')
+    p_t.add_argument('--url', help='Servidor compatible (p. ej. el simulador) en lugar de Vertex AI')
+    p_t.add_argument('--api-key', default='')
+    p_t.add_argument('--max-por-minuto', type=float, default=MAX_POR_MINUTO_POR_DEFECTO)
+    p_t.add_argument('--hilos', type=int, default=4)
+
+    p_c = sub.add_parser('combinar', help='Une los fragmentos y verifica cobertura')
+    p_c.add_argument('corrida')
+    p_c.add_argument('--forzar', action='store_true')
+
+    p_s = sub.add_parser('simulador', help='Servidor que imita al modelo (latencia + cuota por clave)')
+    p_s.add_argument('--puerto', type=int, default=8765)
+    p_s.add_argument('--latencia', type=float, default=0.05)
+    p_s.add_argument('--max-por-minuto', type=int, default=600)
+
+    p_p = sub.add_parser('prueba-local', help='Mide la escala con varios procesos contra el simulador')
+    p_p.add_argument('--trabajadores', type=int, nargs='+', default=[1, 2, 4])
+    p_p.add_argument('--filas', type=int, default=300)
+    p_p.add_argument('--max-por-minuto', type=int, default=600)
+    p_p.add_argument('--puerto', type=int, default=8765)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("CLASIFICACIÓN FRAGMENTADA")
+    print("=" * 80)
+
+    if args.comando == 'trabajador':
+        manifest, _ = cargar_corrida(args.corrida)
+        if args.url:
+            generar = cliente_http(args.url, args.api_key)
+        elif args.credenciales:
+            generar = cliente_vertex(args.credenciales, manifest['modelo'], manifest['region'])
+        else:
+            parser.error('trabajador requiere --credenciales o --url')
+        resumen = ejecutar_fragmento(args.corrida, args.fragmento, generar, args.max_por_minuto, args.hilos)
+        sys.exit(1 if resumen['fallidas'] else 0)
+    elif args.comando == 'combinar':
+        combinar_fragmentos(args.corrida, forzar=args.forzar)
+    elif args.comando == 'simulador':
+        servidor = servidor_simulado(args.puerto, args.latencia, args.max_por_minuto)
+        print(f"🧪 Simulador en http://127.0.0.1:{args.puerto} (latencia {args.latencia}s, "
+              f"{args.max_por_minuto}/min por clave)")
+        servidor.serve_forever()
+    else:
+        print(prueba_local(args.trabajadores, args.filas, max_por_minuto=args.max_por_minuto,
+                           puerto=args.puerto).to_string(index=False))
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Compactación de prompts con presupuesto de tokens para classify_with_gemini.
+
+build_prompt incrusta la respuesta completa del bot, y esas respuestas suelen
+ser pasajes largos de la base de conocimiento (ver tbl_preguntas_cleaned.csv),
+que dominan el tamaño del prompt, la latencia y la cuota de tokens por minuto.
+Para etiquetar basta con:
+
+- el inicio de la respuesta (de qué trata y si responde la pregunta),
+- las frases "no encontré información" / "lo siento" (-> 'Sin información'),
+- las frases de traspaso a asesor/ejecutivo/línea (-> 'Solicitud Paso Experto').
+
+Este módulo:
+- Estima tokens localmente (sin llamadas al API), con factor de calibración
+  opcional contra model.count_tokens.
+- Asigna a cada prompt un presupuesto total; la respuesta recibe lo que queda
+  después del system prompt y la pregunta.
+- Recorta la respuesta de forma extractiva: conserva la apertura y todas las
+  frases marcadoras (en orden original, con HUECO en los huecos).
+- Reporta ahorro de tokens, interacciones adicionales bajo la misma cuota,
+  retención de marcadores y, si se pasa un clasificador, concordancia con las
+  etiquetas históricas.
+
+Uso:
+    python compactacion_prompt.py reporte interacciones.csv resultados_paralelo_parcial.csv [--presupuesto 900]
+"""
+
+import argparse
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from preclasificador import PATRON_SIN_INFORMACION, normalizar, unir_etiquetas
+
+PRESUPUESTO_PROMPT_TOKENS = 900
+MIN_TOKENS_RESPUESTA = 60
+FRACCION_MARCADORES = 0.5
+HUECO = '[...]'
+ENLACE = '[enlace]'
+CORTE = '…'
+
+PATRON_TOKEN = re.compile(r'\w+|[^\w\s]')
+PATRON_URL = re.compile(r'https?://\S+')
+PATRON_SEGMENTO = re.compile(
+    r'(?<=[.!?])\s*(?=[A-ZÁÉÍÓÚÑ¿¡⚠✔❌✅•])'   # fin de oración (con o sin espacio)
+    r'|\n+'
+    r'|(?<=[a-záéíóúñ])(?=[A-ZÁÉÍÓÚÑ][a-záéíóúñ])'  # párrafos pegados al quitar HTML
+)
+PATRON_DISCULPA = re.compile(r'\b(lo siento|lo lamento|no (pude|logre) encontrar|no es posible responder)\b')
+PATRON_TRASPASO = re.compile(
+    r'\b(asesor(a|es)?|ejecutivo|experto|humano|transfer\w*|escal\w*|'
+    r'comunicate|comunicarte|linea (de atencion|telefonica)|contacta\w*)\b'
+)
+
+
+# ============================================================
+# ESTIMACIÓN DE TOKENS
+# ============================================================
+
+def estimar_tokens(texto, factor=1.0):
+    """
+    Estimación local de tokens (tokenizadores tipo SentencePiece en español).
+
+    Cada palabra cuenta ceil(len/4) tokens (mínimo 1) y cada signo de
+    puntuación o emoji cuenta 1.
+
+    Args:
+        texto: Texto a estimar
+        factor: Corrección obtenida con calibrar_estimador
+
+    Returns:
+        int: Tokens estimados
+    """
+    if not texto:
+        return 0
+    total = sum(math.ceil(len(t) / 4) for t in PATRON_TOKEN.findall(str(texto)))
+    return int(math.ceil(total * factor))
+
+
+def calibrar_estimador(textos, contar_tokens, muestra=50, semilla=42):
+    """
+    Factor de corrección del estimador frente al contador real del modelo.
+
+    Args:
+        textos: Lista/Serie de prompts representativos
+        contar_tokens: Función texto -> tokens reales
+                       (p. ej. lambda t: model.count_tokens(t).total_tokens)
+        muestra: Cantidad de textos a medir (cada uno es una llamada al API)
+
+    Returns:
+        float: Mediana de tokens_reales / tokens_estimados
+    """
+    textos = pd.Series(list(textos)).dropna()
+    textos = textos.sample(min(muestra, len(textos)), random_state=semilla)
+    ratios = [contar_tokens(t) / max(estimar_tokens(t), 1) for t in textos]
+    factor = float(np.median(ratios)) if ratios else 1.0
+    print(f"📏 Factor de calibración: {factor:.3f} (sobre {len(ratios)} textos)")
+    return factor
+
+
+def presupuesto_respuesta(tokens_fijos, presupuesto=PRESUPUESTO_PROMPT_TOKENS):
+    """
+    Tokens disponibles para la respuesta dentro del presupuesto del prompt.
+
+    Args:
+        tokens_fijos: Tokens de las partes que no se recortan (system prompt, pregunta, ...)
+        presupuesto: Tokens totales por solicitud
+
+    Returns:
+        int: Presupuesto de la respuesta (al menos MIN_TOKENS_RESPUESTA)
+    """
+    return max(MIN_TOKENS_RESPUESTA, presupuesto - tokens_fijos)
+
+
+# ============================================================
+# COMPACTACIÓN DE LA RESPUESTA
+# ============================================================
+
+def dividir_segmentos(texto):
+    """Divide una respuesta en oraciones/párrafos (tolerante a HTML aplanado)."""
+    return [s.strip() for s in PATRON_SEGMENTO.split(texto) if s and s.strip()]
+
+
+def tipo_marcador(segmento):
+    """'sin_informacion', 'traspaso' o None según el contenido del segmento."""
+    normalizado = normalizar(segmento)
+    if PATRON_SIN_INFORMACION.search(normalizado) or PATRON_DISCULPA.search(normalizado):
+        return 'sin_informacion'
+    if PATRON_TRASPASO.search(normalizado):
+        return 'traspaso'
+    return None
+
+
+def _recortar(segmento, max_tokens, factor):
+    """Primeras palabras del segmento que caben en max_tokens (con CORTE sólo si se recorta)."""
+    todas = segmento.split()
+    palabras, usados = [], 0
+    for palabra in todas:
+        costo = estimar_tokens(palabra, factor)
+        if usados + costo > max_tokens:
+            break
+        palabras.append(palabra)
+        usados += costo
+    if not palabras:
+        return ''
+    if len(palabras) == len(todas):
+        return ' '.join(palabras)
+    return ' '.join(palabras) + CORTE
+
+
+def _recortar_marcador(segmento, max_tokens, factor):
+    """Recorta un segmento marcador empezando en la frase que lo marca."""
+    normalizado = normalizar(segmento)
+    coincidencia = None
+    for patron in (PATRON_SIN_INFORMACION, PATRON_DISCULPA, PATRON_TRASPASO):
+        coincidencia = patron.search(normalizado)
+        if coincidencia:
+            break
+    # normalizar conserva la longitud en textos en español (una letra por letra)
+    inicio = coincidencia.start() if coincidencia and len(normalizado) == len(segmento) else 0
+    inicio = segmento.rfind(' ', 0, inicio) + 1 if inicio else 0
+    recorte = _recortar(segmento[inicio:], max_tokens, factor)
+    return CORTE + recorte if recorte and inicio else recorte
+
+
+def _seleccionar(segmentos, costos, tipos, max_tokens, factor):
+    """Arma la respuesta compactada con max_tokens para el contenido (sin contar separadores)."""
+    marcadores = sorted(
+        (i for i, t in enumerate(tipos) if t),
+        key=lambda i: (tipos[i] != 'sin_informacion', i)
+    )
+
+    elegidos, parciales = {}, set()
+    reserva = min(sum(costos[i] for i in marcadores), int(max_tokens * FRACCION_MARCADORES))
+    disponible = max_tokens - reserva
+
+    # Apertura en orden hasta agotar su parte del presupuesto
+    for i, segmento in enumerate(segmentos):
+        if costos[i] <= disponible:
+            elegidos[i] = segmento
+            disponible -= costos[i]
+            continue
+        if i == 0 or disponible >= 10:
+            recorte = _recortar(segmento, disponible, factor)
+            if recorte:
+                elegidos[i] = recorte
+                parciales.add(i)
+                disponible = 0
+        break
+
+    # Marcadores que no quedaron (completos) en la apertura
+    disponible += reserva
+    for i in marcadores:
+        if disponible <= 0:
+            break
+        if i in elegidos:
+            # Recortado por la apertura: se agrega el tramo marcador si la frase quedó fuera
+            if i not in parciales or tipo_marcador(elegidos[i]) == tipos[i]:
+                continue
+            recorte = _recortar_marcador(segmentos[i], disponible, factor)
+            if recorte:
+                elegidos[i] = f"{elegidos[i]} {recorte}"
+                disponible -= estimar_tokens(recorte, factor)
+            continue
+        if costos[i] <= disponible:
+            elegidos[i] = segmentos[i]
+            disponible -= costos[i]
+        else:
+            recorte = _recortar_marcador(segmentos[i], disponible, factor)
+            if recorte:
+                elegidos[i] = recorte
+            disponible = 0
+
+    partes, anterior = [], -1
+    for i in sorted(elegidos):
+        if partes and i != anterior + 1:
+            partes.append(HUECO)
+        partes.append(elegidos[i])
+        anterior = i
+    compacta = ' '.join(partes)
+    if anterior < len(segmentos) - 1:
+        compacta += ' ' + HUECO
+    return compacta
+
+
+def compactar_respuesta(texto, max_tokens, factor=1.0):
+    """
+    Recorta una respuesta a max_tokens conservando apertura y marcadores.
+
+    Primero se reemplazan los enlaces por ENLACE. Luego se reserva hasta
+    FRACCION_MARCADORES del presupuesto para las frases marcadoras (sin
+    información primero, luego traspaso); el resto se llena con la apertura en
+    orden. Los separadores HUECO y CORTE cuentan dentro de max_tokens: si al
+    armar la respuesta se pasa, se vuelve a seleccionar con menos presupuesto.
+    Si la respuesta ya cabe se devuelve sin cambios.
+
+    Args:
+        texto: Respuesta del bot
+        max_tokens: Presupuesto de tokens para la respuesta
+
+    Returns:
+        str: Respuesta compactada
+    """
+    if not texto or estimar_tokens(texto, factor) <= max_tokens:
+        return texto
+
+    texto = PATRON_URL.sub(ENLACE, texto)
+    if estimar_tokens(texto, factor) <= max_tokens:
+        return texto
+
+    segmentos = dividir_segmentos(texto)
+    costos = [estimar_tokens(s, factor) for s in segmentos]
+    tipos = [tipo_marcador(s) for s in segmentos]
+
+    contenido = max_tokens
+    while True:
+        compacta = _seleccionar(segmentos, costos, tipos, contenido, factor)
+        exceso = estimar_tokens(compacta, factor) - max_tokens
+        if exceso <= 0 or contenido <= 1:
+            return compacta
+        contenido = max(1, contenido - exceso)
+
+
+def compactar_interaccion(pregunta, respuesta, tokens_fijos=0, presupuesto=PRESUPUESTO_PROMPT_TOKENS, factor=1.0):
+    """
+    Respuesta compactada para el prompt de una interacción.
+
+    Args:
+        pregunta: Texto de la pregunta (se envía completo)
+        respuesta: Texto de la respuesta
+        tokens_fijos: Tokens del resto del prompt (estimar_tokens(SYSTEM_PROMPT + instrucciones))
+
+    Returns:
+        str: Respuesta dentro del presupuesto
+    """
+    limite = presupuesto_respuesta(tokens_fijos + estimar_tokens(pregunta, factor), presupuesto)
+    return compactar_respuesta(respuesta, limite, factor)
+
+
+# ============================================================
+# REPORTE SOBRE ETIQUETAS HISTÓRICAS
+# ============================================================
+
+def _tiene(texto, tipo):
+    return any(tipo_marcador(s) == tipo for s in dividir_segmentos(texto or ''))
+
+
+def reporte_compactacion(df_etiquetado, tokens_fijos=0, presupuesto=PRESUPUESTO_PROMPT_TOKENS,
+                         factor=1.0, clasificar=None, muestra=200, semilla=42):
+    """
+    Ahorro de tokens, retención de marcadores y concordancia de etiquetas.
+
+    Args:
+        df_etiquetado: DataFrame con pregunta, respuesta, category (ver unir_etiquetas)
+        tokens_fijos: Tokens de las partes fijas del prompt (SYSTEM_PROMPT, instrucciones)
+        presupuesto: Tokens por solicitud
+        clasificar: Función opcional fila -> categoría usando el prompt compactado
+                    (p. ej. lambda row: classify_with_gemini(row)['category']).
+                    Se aplica a una muestra estratificada por category.
+        muestra: Filas a reclasificar con clasificar
+
+    Returns:
+        dict: resumen, por_categoria, detalle (DataFrame por interacción)
+    """
+    detalle = df_etiquetado.copy()
+    detalle['pregunta'] = detalle['pregunta'].fillna('').astype(str).str.strip()
+    detalle['respuesta'] = detalle['respuesta'].fillna('').astype(str).str.strip()
+    fijos = tokens_fijos
+
+    detalle['respuesta_compacta'] = [
+        compactar_interaccion(p, r, tokens_fijos, presupuesto, factor)
+        for p, r in zip(detalle['pregunta'], detalle['respuesta'])
+    ]
+    tokens_pregunta = detalle['pregunta'].map(lambda t: estimar_tokens(t, factor))
+    detalle['tokens_original'] = fijos + tokens_pregunta + detalle['respuesta'].map(lambda t: estimar_tokens(t, factor))
+    detalle['tokens_compacto'] = fijos + tokens_pregunta + detalle['respuesta_compacta'].map(lambda t: estimar_tokens(t, factor))
+    detalle['recortada'] = detalle['respuesta_compacta'] != detalle['respuesta']
+
+    retencion = {}
+    for tipo in ('sin_informacion', 'traspaso'):
+        con_marcador = detalle['respuesta'].map(lambda t: _tiene(t, tipo))
+        conserva = detalle.loc[con_marcador, 'respuesta_compacta'].map(lambda t: _tiene(t, tipo))
+        retencion[tipo] = (int(con_marcador.sum()), float(conserva.mean()) if len(conserva) else float('nan'))
+
+    total_original = int(detalle['tokens_original'].sum())
+    total_compacto = int(detalle['tokens_compacto'].sum())
+    resumen = {
+        'interacciones': len(detalle),
+        'recortadas': int(detalle['recortada'].sum()),
+        'tokens_original': total_original,
+        'tokens_compacto': total_compacto,
+        'ahorro_pct': round(100 * (1 - total_compacto / max(total_original, 1)), 2),
+        'interacciones_por_cuota_x': round(total_original / max(total_compacto, 1), 2),
+        'p95_tokens_original': int(detalle['tokens_original'].quantile(0.95)),
+        'p95_tokens_compacto': int(detalle['tokens_compacto'].quantile(0.95)),
+    }
+    for tipo, (n, tasa) in retencion.items():
+        resumen[f'con_{tipo}'] = n
+        resumen[f'retencion_{tipo}_pct'] = round(100 * tasa, 2) if n else None
+
+    por_categoria = None
+    if clasificar is not None:
+        # Muestra estratificada: al menos algunas filas de cada categoría
+        por_grupo = max(1, muestra // max(detalle['category'].nunique(), 1))
+        evaluar = detalle.sample(frac=1, random_state=semilla).groupby('category').head(por_grupo)
+        filas = evaluar.assign(fk_tbl_conversaciones_conecta2=evaluar['conversation_id'])
+        evaluar = evaluar.assign(category_compacto=[clasificar(f) for f in filas.to_dict(orient='records')])
+        evaluar['coincide'] = evaluar['category'] == evaluar['category_compacto']
+        por_categoria = (
+            evaluar.groupby('category')
+            .agg(evaluadas=('coincide', 'size'), concordancia=('coincide', 'mean'),
+                 recortadas=('recortada', 'sum'))
+            .assign(concordancia=lambda d: (100 * d['concordancia']).round(2))
+            .reset_index()
+        )
+        resumen['concordancia_pct'] = round(100 * evaluar['coincide'].mean(), 2)
+        resumen['concordancia_recortadas_pct'] = (
+            round(100 * evaluar.loc[evaluar['recortada'], 'coincide'].mean(), 2)
+            if evaluar['recortada'].any() else None
+        )
+        detalle = detalle.join(evaluar[['category_compacto', 'coincide']])
+
+    return {'resumen': resumen, 'por_categoria': por_categoria, 'detalle': detalle}
+
+
+def imprimir_reporte(reporte):
+    """Imprime el resumen del reporte de compactación."""
+    r = reporte['resumen']
+    print(f"📊 Interacciones: {r['interacciones']:,} | Recortadas: {r['recortadas']:,}")
+    print(f"   Tokens estimados: {r['tokens_original']:,} -> {r['tokens_compacto']:,} "
+          f"(ahorro {r['ahorro_pct']}%, {r['interacciones_por_cuota_x']}x interacciones por cuota)")
+    print(f"   p95 tokens por prompt: {r['p95_tokens_original']:,} -> {r['p95_tokens_compacto']:,}")
+    for tipo, nombre in (('sin_informacion', '"no encontré información"'), ('traspaso', 'traspaso a asesor')):
+        if r[f'con_{tipo}']:
+            print(f"   Marcador {nombre}: {r[f'con_{tipo}']:,} respuestas, "
+                  f"{r[f'retencion_{tipo}_pct']}% lo conservan")
+    if reporte['por_categoria'] is not None:
+        print(f"\n✅ Concordancia con etiquetas históricas: {r['concordancia_pct']}% "
+              f"(recortadas: {r['concordancia_recortadas_pct']}%)")
+        print(reporte['por_categoria'].to_string(index=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compactación de prompts con presupuesto de tokens')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_r = sub.add_parser('reporte', help='Ahorro de tokens y retención de marcadores (sin llamadas al API)')
+    p_r.add_argument('interacciones', help='CSV con fk_tbl_conversaciones_conecta2, pregunta, respuesta')
+    p_r.add_argument('etiquetas', help='CSV con conversation_id, category')
+    p_r.add_argument('--presupuesto', type=int, default=PRESUPUESTO_PROMPT_TOKENS)
+    p_r.add_argument('--tokens-fijos', type=int, default=0,
+                     help='Tokens del system prompt e instrucciones (se suman a cada prompt)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("COMPACTACIÓN DE PROMPTS")
+    print("=" * 80)
+
+    df_etiquetado = unir_etiquetas(pd.read_csv(args.interacciones), pd.read_csv(args.etiquetas))
+    imprimir_reporte(reporte_compactacion(df_etiquetado, args.tokens_fijos, args.presupuesto))
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Motor de cubos OLAP para tokens, costos y latencias de generaciones Langfuse.
+
+Calcula UNA sola vez el cubo base en el grano más fino
+(model × node_type × date × hour) con medidas aditivas:
+- conteo de llamadas
+- n / suma / suma de cuadrados / min / max por medida
+- sketches de cuantiles (histogramas logarítmicos mergeables) para latencias y tokens
+
+Cualquier vista más gruesa (por nodo, diaria, semanal, por modelo...) se deriva
+por roll-up desde el cubo base, sin volver a recorrer el DataFrame crudo.
+
+Uso:
+    python cubos_olap.py data/langfuse_generations.csv
+"""
+
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Dimensiones del grano base
+BASE_DIMENSIONS = ['model', 'node_type', 'date', 'hour']
+
+# Dimensiones derivadas: se calculan sobre el cubo base a partir de otra dimensión
+DERIVED_DIMENSIONS = {
+    'week': ('date', lambda s: pd.to_datetime(s).dt.to_period('W').astype(str)),
+}
+
+# Medidas aditivas (n, sum, sumsq, min, max)
+ADDITIVE_MEASURES = [
+    'promptTokens', 'completionTokens', 'totalTokens',
+    'calculatedInputCost', 'calculatedOutputCost', 'calculatedTotalCost',
+    'latency', 'timeToFirstToken',
+    'error',  # indicador 0/1 de traza con error: error_mean = tasa de error
+]
+
+# Medidas con sketch de cuantiles (mediana, P90, P95, P99...)
+SKETCH_MEASURES = ['promptTokens', 'completionTokens', 'totalTokens', 'latency', 'timeToFirstToken']
+
+# Precisión relativa del sketch (1%): cada bucket cubre [gamma^(i-1), gamma^i)
+SKETCH_RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_ZERO_BUCKET = -(10 ** 6)  # Bucket reservado para valores <= 0
+
+
+# ============================================================
+# SKETCHES DE CUANTILES
+# ============================================================
+
+def _values_to_buckets(values):
+    """
+    Asigna cada valor a su bucket logarítmico.
+
+    Args:
+        values: Serie numérica (sin NaN)
+
+    Returns:
+        np.ndarray: Índices de bucket (int64)
+    """
+    arr = values.to_numpy(dtype=float)
+    buckets = np.full(arr.shape, _ZERO_BUCKET, dtype=np.int64)
+    positive = arr > 0
+    buckets[positive] = np.ceil(np.log(arr[positive]) / _LOG_GAMMA).astype(np.int64)
+    return buckets
+
+
+def bucket_to_value(buckets):
+    """
+    Valor representativo de cada bucket (error relativo <= SKETCH_RELATIVE_ACCURACY).
+
+    Público para quienes leen la tabla de sketches directamente (p. ej. el
+    tablero local, que densifica los buckets sin pasar por query_cube).
+    """
+    buckets = np.asarray(buckets, dtype=np.int64)
+    values = 2 * np.power(_GAMMA, buckets.astype(float)) / (_GAMMA + 1)
+    return np.where(buckets == _ZERO_BUCKET, 0.0, values)
+
+
+# ============================================================
+# CONSTRUCCIÓN DEL CUBO BASE (única pasada sobre los datos crudos)
+# ============================================================
+
+def _prepare_dimensions(df, time_col):
+    """
+    Obtiene las columnas de dimensión del grano base.
+
+    Usa 'date' y 'hour' si ya existen (celda de procesamiento del notebook);
+    si no, las deriva de time_col.
+    """
+    dims = pd.DataFrame(index=df.index)
+    dims['model'] = df['model'] if 'model' in df.columns else 'UNKNOWN'
+    dims['node_type'] = df['node_type'] if 'node_type' in df.columns else 'UNKNOWN'
+
+    if 'date' in df.columns and 'hour' in df.columns:
+        dims['date'] = df['date']
+        dims['hour'] = df['hour']
+    else:
+        timestamps = pd.to_datetime(df[time_col], errors='coerce')
+        dims['date'] = timestamps.dt.date
+        dims['hour'] = timestamps.dt.hour
+    return dims
+
+
+def build_base_cube(df, time_col=None):
+    """
+    Construye el cubo base (model × node_type × date × hour) en una sola pasada.
+
+    Args:
+        df: DataFrame de generaciones con columnas de tokens, costos y latencias
+        time_col: Columna temporal para derivar date/hour si no existen
+                  (por defecto 'startTime' o 'timestamp', la que esté disponible)
+
+    Returns:
+        dict: {
+            'cells': DataFrame con medidas aditivas por celda base,
+            'sketches': DataFrame largo (celda, measure, bucket, count),
+            'dimensions': dimensiones disponibles,
+            'measures': medidas aditivas presentes,
+            'cache': roll-ups ya calculados (lattice)
+        }
+    """
+    if time_col is None:
+        time_col = 'startTime' if 'startTime' in df.columns else 'timestamp'
+
+    dims = _prepare_dimensions(df, time_col)
+    measures = [m for m in ADDITIVE_MEASURES if m in df.columns]
+    sketch_measures = [m for m in SKETCH_MEASURES if m in df.columns]
+
+    data = dims.copy()
+    agg_spec = {'total_calls': ('_one', 'sum')}
+    data['_one'] = 1
+    for m in measures:
+        values = pd.to_numeric(df[m], errors='coerce')
+        data[f'{m}_n'] = values.notna().astype(np.int64)
+        data[f'{m}_sum'] = values.fillna(0.0)
+        data[f'{m}_sumsq'] = values.fillna(0.0) ** 2
+        data[f'{m}_min'] = values
+        data[f'{m}_max'] = values
+        agg_spec[f'{m}_n'] = (f'{m}_n', 'sum')
+        agg_spec[f'{m}_sum'] = (f'{m}_sum', 'sum')
+        agg_spec[f'{m}_sumsq'] = (f'{m}_sumsq', 'sum')
+        agg_spec[f'{m}_min'] = (f'{m}_min', 'min')
+        agg_spec[f'{m}_max'] = (f'{m}_max', 'max')
+
+    grouped = data.groupby(BASE_DIMENSIONS, dropna=False, sort=False)
+    cells = grouped.agg(**agg_spec).reset_index()
+
+    # Sketches: se reutiliza el mismo agrupamiento (ngroup) para no re-agrupar por dimensiones
+    cell_id = grouped.ngroup()
+    cell_keys = grouped.size().reset_index()[BASE_DIMENSIONS]
+    sketch_parts = []
+    for m in sketch_measures:
+        values = pd.to_numeric(df[m], errors='coerce')
+        valid = values.notna()
+        if not valid.any():
+            continue
+        part = pd.DataFrame({
+            '_cell': cell_id[valid].to_numpy(),
+            'bucket': _values_to_buckets(values[valid]),
+        })
+        part = part.value_counts().rename('count').reset_index()
+        part['measure'] = m
+        sketch_parts.append(part)
+
+    if sketch_parts:
+        sketches = pd.concat(sketch_parts, ignore_index=True)
+        sketches = cell_keys.iloc[sketches['_cell']].reset_index(drop=True).join(
+            sketches.drop(columns='_cell')
+        )
+    else:
+        sketches = pd.DataFrame(columns=BASE_DIMENSIONS + ['bucket', 'count', 'measure'])
+
+    return {
+        'cells': cells,
+        'sketches': sketches,
+        'dimensions': BASE_DIMENSIONS + list(DERIVED_DIMENSIONS),
+        'measures': measures,
+        'cache': {},
+    }
+
+
+# ============================================================
+# ROLL-UP Y CONSULTAS
+# ============================================================
+
+def _add_derived_dimensions(frame, dims):
+    """Agrega al frame las dimensiones derivadas solicitadas (p. ej. 'week')."""
+    for dim in dims:
+        if dim in DERIVED_DIMENSIONS and dim not in frame.columns:
+            source, fn = DERIVED_DIMENSIONS[dim]
+            frame = frame.assign(**{dim: fn(frame[source])})
+    return frame
+
+
+def _apply_filters(frame, filters):
+    """Filtra un frame del cubo por valores de dimensión."""
+    if not filters:
+        return frame
+    frame = _add_derived_dimensions(frame, filters.keys())
+    mask = pd.Series(True, index=frame.index)
+    for dim, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            mask &= frame[dim].isin(value)
+        else:
+            mask &= frame[dim] == value
+    return frame[mask]
+
+
+def _rollup_frames(cells, sketches, measures, dims):
+    """
+    Agrega celdas y sketches a las dimensiones indicadas.
+
+    Como en el cubo base, los valores nulos de dimensión forman su propio grupo
+    (dropna=False): así un roll-up desde un ancestro cacheado da lo mismo que
+    desde el cubo base.
+    """
+    dims = list(dims)
+    cells = _add_derived_dimensions(cells, dims)
+    sketches = _add_derived_dimensions(sketches, dims)
+
+    agg_spec = {'total_calls': ('total_calls', 'sum')}
+    for m in measures:
+        agg_spec[f'{m}_n'] = (f'{m}_n', 'sum')
+        agg_spec[f'{m}_sum'] = (f'{m}_sum', 'sum')
+        agg_spec[f'{m}_sumsq'] = (f'{m}_sumsq', 'sum')
+        agg_spec[f'{m}_min'] = (f'{m}_min', 'min')
+        agg_spec[f'{m}_max'] = (f'{m}_max', 'max')
+
+    if dims:
+        rolled_cells = cells.groupby(dims, dropna=False).agg(**agg_spec).reset_index()
+        rolled_sketches = (
+            sketches.groupby(dims + ['measure', 'bucket'], dropna=False)['count']
+            .sum()
+            .reset_index()
+        )
+    else:
+        rolled_cells = cells.assign(_all=0).groupby('_all').agg(**agg_spec).reset_index(drop=True)
+        rolled_sketches = sketches.groupby(['measure', 'bucket'])['count'].sum().reset_index()
+    return rolled_cells, rolled_sketches
+
+
+def rollup_cube(cube, dims):
+    """
+    Deriva el roll-up de una combinación de dimensiones desde el lattice.
+
+    Parte del ancestro ya calculado más pequeño que contenga las dimensiones
+    pedidas (o del cubo base) y guarda el resultado en cube['cache'].
+
+    Args:
+        cube: Cubo generado por build_base_cube
+        dims: Lista de dimensiones (subconjunto de cube['dimensions'])
+
+    Returns:
+        tuple: (cells, sketches) agregados a dims
+    """
+    dims = tuple(dims)
+    unknown = [d for d in dims if d not in cube['dimensions']]
+    if unknown:
+        raise KeyError(f"Dimensiones no disponibles en el cubo: {unknown}")
+
+    key = tuple(sorted(dims))
+    if key in cube['cache']:
+        return cube['cache'][key]
+
+    # Buscar el ancestro cacheado más pequeño que contenga todas las dimensiones
+    source_cells, source_sketches = cube['cells'], cube['sketches']
+    best_size = len(source_cells)
+    for cached_dims, (cached_cells, cached_sketches) in cube['cache'].items():
+        if set(key) <= set(cached_dims) and len(cached_cells) < best_size:
+            source_cells, source_sketches = cached_cells, cached_sketches
+            best_size = len(cached_cells)
+
+    result = _rollup_frames(source_cells, source_sketches, cube['measures'], list(dims))
+    cube['cache'][key] = result
+    return result
+
+
+def _quantile_from_sketch(sketches, dims, measure, q):
+    """
+    Estima el cuantil q de una medida por grupo a partir de los buckets.
+
+    Returns:
+        DataFrame: dims + columna 'value'
+    """
+    s = sketches[sketches['measure'] == measure]
+    keys = list(dims) if dims else ['_all']
+    if not dims:
+        s = s.assign(_all=0)
+    if s.empty:
+        return pd.DataFrame(columns=keys + ['value'])
+
+    s = s.sort_values(keys + ['bucket'])
+    cum = s.groupby(keys, sort=False, dropna=False)['count'].cumsum()
+    total = s.groupby(keys, sort=False, dropna=False)['count'].transform('sum')
+    # Rango objetivo con la misma convención que pandas.quantile (interpolación lineal)
+    hit = s[cum > q * (total - 1)]
+    first = hit.groupby(keys, sort=False, dropna=False).head(1)
+    result = first[keys].copy()
+    result['value'] = bucket_to_value(first['bucket'].to_numpy())
+    return result
+
+
+def _parse_metric(metric):
+    """Separa 'latency_p95' en ('latency', 'p95')."""
+    measure, _, stat = metric.rpartition('_')
+    if not measure:
+        raise ValueError(f"Métrica inválida: {metric!r} (formato esperado: medida_estadístico)")
+    return measure, stat
+
+
+def query_cube(cube, dims, metrics, filters=None):
+    """
+    Consulta el cubo por cualquier subconjunto de dimensiones.
+
+    Estadísticos soportados por medida: n, sum, mean, min, max, std,
+    median y percentiles pXX (p90, p95, p99...). 'total_calls' se incluye siempre.
+
+    Args:
+        cube: Cubo generado por build_base_cube
+        dims: Lista de dimensiones de agrupación (p. ej. ['date', 'node_type'])
+        metrics: Lista de métricas (p. ej. ['latency_mean', 'latency_p95'])
+        filters: Diccionario opcional {dimensión: valor o lista de valores}
+
+    Returns:
+        DataFrame: Una fila por combinación de dims con las métricas pedidas
+    """
+    dims = list(dims)
+    if filters:
+        # Las consultas filtradas se derivan del cubo base sin usar la caché
+        cells = _apply_filters(cube['cells'], filters)
+        sketches = _apply_filters(cube['sketches'], filters)
+        cells, sketches = _rollup_frames(cells, sketches, cube['measures'], dims)
+    else:
+        cells, sketches = rollup_cube(cube, dims)
+
+    result = cells[dims + ['total_calls']].copy() if dims else cells[['total_calls']].copy()
+
+    for metric in metrics:
+        measure, stat = _parse_metric(metric)
+        if measure not in cube['measures']:
+            raise KeyError(f"Medida no disponible en el cubo: {measure!r}")
+
+        n = cells[f'{measure}_n']
+        total = cells[f'{measure}_sum']
+        if stat == 'n':
+            result[metric] = n
+        elif stat == 'sum':
+            # pandas.sum devuelve 0 para grupos sin datos
+            result[metric] = total
+        elif stat == 'mean':
+            result[metric] = total / n.where(n > 0)
+        elif stat in ('min', 'max'):
+            result[metric] = cells[f'{measure}_{stat}']
+        elif stat == 'std':
+            variance = (cells[f'{measure}_sumsq'] - total ** 2 / n.where(n > 0)) / (n - 1).where(n > 1)
+            result[metric] = np.sqrt(variance.clip(lower=0))
+        elif stat == 'median' or (stat.startswith('p') and stat[1:].isdigit()):
+            q = 0.5 if stat == 'median' else int(stat[1:]) / 100
+            quantiles = _quantile_from_sketch(sketches, dims, measure, q)
+            if dims:
+                merged = result[dims].merge(quantiles, on=dims, how='left')
+                result[metric] = merged['value'].to_numpy()
+            else:
+                result[metric] = quantiles['value'].iloc[0] if len(quantiles) else np.nan
+        else:
+            raise ValueError(f"Estadístico no soportado: {stat!r}")
+
+    return result.reset_index(drop=True)
+
+
+# ============================================================
+# VISTAS EQUIVALENTES A LOS CUBOS DEL NOTEBOOK
+# ============================================================
+
+def _view(cube, dims, metrics, decimals):
+    """Consulta el cubo con las métricas cuya medida esté disponible y redondea."""
+    metrics = [m for m in metrics if _parse_metric(m)[0] in cube['measures']]
+    return query_cube(cube, dims, metrics).round(decimals)
+
+
+def token_consumption_cube(cube):
+    """Vista de consumo de tokens y costos por tipo de nodo (roll-up del cubo base)."""
+    return _view(cube, ['node_type'], [
+        'promptTokens_sum', 'promptTokens_mean', 'promptTokens_median',
+        'completionTokens_sum', 'completionTokens_mean', 'completionTokens_median',
+        'totalTokens_sum', 'totalTokens_mean', 'totalTokens_median',
+        'calculatedInputCost_sum', 'calculatedInputCost_mean',
+        'calculatedOutputCost_sum', 'calculatedOutputCost_mean',
+        'calculatedTotalCost_sum', 'calculatedTotalCost_mean',
+    ], 2)
+
+
+def latency_analysis_cube(cube):
+    """Vista de latencias y time-to-first-token por tipo de nodo."""
+    return _view(cube, ['node_type'], [
+        'latency_mean', 'latency_median', 'latency_min', 'latency_max', 'latency_std',
+        'latency_p95', 'latency_p99',
+        'timeToFirstToken_mean', 'timeToFirstToken_median', 'timeToFirstToken_min',
+        'timeToFirstToken_max', 'timeToFirstToken_p95', 'timeToFirstToken_p99',
+    ], 3).drop(columns='total_calls')
+
+
+_PERIOD_METRICS = [
+    'promptTokens_sum', 'promptTokens_mean',
+    'completionTokens_sum', 'completionTokens_mean',
+    'totalTokens_sum', 'totalTokens_mean',
+    'latency_mean', 'latency_median',
+    'calculatedTotalCost_sum', 'calculatedTotalCost_mean',
+]
+
+
+def daily_aggregation_cube(cube):
+    """Vista diaria por tipo de nodo."""
+    return _view(cube, ['date', 'node_type'], _PERIOD_METRICS, 2)
+
+
+def weekly_aggregation_cube(cube):
+    """Vista semanal por tipo de nodo (semana derivada de la fecha del cubo base)."""
+    return _view(cube, ['week', 'node_type'], _PERIOD_METRICS, 2)
+
+
+def overall_summary_cube(cube):
+    """Vista resumen con totales y promedios generales por tipo de nodo."""
+    return _view(cube, ['node_type'], [
+        'promptTokens_sum', 'completionTokens_sum', 'totalTokens_sum', 'totalTokens_mean',
+        'latency_mean', 'latency_median', 'latency_p95',
+        'timeToFirstToken_mean',
+        'calculatedTotalCost_sum', 'calculatedTotalCost_mean',
+    ], 2)
+
+
+def model_analysis_cube(cube):
+    """Vista por tipo de nodo y modelo."""
+    return _view(cube, ['node_type', 'model'], [
+        'totalTokens_sum', 'totalTokens_mean',
+        'latency_mean', 'latency_median',
+        'calculatedTotalCost_sum',
+    ], 2)
+
+
+def latency_cube_by_model(cube, models, temporal='daily'):
+    """
+    Vista de latencias (media, mediana, min, max, P90, P95, P99) para un conjunto de modelos.
+
+    Args:
+        cube: Cubo generado por build_base_cube
+        models: Lista de nombres de modelo a combinar
+        temporal: 'daily' o 'weekly'
+
+    Returns:
+        DataFrame: Métricas de latencia por período
+    """
+    time_dim = 'date' if temporal == 'daily' else 'week'
+    return query_cube(cube, [time_dim], [
+        'latency_mean', 'latency_median', 'latency_min', 'latency_max',
+        'latency_p90', 'latency_p95', 'latency_p99',
+    ], filters={'model': list(models)}).round(3)
+
+
+def build_all_views(cube):
+    """
+    Genera todas las vistas del reporte desde el cubo base.
+
+    Returns:
+        dict: token_cube, latency_cube, daily_cube, weekly_cube, summary_cube, model_cube
+    """
+    return {
+        'token_cube': token_consumption_cube(cube),
+        'latency_cube': latency_analysis_cube(cube),
+        'daily_cube': daily_aggregation_cube(cube),
+        'weekly_cube': weekly_aggregation_cube(cube),
+        'summary_cube': overall_summary_cube(cube),
+        'model_cube': model_analysis_cube(cube),
+    }
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'muestra_langfuse.csv'
+
+    print("=" * 80)
+    print("CUBO OLAP: TOKENS, COSTOS Y LATENCIAS")
+    print("=" * 80)
+
+    df = pd.read_csv(csv_path)
+    print(f"\n📂 Datos cargados: {len(df):,} registros desde {csv_path}")
+
+    cube = build_base_cube(df)
+    print(f"✅ Cubo base: {len(cube['cells']):,} celdas "
+          f"({' × '.join(BASE_DIMENSIONS)}), {len(cube['sketches']):,} buckets de sketch")
+    print(f"   Medidas disponibles: {cube['measures']}")
+
+    metrics = [f'{m}_{s}' for m in cube['measures'] for s in ('sum', 'mean')]
+    if 'latency' in cube['measures']:
+        metrics += ['latency_median', 'latency_p95', 'latency_p99']
+
+    print("\n📊 Roll-up por tipo de nodo:")
+    print(query_cube(cube, ['node_type'], metrics).round(3).to_string(index=False))
+
+    print("\n📅 Roll-up diario:")
+    print(query_cube(cube, ['date'], metrics).round(3).to_string(index=False))
@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+Tablero local e interactivo de latencias, errores, volumen y autogestión.
+
+Reemplaza los PNG estáticos (tendencia_latencias_diaria.png,
+analisis_gpt41_mini_detallado.png y los gráficos de las celdas 66-71 del
+flujo) por un tablero Plotly servido localmente que SOLO lee tiles
+pre-agregados:
+
+- cubo_diario_celdas.csv / cubo_diario_sketches.csv
+      model × node_type × date: llamadas, latencia, errores (+ sketches de cuantiles)
+- cubo_horario_celdas.csv / cubo_horario_sketches.csv
+      grano base model × node_type × date × hour; se carga sólo al hacer drill-down
+- autogestion_semanal.csv
+      semana × REGIONAL × (motivo_experto_flag, flg_experto_flag): conversaciones
+
+Los filtros (rango de fechas, regional, modelo) se resuelven sobre los tiles
+en memoria, sin tocar las trazas crudas. Las trazas no traen REGIONAL, así que
+ese filtro sólo aplica a la autogestión; el de modelo, sólo a latencia,
+errores y volumen. El pre-cálculo también refresca las
+muestras del modo aproximado (muestreo_aproximado.py) con las filas nuevas.
+
+Uso:
+    python dashboard_latencias.py precalcular --trazas muestra_langfuse.csv --resultados df_resultados.csv
+    python dashboard_latencias.py servir --puerto 8050
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from cubos_olap import build_base_cube, bucket_to_value, query_cube, rollup_cube
+
+RUTA_TILES = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Dashboard'
+)
+DIMENSIONES_DIARIAS = ['model', 'node_type', 'date']
+UMBRAL_SLA_SEGUNDOS = 3.0
+
+# Paleta usada en los gráficos del flujo
+COLORES_AUTOGESTION = {
+    'Conecta Retuvo': '#4169E1',
+    'Puerta experto': '#696969',
+    'Experto': '#CC0000',
+}
+
+
+# ============================================================
+# EXTRACCIÓN DESDE TRAZAS (sólo en la etapa de pre-cálculo)
+# ============================================================
+
+def extraer_modelo(output_str):
+    """Extrae model_name del output de la traza (igual que analisis_gpt41_mini.py)."""
+    if pd.isna(output_str):
+        return None
+    match = re.search(r"'model_name':\s*'([^']+)'", str(output_str))
+    return match.group(1) if match else None
+
+
+def tiene_error(output_str):
+    """
+    Indica si el output de la traza corresponde a un error.
+
+    Mismos criterios que la detección de errores del flujo (errores HTTP con
+    'Error code:' y errores de ejecución: recursión, timeout, excepciones).
+    """
+    if pd.isna(output_str):
+        return False
+    texto = str(output_str).strip()
+    if texto.startswith("{'project':") or texto.startswith('{"project":'):
+        return False
+    texto_lower = texto.lower()
+    return (
+        'error code:' in texto_lower
+        or 'recursionerror' in texto_lower
+        or 'recursion limit' in texto_lower
+        or ('timeout' in texto_lower and 'timed out' in texto_lower)
+        or texto.startswith('Exception:')
+        or texto.startswith('Error:')
+        or 'traceback' in texto_lower
+    )
+
+
+def preparar_trazas(df):
+    """Agrega model, node_type y error (0/1) a las trazas para construir el cubo."""
+    df = df.copy()
+    if 'model' not in df.columns:
+        df['model'] = df['output'].apply(extraer_modelo) if 'output' in df.columns else None
+    df['model'] = df['model'].fillna('UNKNOWN')
+    if 'node_type' not in df.columns:
+        df['node_type'] = 'UNKNOWN'
+    df['node_type'] = df['node_type'].fillna('UNKNOWN')
+    if 'error' not in df.columns:
+        df['error'] = df['output'].apply(tiene_error).astype(int) if 'output' in df.columns else 0
+    return df
+
+
+def calcular_tile_autogestion(df_resultados):
+    """
+    Conversaciones por semana (lunes), regional y combinación de banderas de experto.
+
+    Con las dos banderas se derivan tanto la clasificación de 3 grupos de la
+    celda 67 (Conecta Retuvo / Puerta experto / Experto) como las métricas de
+    autogestión ácida y confirmada.
+
+    Args:
+        df_resultados: DataFrame por conversación (df_resultados.csv)
+
+    Returns:
+        DataFrame: week_start, REGIONAL, motivo_experto_flag, flg_experto_flag, conversaciones
+    """
+    df = df_resultados.copy()
+    fecha = pd.to_datetime(df['fecha'], format='mixed', errors='coerce')
+    df['week_start'] = (fecha.dt.normalize() - pd.to_timedelta(fecha.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    df['REGIONAL'] = df['REGIONAL'].fillna('SIN REGIONAL')
+    df['motivo_experto_flag'] = (pd.to_numeric(df['motivo_experto_flag'], errors='coerce').fillna(0) > 0).astype(int)
+    df['flg_experto_flag'] = (pd.to_numeric(df['flg_experto_flag'], errors='coerce').fillna(0) > 0).astype(int)
+    return (
+        df.dropna(subset=['week_start'])
+        .groupby(['week_start', 'REGIONAL', 'motivo_experto_flag', 'flg_experto_flag'])['conversation_id']
+        .nunique()
+        .reset_index(name='conversaciones')
+    )
+
+
+def guardar_tile_autogestion(df_resultados, ruta=RUTA_TILES):
+    """Recalcula y guarda el tile de autogestión (se llama al final del flujo semanal)."""
+    os.makedirs(ruta, exist_ok=True)
+    tile = calcular_tile_autogestion(df_resultados)
+    tile.to_csv(os.path.join(ruta, 'autogestion_semanal.csv'), index=False)
+    print(f"✅ Tile de autogestión actualizado: {len(tile):,} filas en {ruta}")
+    return tile
+
+
+def precalcular_tiles(ruta_trazas, ruta_resultados=None, ruta=RUTA_TILES, refrescar_muestras=True):
+    """
+    Única pasada sobre las trazas crudas: genera y guarda todos los tiles del tablero.
+
+    Args:
+        ruta_trazas: CSV de trazas de Langfuse
+        ruta_resultados: CSV df_resultados (opcional) para el tile de autogestión
+        ruta: Carpeta de salida de los tiles
+        refrescar_muestras: Refrescar también las muestras del modo aproximado
+    """
+    os.makedirs(ruta, exist_ok=True)
+
+    print(f"\n📂 Cargando trazas: {ruta_trazas}")
+    trazas_crudas = pd.read_csv(ruta_trazas)
+    if refrescar_muestras:
+        refrescar_muestra('trazas', trazas_crudas)
+    trazas = preparar_trazas(trazas_crudas)
+    print(f"✅ {len(trazas):,} trazas | errores: {int(trazas['error'].sum()):,}")
+
+    cubo = build_base_cube(trazas)
+    cubo['cells']['date'] = cubo['cells']['date'].astype(str)
+    cubo['sketches']['date'] = cubo['sketches']['date'].astype(str)
+    cubo['cells'].to_csv(os.path.join(ruta, 'cubo_horario_celdas.csv'), index=False)
+    cubo['sketches'].to_csv(os.path.join(ruta, 'cubo_horario_sketches.csv'), index=False)
+
+    celdas_diarias, sketches_diarios = rollup_cube(cubo, DIMENSIONES_DIARIAS)
+    celdas_diarias.to_csv(os.path.join(ruta, 'cubo_diario_celdas.csv'), index=False)
+    sketches_diarios.to_csv(os.path.join(ruta, 'cubo_diario_sketches.csv'), index=False)
+    print(f"✅ Tiles de latencia: {len(celdas_diarias):,} celdas diarias, {len(cubo['cells']):,} celdas horarias")
+
+    if ruta_resultados:
+        print(f"\n📂 Cargando resultados: {ruta_resultados}")
+        resultados = pd.read_csv(ruta_resultados, low_memory=False)
+        guardar_tile_autogestion(resultados, ruta)
+        if refrescar_muestras:
+            refrescar_muestra('resultados', resultados)
+
+
+def refrescar_muestra(nombre, df):
+    """Agrega a la muestra estratificada del modo aproximado las filas aún no ingeridas."""
+    from muestreo_aproximado import RUTA_MUESTRAS, actualizar_muestra
+
+    fuente = actualizar_muestra(nombre, df)
+    print(f"✅ Muestra aproximada '{nombre}': {len(fuente['muestra']):,} filas de "
+          f"{int(fuente['poblacion']['N'].sum()):,} en {RUTA_MUESTRAS}")
+    return fuente
+
+
+# ============================================================
+# CONSULTAS SOBRE TILES
+# ============================================================
+
+def _densificar(cubo, medida='latency'):
+    """
+    Convierte el tile diario a arreglos numpy [fecha, nodo, modelo(, bucket)].
+
+    Con este formato, filtrar por rango de fechas y modelo es un slice + suma,
+    y los cuantiles salen de la suma acumulada de buckets: la respuesta no
+    depende del tamaño de las trazas originales.
+    """
+    celdas = cubo['cells']
+    ejes = {dim: np.array(sorted(celdas[dim].dropna().unique())) for dim in DIMENSIONES_DIARIAS}
+
+    def indices(frame):
+        frame = frame.dropna(subset=DIMENSIONES_DIARIAS)
+        return frame, tuple(np.searchsorted(ejes[d], frame[d].to_numpy()) for d in ('date', 'node_type', 'model'))
+
+    forma = (len(ejes['date']), len(ejes['node_type']), len(ejes['model']))
+    celdas, idx = indices(celdas)
+    aditivas = {}
+    for columna in ['total_calls'] + [f'{m}_{s}' for m in cubo['measures'] for s in ('n', 'sum')]:
+        arreglo = np.zeros(forma)
+        np.add.at(arreglo, idx, celdas[columna].to_numpy(dtype=float))
+        aditivas[columna] = arreglo
+
+    sketches, idx = indices(cubo['sketches'][cubo['sketches']['measure'] == medida])
+    buckets = np.sort(sketches['bucket'].unique())
+    conteos = np.zeros(forma + (len(buckets),), dtype=np.int64)
+    np.add.at(conteos, idx + (np.searchsorted(buckets, sketches['bucket'].to_numpy()),), sketches['count'].to_numpy())
+
+    return {'ejes': ejes, 'aditivas': aditivas, 'conteos': conteos,
+            'valores_bucket': bucket_to_value(buckets)}
+
+
+def _cuantil_denso(conteos, valores_bucket, q):
+    """Cuantil q por celda desde conteos [..., bucket] (misma convención que query_cube)."""
+    total = conteos.sum(axis=-1)
+    acumulado = np.cumsum(conteos, axis=-1)
+    posicion = (acumulado > (q * (total - 1))[..., None]).argmax(axis=-1)
+    return np.where(total > 0, valores_bucket[posicion] if len(valores_bucket) else np.nan, np.nan)
+
+
+class Tablero:
+    """Tiles en memoria; el cubo horario se carga de forma diferida (drill-down)."""
+
+    def __init__(self, ruta=RUTA_TILES):
+        self.ruta = ruta
+        self.diario = self._cargar_cubo('cubo_diario', DIMENSIONES_DIARIAS)
+        self.denso = _densificar(self.diario)
+        self._horario_por_fecha = None
+        ruta_autogestion = os.path.join(ruta, 'autogestion_semanal.csv')
+        self.autogestion = pd.read_csv(ruta_autogestion) if os.path.exists(ruta_autogestion) else None
+        if self.autogestion is not None:
+            # Lógica de 3 grupos de la celda 67
+            self.autogestion['clasificacion'] = np.select(
+                [self.autogestion['motivo_experto_flag'] == 0, self.autogestion['flg_experto_flag'] == 0],
+                ['Conecta Retuvo', 'Puerta experto'],
+                default='Experto',
+            )
+
+    def _cargar_cubo(self, prefijo, dimensiones):
+        tipos = {'date': str, 'model': str, 'node_type': str}
+        celdas = pd.read_csv(os.path.join(self.ruta, f'{prefijo}_celdas.csv'), dtype=tipos)
+        sketches = pd.read_csv(os.path.join(self.ruta, f'{prefijo}_sketches.csv'), dtype=tipos)
+        medidas = [c[:-len('_n')] for c in celdas.columns if c.endswith('_n')]
+        return {'cells': celdas, 'sketches': sketches, 'dimensions': dimensiones,
+                'measures': medidas, 'cache': {}}
+
+    def _horario(self, fecha):
+        """Sub-cubo horario de una fecha; el tile horario se lee e indexa al primer drill-down."""
+        if self._horario_por_fecha is None:
+            cubo = self._cargar_cubo('cubo_horario', ['model', 'node_type', 'date', 'hour'])
+            sketches = cubo['sketches'][cubo['sketches']['measure'] == 'latency']
+            grupos_sketches = dict(tuple(sketches.groupby('date')))
+            self._horario_por_fecha = {
+                f: {**cubo, 'cells': celdas, 'sketches': grupos_sketches.get(f, sketches.iloc[:0])}
+                for f, celdas in cubo['cells'].groupby('date')
+            }
+        vacio = {'cells': pd.DataFrame(), 'sketches': pd.DataFrame()}
+        return self._horario_por_fecha.get(fecha, vacio)
+
+    def opciones(self):
+        fechas = self.denso['ejes']['date']
+        return {
+            'fechas': [fechas[0], fechas[-1]] if len(fechas) else [None, None],
+            'modelos': self.denso['ejes']['model'].tolist(),
+            'regionales': sorted(self.autogestion['REGIONAL'].unique()) if self.autogestion is not None else [],
+        }
+
+    def metricas_diarias(self, desde=None, hasta=None, modelo=None):
+        ejes = self.denso['ejes']
+        inicio = np.searchsorted(ejes['date'], desde, side='left') if desde else 0
+        fin = np.searchsorted(ejes['date'], hasta, side='right') if hasta else len(ejes['date'])
+        modelos = np.flatnonzero(ejes['model'] == modelo) if modelo else slice(None)
+
+        def sumar(arreglo):
+            return arreglo[inicio:fin][:, :, modelos].sum(axis=2)
+
+        llamadas = sumar(self.denso['aditivas']['total_calls'])
+        con_datos = llamadas > 0
+        fechas, nodos = np.nonzero(con_datos)
+        resultado = pd.DataFrame({
+            'date': ejes['date'][inicio:fin][fechas],
+            'node_type': ejes['node_type'][nodos],
+            'total_calls': llamadas[con_datos].astype(int),
+        })
+        aditivas = self.denso['aditivas']
+        if 'latency_n' in aditivas:
+            n = sumar(aditivas['latency_n'])[con_datos]
+            resultado['latency_mean'] = sumar(aditivas['latency_sum'])[con_datos] / np.where(n > 0, n, np.nan)
+            conteos = self.denso['conteos'][inicio:fin][:, :, modelos].sum(axis=2)
+            resultado['latency_p95'] = _cuantil_denso(conteos, self.denso['valores_bucket'], 0.95)[con_datos]
+        if 'error_n' in aditivas:
+            n = sumar(aditivas['error_n'])[con_datos]
+            resultado['error_sum'] = sumar(aditivas['error_sum'])[con_datos]
+            resultado['error_mean'] = resultado['error_sum'] / np.where(n > 0, n, np.nan)
+        return resultado
+
+    def metricas_horarias(self, fecha, modelo=None):
+        cubo = self._horario(fecha)
+        if cubo['cells'].empty:
+            return pd.DataFrame(columns=['hour', 'node_type', 'total_calls', 'latency_mean', 'latency_p95', 'error_sum'])
+        filtros = {'model': modelo} if modelo else None
+        metricas = ['latency_mean', 'latency_p95'] + (['error_sum'] if 'error' in cubo['measures'] else [])
+        return query_cube(cubo, ['hour', 'node_type'], metricas, filtros).sort_values('hour')
+
+    def autogestion_semanal(self, desde=None, hasta=None, regional=None):
+        if self.autogestion is None:
+            return pd.DataFrame()
+        df = self.autogestion
+        if regional:
+            df = df[df['REGIONAL'] == regional]
+        if desde:
+            df = df[df['week_start'] >= desde]
+        if hasta:
+            df = df[df['week_start'] <= hasta]
+
+        resumen = (
+            df.pivot_table(index='week_start', columns='clasificacion', values='conversaciones',
+                           aggfunc='sum', fill_value=0)
+            .reindex(columns=list(COLORES_AUTOGESTION), fill_value=0)
+            .reset_index()
+        )
+        total = resumen[list(COLORES_AUTOGESTION)].sum(axis=1)
+        resumen['autogestion_acida'] = (resumen['Conecta Retuvo'] / total * 100).round(2)
+        resumen['autogestion_confirmada'] = ((resumen['Conecta Retuvo'] + resumen['Puerta experto']) / total * 100).round(2)
+        return resumen
+
+
+# ============================================================
+# FIGURAS (dicts Plotly, sin validación para responder rápido)
+# ============================================================
+
+def _valores(serie):
+    """Lista JSON-serializable (NaN -> None)."""
+    return [None if pd.isna(v) else round(float(v), 3) for v in serie]
+
+
+def _trazas_por_nodo(df, columna, eje_x='date', **propiedades):
+    return [
+        {'name': nodo, 'x': grupo[eje_x].tolist(), 'y': _valores(grupo[columna]), **propiedades}
+        for nodo, grupo in df.groupby('node_type')
+    ]
+
+
+def figuras_tablero(tablero, desde=None, hasta=None, modelo=None, regional=None):
+    # modelo filtra las figuras de trazas; regional sólo la de autogestión (las trazas no tienen REGIONAL)
+    diario = tablero.metricas_diarias(desde, hasta, modelo)
+
+    latencia = {
+        'data': _trazas_por_nodo(diario, 'latency_mean', type='scatter', mode='lines+markers') + [
+            {**traza, 'name': f"{traza['name']} P95"}
+            for traza in _trazas_por_nodo(diario, 'latency_p95', type='scatter', mode='lines',
+                                          line={'dash': 'dash'}, visible='legendonly')
+        ],
+        'layout': {'title': 'Latencia diaria por tipo de nodo (media; P95 en leyenda)',
+                   'yaxis': {'title': 'segundos'},
+                   'shapes': [{'type': 'line', 'xref': 'paper', 'x0': 0, 'x1': 1,
+                               'y0': UMBRAL_SLA_SEGUNDOS, 'y1': UMBRAL_SLA_SEGUNDOS,
+                               'line': {'color': 'red', 'dash': 'dot'}}]},
+    }
+    errores = {
+        'data': _trazas_por_nodo(diario, 'error_sum', type='bar'),
+        'layout': {'title': 'Errores diarios por tipo de nodo', 'barmode': 'stack',
+                   'yaxis': {'title': 'trazas con error'}},
+    }
+    volumen = {
+        'data': _trazas_por_nodo(diario, 'total_calls', type='bar'),
+        'layout': {'title': 'Volumen diario de llamadas por tipo de nodo', 'barmode': 'stack',
+                   'yaxis': {'title': 'llamadas'}},
+    }
+
+    semanal = tablero.autogestion_semanal(desde, hasta, regional)
+    autogestion = {'data': [], 'layout': {
+        'title': f"Autogestión semanal{' - ' + regional if regional else ''}",
+        'barmode': 'stack', 'yaxis': {'title': 'Conversaciones'},
+        'yaxis2': {'title': 'Autogestión (%)', 'overlaying': 'y', 'side': 'right', 'range': [0, 105]},
+    }}
+    if not semanal.empty:
+        x = semanal['week_start'].tolist()
+        autogestion['data'] = [
+            {'type': 'bar', 'name': etiqueta, 'x': x, 'y': _valores(semanal[etiqueta]),
+             'marker': {'color': color}}
+            for etiqueta, color in COLORES_AUTOGESTION.items()
+        ] + [
+            {'type': 'scatter', 'mode': 'lines+markers', 'name': 'Autogestión Ácida (%)', 'yaxis': 'y2',
+             'x': x, 'y': _valores(semanal['autogestion_acida']), 'line': {'color': '#0D47A1'}},
+            {'type': 'scatter', 'mode': 'lines+markers', 'name': 'Autogestión Confirmada (%)', 'yaxis': 'y2',
+             'x': x, 'y': _valores(semanal['autogestion_confirmada']), 'line': {'color': '#B71C1C'}},
+        ]
+
+    return {'latencia': latencia, 'errores': errores, 'volumen': volumen, 'autogestion': autogestion}
+
+
+def figura_detalle(tablero, fecha, modelo=None):
+    horario = tablero.metricas_horarias(fecha, modelo)
+    errores = horario.groupby('hour')['error_sum'].sum()
+    return {
+        'data': _trazas_por_nodo(horario, 'latency_mean', eje_x='hour', type='scatter', mode='lines+markers') + [
+            {'type': 'bar', 'name': 'errores', 'yaxis': 'y2', 'opacity': 0.4,
+             'x': errores.index.tolist(), 'y': _valores(errores)},
+        ],
+        'layout': {'title': f'Detalle horario {fecha}', 'xaxis': {'title': 'hora', 'dtick': 1},
+                   'yaxis': {'title': 'latencia media (s)'},
+                   'yaxis2': {'title': 'errores', 'overlaying': 'y', 'side': 'right'}},
+    }
+
+
+# ============================================================
+# SERVIDOR LOCAL
+# ============================================================
+
+PAGINA = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Tablero Conecta - Latencias y Autogestión</title>
+<script>__PLOTLY_JS__</script>
+<style>
+ body {font-family: sans-serif; margin: 16px;}
+ .filtros {display: flex; gap: 12px; align-items: end; margin-bottom: 12px;}
+ .grid {display: grid; grid-template-columns: 1fr 1fr; gap: 8px;}
+ .grid div {height: 380px;}
+ #tiempo {color: #666; font-size: 12px;}
+</style></head><body>
+<h2>Tablero Conecta: latencias, errores, volumen y autogestión</h2>
+<div class="filtros">
+ <label>Desde<br><input type="date" id="desde"></label>
+ <label>Hasta<br><input type="date" id="hasta"></label>
+ <label>Modelo (latencia, errores, volumen)<br><select id="modelo"><option value="">Todos</option></select></label>
+ <label>Regional (sólo autogestión)<br><select id="regional"><option value="">Todas</option></select></label>
+ <span id="tiempo"></span>
+</div>
+<div class="grid">
+ <div id="latencia"></div><div id="errores"></div>
+ <div id="volumen"></div><div id="autogestion"></div>
+</div>
+<p>Clic en un día de la gráfica de latencia para ver el detalle horario.</p>
+<div id="detalle" style="height: 380px;"></div>
+<script>
+const OPCIONES = __OPCIONES__;
+const $ = (id) => document.getElementById(id);
+$('desde').value = OPCIONES.fechas[0] || '';
+$('hasta').value = OPCIONES.fechas[1] || '';
+for (const m of OPCIONES.modelos) $('modelo').add(new Option(m, m));
+for (const r of OPCIONES.regionales) $('regional').add(new Option(r, r));
+
+function parametros(extra) {
+  const p = new URLSearchParams({desde: $('desde').value, hasta: $('hasta').value,
+                                 modelo: $('modelo').value, regional: $('regional').value});
+  for (const k in (extra || {})) p.set(k, extra[k]);
+  return p.toString();
+}
+
+async function actualizar() {
+  const t0 = performance.now();
+  const r = await (await fetch('/api/tablero?' + parametros())).json();
+  for (const id of ['latencia', 'errores', 'volumen', 'autogestion'])
+    Plotly.react(id, r.figuras[id].data, r.figuras[id].layout);
+  $('tiempo').textContent = `servidor ${r.tiempo_ms} ms | total ${Math.round(performance.now() - t0)} ms`;
+  if (!$('latencia').dataset.click) {
+    $('latencia').on('plotly_click', (ev) => detalle(ev.points[0].x));
+    $('latencia').dataset.click = '1';
+  }
+}
+
+async function detalle(fecha) {
+  const r = await (await fetch('/api/detalle?' + parametros({fecha: fecha}))).json();
+  Plotly.react('detalle', r.figura.data, r.figura.layout);
+}
+
+for (const id of ['desde', 'hasta', 'modelo', 'regional']) $(id).addEventListener('change', actualizar);
+actualizar();
+</script></body></html>
+"""
+
+
+def crear_servidor(tablero, puerto=8050):
+    from plotly.offline import get_plotlyjs
+
+    pagina = (PAGINA.replace('__PLOTLY_JS__', get_plotlyjs())
+              .replace('__OPCIONES__', json.dumps(tablero.opciones())))
+
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, cuerpo, tipo='application/json'):
+            datos = cuerpo.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', f'{tipo}; charset=utf-8')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items() if v and v[0]}
+            inicio = time.perf_counter()
+            if url.path == '/':
+                self._responder(pagina, 'text/html')
+            elif url.path == '/api/tablero':
+                figuras = figuras_tablero(tablero, params.get('desde'), params.get('hasta'),
+                                          params.get('modelo'), params.get('regional'))
+                tiempo = round((time.perf_counter() - inicio) * 1000, 1)
+                self._responder(json.dumps({'figuras': figuras, 'tiempo_ms': tiempo}))
+            elif url.path == '/api/detalle' and 'fecha' in params:
+                figura = figura_detalle(tablero, params['fecha'], params.get('modelo'))
+                tiempo = round((time.perf_counter() - inicio) * 1000, 1)
+                self._responder(json.dumps({'figura': figura, 'tiempo_ms': tiempo}))
+            else:
+                self.send_error(404)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tablero local de latencias y autogestión')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_pre = sub.add_parser('precalcular', help='Genera los tiles desde las trazas y resultados')
+    p_pre.add_argument('--trazas', default='muestra_langfuse.csv')
+    p_pre.add_argument('--resultados', default='df_resultados.csv')
+    p_pre.add_argument('--tiles', default=RUTA_TILES)
+    p_pre.add_argument('--sin-muestras', action='store_true', help='No refrescar las muestras del modo aproximado')
+    p_srv = sub.add_parser('servir', help='Sirve el tablero en http://127.0.0.1:<puerto>')
+    p_srv.add_argument('--puerto', type=int, default=8050)
+    p_srv.add_argument('--tiles', default=RUTA_TILES)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("TABLERO LOCAL: LATENCIAS, ERRORES Y AUTOGESTIÓN")
+    print("=" * 80)
+
+    if args.comando == 'precalcular':
+        precalcular_tiles(args.trazas, args.resultados, args.tiles, refrescar_muestras=not args.sin_muestras)
+    else:
+        servidor = crear_servidor(Tablero(args.tiles), args.puerto)
+        print(f"\n🌐 Tablero disponible en http://127.0.0.1:{args.puerto}  (Ctrl+C para detener)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\n✅ Servidor detenido")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Tablas de dimensión con claves enteras para usuarios, regionales y Genesys.
+
+Normaliza UNA sola vez los correos (strip + lower) y las regionales, asigna
+claves sustitutas int32 estables y las persiste en disco:
+- dim_usuarios.csv  usuario_key, correo, habilitado, regional_key + atributos del usuario
+- dim_regional.csv  regional_key, REGIONAL
+
+Las tablas de hechos (df_merged_final) se unen por usuario_key / regional_key
+en lugar de cadenas, y los conteos de adopción (usuarios_conversaciones,
+df_adopcion) se resuelven como búsquedas por clave.
+
+Uso:
+    python dimensiones_usuarios.py Archivos/Usuarios/regional_concat.csv
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+RUTA_DIMENSIONES = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Dimensiones'
+)
+ARCHIVO_USUARIOS = 'dim_usuarios.csv'
+ARCHIVO_REGIONAL = 'dim_regional.csv'
+
+COLUMNA_CORREO_REGIONAL = 'Correo electrónico'
+ATRIBUTOS_USUARIO = ['Nombre Posición', 'Nombre', 'Nombre Departamento']
+
+# Clave para correos/regionales desconocidos (no presentes en regional_concat)
+SIN_CLAVE = -1
+
+
+def normalizar_correo(serie):
+    """
+    Normaliza correos (strip + lower) procesando cada valor distinto una sola vez.
+
+    Args:
+        serie: Serie de correos (puede contener nulos)
+
+    Returns:
+        Serie: Correos normalizados, mismo índice
+    """
+    unicos = pd.Series(serie.dropna().unique())
+    mapa = dict(zip(unicos, unicos.astype(str).str.strip().str.lower()))
+    return serie.map(mapa)
+
+
+def _vacias():
+    dim_usuarios = pd.DataFrame({
+        'usuario_key': pd.Series(dtype=np.int32),
+        'correo': pd.Series(dtype=object),
+        'habilitado': pd.Series(dtype=bool),
+        'regional_key': pd.Series(dtype=np.int32),
+        **{col: pd.Series(dtype=object) for col in ATRIBUTOS_USUARIO},
+    })
+    dim_regional = pd.DataFrame({
+        'regional_key': pd.Series(dtype=np.int32),
+        'REGIONAL': pd.Series(dtype=object),
+    })
+    return dim_usuarios, dim_regional
+
+
+def cargar_dimensiones(ruta=RUTA_DIMENSIONES):
+    """
+    Carga las dimensiones persistidas (o tablas vacías si aún no existen).
+
+    Returns:
+        tuple: (dim_usuarios, dim_regional)
+    """
+    ruta_usuarios = os.path.join(ruta, ARCHIVO_USUARIOS)
+    ruta_regional = os.path.join(ruta, ARCHIVO_REGIONAL)
+    if not (os.path.exists(ruta_usuarios) and os.path.exists(ruta_regional)):
+        return _vacias()
+
+    dim_usuarios = pd.read_csv(ruta_usuarios, dtype={'usuario_key': np.int32, 'regional_key': np.int32})
+    dim_regional = pd.read_csv(ruta_regional, dtype={'regional_key': np.int32})
+    dim_usuarios['habilitado'] = dim_usuarios['habilitado'].astype(bool)
+    return dim_usuarios, dim_regional
+
+
+def guardar_dimensiones(dim_usuarios, dim_regional, ruta=RUTA_DIMENSIONES):
+    os.makedirs(ruta, exist_ok=True)
+    dim_usuarios.to_csv(os.path.join(ruta, ARCHIVO_USUARIOS), index=False)
+    dim_regional.to_csv(os.path.join(ruta, ARCHIVO_REGIONAL), index=False)
+
+
+def _asignar_nuevas_claves(existentes, valores, columna_clave):
+    """Claves para valores nuevos, continuando desde la última clave asignada."""
+    siguiente = int(existentes[columna_clave].max()) + 1 if len(existentes) else 0
+    return np.arange(siguiente, siguiente + len(valores), dtype=np.int32)
+
+
+def actualizar_dimensiones(regional_concat, correos_conversaciones=None, ruta=RUTA_DIMENSIONES, guardar=True):
+    """
+    Actualiza las dimensiones con el último regional_concat y los correos vistos en conversaciones.
+
+    Las claves existentes se conservan; sólo se agregan claves para correos y
+    regionales nuevos. Los usuarios que ya no están en regional_concat quedan
+    con habilitado=False.
+
+    Args:
+        regional_concat: DataFrame de usuarios habilitados (Correo electrónico, REGIONAL, ...)
+        correos_conversaciones: Serie opcional de correos de las conversaciones
+                                (usuarios que usan Conecta sin estar en regional_concat)
+        ruta: Carpeta donde se persisten las dimensiones
+        guardar: Si True, escribe las dimensiones actualizadas en disco
+
+    Returns:
+        tuple: (dim_usuarios, dim_regional)
+    """
+    dim_usuarios, dim_regional = cargar_dimensiones(ruta)
+
+    usuarios = regional_concat.copy()
+    usuarios['correo'] = normalizar_correo(usuarios[COLUMNA_CORREO_REGIONAL])
+    usuarios = usuarios.dropna(subset=['correo']).drop_duplicates(subset=['correo'], keep='first')
+    usuarios['REGIONAL'] = usuarios['REGIONAL'].astype('string').str.strip()
+
+    # --- Dimensión regional ---
+    regionales = usuarios['REGIONAL'].dropna().unique()
+    nuevas = [r for r in regionales if r not in set(dim_regional['REGIONAL'])]
+    if nuevas:
+        dim_regional = pd.concat([dim_regional, pd.DataFrame({
+            'regional_key': _asignar_nuevas_claves(dim_regional, nuevas, 'regional_key'),
+            'REGIONAL': nuevas,
+        })], ignore_index=True)
+    mapa_regional = dict(zip(dim_regional['REGIONAL'], dim_regional['regional_key']))
+    usuarios['regional_key'] = usuarios['REGIONAL'].map(mapa_regional).fillna(SIN_CLAVE).astype(np.int32)
+
+    # --- Dimensión usuarios ---
+    todos = usuarios['correo']
+    if correos_conversaciones is not None:
+        todos = pd.concat([todos, normalizar_correo(pd.Series(correos_conversaciones)).dropna()])
+    nuevos = [c for c in pd.unique(todos) if c not in set(dim_usuarios['correo'])]
+    if nuevos:
+        dim_usuarios = pd.concat([dim_usuarios, pd.DataFrame({
+            'usuario_key': _asignar_nuevas_claves(dim_usuarios, nuevos, 'usuario_key'),
+            'correo': nuevos,
+        })], ignore_index=True)
+
+    # Atributos vigentes según el regional_concat actual
+    atributos = usuarios.set_index('correo')[['regional_key'] + ATRIBUTOS_USUARIO]
+    dim_usuarios = dim_usuarios.drop(columns=['habilitado', 'regional_key'] + ATRIBUTOS_USUARIO, errors='ignore')
+    dim_usuarios = dim_usuarios.join(atributos, on='correo')
+    dim_usuarios['habilitado'] = dim_usuarios['correo'].isin(atributos.index)
+    dim_usuarios['regional_key'] = dim_usuarios['regional_key'].fillna(SIN_CLAVE).astype(np.int32)
+    dim_usuarios['usuario_key'] = dim_usuarios['usuario_key'].astype(np.int32)
+    dim_usuarios = dim_usuarios[['usuario_key', 'correo', 'habilitado', 'regional_key'] + ATRIBUTOS_USUARIO]
+    dim_regional['regional_key'] = dim_regional['regional_key'].astype(np.int32)
+
+    if guardar:
+        guardar_dimensiones(dim_usuarios, dim_regional, ruta)
+    return dim_usuarios, dim_regional
+
+
+def claves_usuario(dim_usuarios, correos):
+    """
+    Traduce correos (sin normalizar) a usuario_key int32.
+
+    Returns:
+        np.ndarray[int32]: Clave por correo (SIN_CLAVE si no está en la dimensión)
+    """
+    mapa = pd.Series(dim_usuarios['usuario_key'].to_numpy(), index=dim_usuarios['correo'])
+    return normalizar_correo(pd.Series(correos)).map(mapa).fillna(SIN_CLAVE).to_numpy(dtype=np.int32)
+
+
+def enriquecer_con_usuarios(df, dim_usuarios, dim_regional, columna_correo='correo'):
+    """
+    Agrega usuario_key, regional_key y REGIONAL a la tabla de hechos por búsqueda de clave.
+
+    Reemplaza el merge por cadena contra regional_concat: el correo se normaliza
+    una vez, y REGIONAL se adjunta desde dim_regional por regional_key.
+
+    Args:
+        df: Tabla de hechos (p. ej. df_merged_1)
+        dim_usuarios, dim_regional: Dimensiones de actualizar_dimensiones
+        columna_correo: Columna con el correo del usuario
+
+    Returns:
+        DataFrame: Copia de df con correo normalizado y las columnas de clave
+    """
+    df = df.copy()
+    df[columna_correo] = normalizar_correo(df[columna_correo])
+    df['usuario_key'] = claves_usuario(dim_usuarios, df[columna_correo])
+
+    regional_por_usuario = np.full(int(dim_usuarios['usuario_key'].max()) + 1 if len(dim_usuarios) else 0,
+                                   SIN_CLAVE, dtype=np.int32)
+    regional_por_usuario[dim_usuarios['usuario_key'].to_numpy()] = dim_usuarios['regional_key'].to_numpy()
+    tiene_usuario = df['usuario_key'].to_numpy() != SIN_CLAVE
+    regional_key = np.full(len(df), SIN_CLAVE, dtype=np.int32)
+    regional_key[tiene_usuario] = regional_por_usuario[df['usuario_key'].to_numpy()[tiene_usuario]]
+    df['regional_key'] = regional_key
+
+    df['REGIONAL'] = pd.Series(regional_key, index=df.index).map(
+        dict(zip(dim_regional['regional_key'], dim_regional['REGIONAL']))
+    )
+    return df
+
+
+def unir_genesys(df, experto_conecta2, columna_conversacion='fk_tbl_conversaciones_conecta2', columnas=('flg_experto',)):
+    """
+    Une la exportación de Genesys por clave entera de conversación (NRO_IP_USUARIO).
+
+    flg_experto = 1 si ESTADO_INTERACCION no es nulo; 0 para conversaciones sin
+    registro en Genesys. Sólo se traen las columnas indicadas para no inflar el
+    DataFrame de hechos con todo el export.
+
+    Args:
+        df: Tabla de hechos con la columna de conversación
+        experto_conecta2: Export de Genesys
+        columna_conversacion: Columna de df con el id de la conversación
+        columnas: Columnas de Genesys a adjuntar (None = todas)
+
+    Returns:
+        DataFrame: df con las columnas de Genesys y flg_experto entero
+    """
+    genesys = experto_conecta2.copy()
+    genesys['flg_experto'] = np.where(genesys['ESTADO_INTERACCION'].notna(), 1, 0)
+    genesys['_conversacion_key'] = pd.to_numeric(genesys['NRO_IP_USUARIO'], errors='coerce')
+    genesys = genesys.dropna(subset=['_conversacion_key'])
+    genesys['_conversacion_key'] = genesys['_conversacion_key'].astype(np.int32)
+    if columnas is not None:
+        genesys = genesys[['_conversacion_key'] + list(columnas)]
+
+    df = df.copy()
+    df['_conversacion_key'] = pd.to_numeric(df[columna_conversacion], errors='coerce').fillna(SIN_CLAVE).astype(np.int32)
+    df = df.merge(genesys, on='_conversacion_key', how='left', suffixes=('', '_genesys'))
+    df['flg_experto'] = df['flg_experto'].fillna(0).astype(int)
+    return df.drop(columns=['_conversacion_key'])
+
+
+def conteo_conversaciones_usuario(df, dim_usuarios, dim_regional, columna_conversacion='fk_tbl_conversaciones_conecta2'):
+    """
+    Conversaciones únicas por usuario habilitado (usuarios_conversaciones).
+
+    Mantiene el formato de conteo_conversaciones_usuario.csv: columnas de
+    regional_concat + correo (nulo si no tiene conversaciones) + conversaciones_unicas.
+    """
+    hechos = df.loc[df['usuario_key'] != SIN_CLAVE, ['usuario_key', columna_conversacion]]
+    conteo = hechos.drop_duplicates().groupby('usuario_key').size()
+
+    usuarios = dim_usuarios[dim_usuarios['habilitado']].copy()
+    usuarios['conversaciones_unicas'] = usuarios['usuario_key'].map(conteo).fillna(0).astype(int)
+    usuarios['REGIONAL'] = usuarios['regional_key'].map(
+        dict(zip(dim_regional['regional_key'], dim_regional['REGIONAL']))
+    )
+    usuarios[COLUMNA_CORREO_REGIONAL] = usuarios['correo']
+    usuarios['correo'] = usuarios['correo'].where(usuarios['conversaciones_unicas'] > 0)
+    return usuarios[[COLUMNA_CORREO_REGIONAL] + ATRIBUTOS_USUARIO + ['REGIONAL', 'correo', 'conversaciones_unicas']].reset_index(drop=True)
+
+
+def adopcion_por_regional(df, dim_usuarios, dim_regional):
+    """
+    Usuarios habilitados vs usuarios que usaron Conecta por regional (df_adopcion).
+
+    Returns:
+        DataFrame: REGIONAL, Usuarios Habilitados, Usuarios que Usaron (orden alfabético)
+    """
+    habilitados = dim_usuarios[dim_usuarios['habilitado'] & (dim_usuarios['regional_key'] != SIN_CLAVE)]
+    conteo_habilitados = habilitados.groupby('regional_key')['usuario_key'].nunique()
+
+    hechos = df.loc[(df['usuario_key'] != SIN_CLAVE) & (df['regional_key'] != SIN_CLAVE), ['regional_key', 'usuario_key']]
+    conteo_activos = hechos.drop_duplicates().groupby('regional_key').size()
+
+    df_adopcion = dim_regional[dim_regional['regional_key'].isin(conteo_habilitados.index)].copy()
+    df_adopcion['Usuarios Habilitados'] = df_adopcion['regional_key'].map(conteo_habilitados).astype(int)
+    df_adopcion['Usuarios que Usaron'] = df_adopcion['regional_key'].map(conteo_activos).fillna(0).astype(int)
+    df_adopcion['REGIONAL'] = df_adopcion['REGIONAL'].astype(str)
+    return (df_adopcion.drop(columns=['regional_key'])
+            .sort_values('REGIONAL')
+            .reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    ruta_regional = sys.argv[1] if len(sys.argv) > 1 else os.path.join('Archivos', 'Usuarios', 'regional_concat.csv')
+
+    print("=" * 80)
+    print("DIMENSIONES DE USUARIOS Y REGIONALES")
+    print("=" * 80)
+
+    regional_concat = pd.read_csv(ruta_regional, sep=',')
+    dim_usuarios, dim_regional = actualizar_dimensiones(regional_concat)
+
+    print(f"\n✅ Dimensiones guardadas en {RUTA_DIMENSIONES}")
+    print(f"   Usuarios: {len(dim_usuarios):,} ({int(dim_usuarios['habilitado'].sum()):,} habilitados)")
+    print(f"   Regionales: {len(dim_regional):,}")
+    print("\n📊 Usuarios habilitados por regional:")
+    print(dim_usuarios[dim_usuarios['habilitado']]
+          .merge(dim_regional, on='regional_key')
+          .groupby('REGIONAL').size().to_string())
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Motor incremental de frecuencias de términos (n-gramas) sobre la columna `pregunta`.
+
+Reemplaza el conteo único de flujo (celdas 75-76: normalizar_pregunta fila a
+fila + value_counts) por tablas de conteo diarias persistentes:
+
+- Normalización vectorizada (pandas .str) aplicada sólo a preguntas únicas:
+  minúsculas, sin tildes, sin puntuación, sin stopwords (misma lógica que
+  normalizar_pregunta).
+- Tokenización con hash: cada término (pregunta completa, unigrama o bigrama)
+  se identifica por un hash de 64 bits; el texto se guarda una sola vez en el
+  vocabulario.
+- Una tabla por día (fecha × REGIONAL × category × n-grama × hash → conteo) en
+  Archivos/Terminos/conteos/. Cada corrida sólo tokeniza los días nuevos (y
+  rehace el último día guardado por si estaba incompleto).
+- Consultas sin re-escanear el histórico: top de términos por semana /
+  regional / categoría y términos emergentes frente a la semana anterior.
+
+n-grama 0 = pregunta normalizada completa (equivale a `conteo_preguntas`),
+1 = palabras, 2 = bigramas. Las filas sin fecha no entran en las tablas diarias.
+
+category sólo existe después de clasificar: en flujo los conteos se guardan
+primero con 'SIN DATO' y se rehacen con recalcular=True una vez unidas las
+etiquetas.
+
+Uso:
+    python frecuencia_terminos.py actualizar interacciones.csv [--columna-fecha fecha_hora_inicio]
+    python frecuencia_terminos.py top --ngrama 1 --por semana REGIONAL --n 10
+    python frecuencia_terminos.py emergentes [--semana 2025-11-10]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RUTA_TERMINOS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Terminos'
+)
+DIMENSIONES = ['REGIONAL', 'category']
+SIN_DATO = 'SIN DATO'
+NGRAMAS = (0, 1, 2)
+
+# Respaldo si nltk no está instalado (subconjunto de stopwords('spanish'))
+_STOPWORDS_RESPALDO = {
+    'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'del', 'se', 'las', 'por', 'un', 'para', 'con',
+    'no', 'una', 'su', 'al', 'lo', 'como', 'mas', 'pero', 'sus', 'le', 'ya', 'o', 'este', 'si',
+    'porque', 'esta', 'entre', 'cuando', 'muy', 'sin', 'sobre', 'tambien', 'me', 'hasta', 'hay',
+    'donde', 'quien', 'desde', 'todo', 'nos', 'durante', 'todos', 'uno', 'les', 'ni', 'contra',
+    'otros', 'ese', 'eso', 'ante', 'ellos', 'e', 'esto', 'mi', 'antes', 'algunos', 'que', 'unos',
+    'yo', 'otro', 'otras', 'otra', 'el', 'tanto', 'esa', 'estos', 'mucho', 'quienes', 'nada',
+    'muchos', 'cual', 'poco', 'ella', 'estar', 'estas', 'algunas', 'algo', 'nosotros', 'mis', 'tu',
+    'te', 'ti', 'tus', 'es', 'son', 'fue', 'ser', 'ha', 'he', 'hace', 'puedo', 'puede', 'tengo',
+}
+
+
+def cargar_stopwords():
+    """Stopwords en español de nltk (como en flujo); respaldo embebido si nltk no está disponible."""
+    try:
+        import nltk
+        try:
+            nltk.data.find('corpora/stopwords')
+        except LookupError:
+            nltk.download('stopwords', quiet=True)
+        from nltk.corpus import stopwords
+        return set(stopwords.words('spanish'))
+    except Exception:
+        return set(_STOPWORDS_RESPALDO)
+
+
+# ============================================================
+# NORMALIZACIÓN Y TOKENIZACIÓN VECTORIZADAS
+# ============================================================
+
+def normalizar_preguntas(preguntas, stop_words=None):
+    """
+    Versión vectorizada de normalizar_pregunta (flujo, celda 75).
+
+    Args:
+        preguntas: Serie de texto
+        stop_words: Conjunto de stopwords (None = cargar_stopwords())
+
+    Returns:
+        Serie: Pregunta normalizada (mismo índice)
+    """
+    stop_words = cargar_stopwords() if stop_words is None else stop_words
+    # Se normaliza cada texto distinto una sola vez
+    codigos, unicas = pd.factorize(preguntas.fillna('').astype(str))
+    texto = pd.Series(unicas, dtype=object).str.lower()
+    # NFD + eliminación de marcas combinantes (tildes, diéresis)
+    texto = texto.str.normalize('NFD').str.replace(r'[\u0300-\u036f]', '', regex=True)
+    texto = texto.str.replace(r'[^\w\s]', '', regex=True)
+
+    palabras = texto.str.split().explode()
+    palabras = palabras[palabras.notna() & ~palabras.isin(stop_words)]
+    normalizadas = palabras.groupby(level=0).agg(' '.join).reindex(range(len(unicas)), fill_value='')
+    return pd.Series(normalizadas.to_numpy()[codigos], index=preguntas.index)
+
+
+def hash_terminos(terminos):
+    """Hash estable de 64 bits por término (pandas.util.hash_array)."""
+    return pd.util.hash_array(np.asarray(terminos, dtype=object), categorize=False).astype(np.uint64)
+
+
+def _ngramas(normalizadas):
+    """
+    Términos de cada pregunta normalizada única.
+
+    Returns:
+        DataFrame: fila (posición en normalizadas), ngrama, termino
+    """
+    partes = [pd.DataFrame({'fila': np.arange(len(normalizadas)), 'ngrama': 0,
+                            'termino': normalizadas.to_numpy()})]
+    palabras = normalizadas.str.split().explode().dropna()
+    filas = palabras.index.to_numpy()
+    tokens = palabras.to_numpy(dtype=object)
+    partes.append(pd.DataFrame({'fila': filas, 'ngrama': 1, 'termino': tokens}))
+    if len(tokens) > 1:
+        misma = filas[1:] == filas[:-1]
+        bigramas = pd.Series(tokens[:-1][misma]) + ' ' + pd.Series(tokens[1:][misma])
+        partes.append(pd.DataFrame({'fila': filas[:-1][misma], 'ngrama': 2, 'termino': bigramas.to_numpy()}))
+    return pd.concat(partes, ignore_index=True)
+
+
+def contar_terminos(df, columna_fecha='fecha_hora_inicio', columna_pregunta='pregunta',
+                    dimensiones=DIMENSIONES, stop_words=None):
+    """
+    Tabla de conteos fecha × dimensiones × n-grama × hash.
+
+    Returns:
+        tuple: (conteos, vocabulario DataFrame hash/ngrama/termino)
+    """
+    datos = pd.DataFrame({
+        'fecha': pd.to_datetime(df[columna_fecha], format='mixed', errors='coerce').dt.strftime('%Y-%m-%d'),
+        'pregunta': normalizar_preguntas(df[columna_pregunta], stop_words),
+    })
+    for dim in dimensiones:
+        datos[dim] = df[dim].fillna(SIN_DATO).astype(str) if dim in df.columns else SIN_DATO
+    datos = datos.dropna(subset=['fecha'])
+
+    # Conteo por pregunta normalizada y luego expansión a términos (pondera por conteo)
+    claves = ['fecha'] + list(dimensiones)
+    preguntas = datos.groupby(claves + ['pregunta'], sort=False).size().reset_index(name='conteo')
+    codigos, unicas = pd.factorize(preguntas['pregunta'])
+    terminos = _ngramas(pd.Series(unicas, dtype=object))
+    terminos['hash'] = hash_terminos(terminos['termino'])
+
+    expandido = pd.DataFrame({'pos': np.arange(len(preguntas)), 'fila': codigos}).merge(terminos, on='fila')
+    conteos = (
+        preguntas[claves + ['conteo']].iloc[expandido['pos']].reset_index(drop=True)
+        .assign(ngrama=expandido['ngrama'].to_numpy(), hash=expandido['hash'].to_numpy())
+        .groupby(claves + ['ngrama', 'hash'], sort=False)['conteo'].sum().reset_index()
+    )
+    vocabulario = terminos.drop_duplicates('hash')[['hash', 'ngrama', 'termino']]
+    return conteos, vocabulario
+
+
+# ============================================================
+# ALMACÉN DE TABLAS DIARIAS
+# ============================================================
+
+def cargar_almacen(ruta=RUTA_TERMINOS, dimensiones=DIMENSIONES):
+    """
+    Abre (o crea vacío) el almacén de conteos diarios.
+
+    Returns:
+        dict: ruta, manifest (días, códigos de dimensiones), vocabulario, cache
+    """
+    os.makedirs(os.path.join(ruta, 'conteos'), exist_ok=True)
+    ruta_manifest = os.path.join(ruta, 'manifest.json')
+    if os.path.exists(ruta_manifest):
+        with open(ruta_manifest, encoding='utf-8') as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'dimensiones': {dim: [] for dim in dimensiones}, 'dias': {}}
+
+    ruta_vocab = os.path.join(ruta, 'vocabulario.csv')
+    if os.path.exists(ruta_vocab):
+        vocab = pd.read_csv(ruta_vocab, dtype={'hash': np.uint64, 'termino': str}, keep_default_na=False)
+    else:
+        vocab = pd.DataFrame({'hash': np.array([], dtype=np.uint64), 'ngrama': [], 'termino': []})
+    return {'ruta': ruta, 'manifest': manifest, 'vocabulario': vocab, 'cache': {}}
+
+
+def _guardar_manifest(almacen):
+    ruta_manifest = os.path.join(almacen['ruta'], 'manifest.json')
+    with open(ruta_manifest + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(almacen['manifest'], f, indent=2, ensure_ascii=False)
+    os.replace(ruta_manifest + '.tmp', ruta_manifest)
+
+
+def _codificar(almacen, dim, valores):
+    catalogo = almacen['manifest']['dimensiones'][dim]
+    posiciones = {v: i for i, v in enumerate(catalogo)}
+    for valor in pd.unique(valores):
+        if valor not in posiciones:
+            posiciones[valor] = len(catalogo)
+            catalogo.append(valor)
+    return valores.map(posiciones).to_numpy(dtype=np.int32)
+
+
+def actualizar_conteos(df, almacen=None, columna_fecha='fecha_hora_inicio', columna_pregunta='pregunta',
+                       recalcular=False, stop_words=None):
+    """
+    Incorpora al almacén los días nuevos de df.
+
+    Sólo se tokenizan los días que no están guardados, más el último día
+    guardado (pudo quedar incompleto). Con recalcular=True se reemplazan todos
+    los días presentes en df (p. ej. tras asignar category): df debe traer todas
+    las filas de esos días, no sólo las nuevas.
+
+    Returns:
+        dict: Almacén actualizado
+    """
+    almacen = almacen or cargar_almacen()
+    dimensiones = list(almacen['manifest']['dimensiones'])
+    dias_guardados = almacen['manifest']['dias']
+
+    fechas = pd.to_datetime(df[columna_fecha], format='mixed', errors='coerce').dt.strftime('%Y-%m-%d')
+    if not recalcular and dias_guardados:
+        ultimo = max(dias_guardados)
+        df = df[~fechas.isin([d for d in dias_guardados if d != ultimo])]
+        fechas = fechas.loc[df.index]
+    sin_fecha = int(fechas.isna().sum())
+    if df.empty:
+        print("✅ Conteos de términos al día (sin días nuevos)")
+        return almacen
+
+    conteos, vocab_nuevo = contar_terminos(df, columna_fecha, columna_pregunta, dimensiones, stop_words)
+
+    vocab = almacen['vocabulario']
+    vocab_nuevo = vocab_nuevo[~vocab_nuevo['hash'].isin(vocab['hash'])]
+    if len(vocab_nuevo):
+        ruta_vocab = os.path.join(almacen['ruta'], 'vocabulario.csv')
+        vocab_nuevo.to_csv(ruta_vocab, mode='a', header=not os.path.exists(ruta_vocab), index=False)
+        almacen['vocabulario'] = pd.concat([vocab, vocab_nuevo], ignore_index=True)
+
+    for dim in dimensiones:
+        conteos[dim] = _codificar(almacen, dim, conteos[dim])
+    for fecha, tabla in conteos.groupby('fecha', sort=True):
+        np.savez_compressed(
+            os.path.join(almacen['ruta'], 'conteos', f'{fecha}.npz'),
+            hash=tabla['hash'].to_numpy(np.uint64), ngrama=tabla['ngrama'].to_numpy(np.int8),
+            conteo=tabla['conteo'].to_numpy(np.int64),
+            **{dim: tabla[dim].to_numpy(np.int32) for dim in dimensiones},
+        )
+        dias_guardados[fecha] = int(tabla.loc[tabla['ngrama'] == 0, 'conteo'].sum())
+        almacen['cache'].pop(fecha, None)
+    _guardar_manifest(almacen)
+
+    dias = conteos['fecha'].nunique()
+    print(f"✅ Conteos actualizados: {dias} día(s), {len(vocab_nuevo):,} términos nuevos en el vocabulario"
+          + (f" ({sin_fecha} preguntas sin fecha omitidas)" if sin_fecha else ''))
+    return almacen
+
+
+def _tabla_dia(almacen, fecha):
+    if fecha not in almacen['cache']:
+        with np.load(os.path.join(almacen['ruta'], 'conteos', f'{fecha}.npz')) as datos:
+            tabla = pd.DataFrame({k: datos[k] for k in datos.files})
+        tabla['fecha'] = fecha
+        almacen['cache'][fecha] = tabla
+    return almacen['cache'][fecha]
+
+
+def _semana(fechas):
+    fechas = pd.to_datetime(fechas)
+    return (fechas - pd.to_timedelta(fechas.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+
+
+def cargar_conteos(almacen, desde=None, hasta=None, ngrama=None, filtros=None):
+    """
+    Une las tablas diarias de un rango (con dimensiones decodificadas y columna semana).
+
+    Args:
+        desde, hasta: 'YYYY-MM-DD' inclusivos
+        ngrama: 0, 1, 2 o None (todos)
+        filtros: {dimension: valor o lista}
+    """
+    dias = sorted(d for d in almacen['manifest']['dias']
+                  if (desde is None or d >= desde) and (hasta is None or d <= hasta))
+    if not dias:
+        return pd.DataFrame(columns=['fecha', 'semana', 'ngrama', 'hash', 'conteo'])
+    tabla = pd.concat([_tabla_dia(almacen, d) for d in dias], ignore_index=True)
+    if ngrama is not None:
+        tabla = tabla[tabla['ngrama'] == ngrama]
+    for dim, catalogo in almacen['manifest']['dimensiones'].items():
+        tabla[dim] = np.asarray(catalogo, dtype=object)[tabla[dim].to_numpy()] if len(tabla) else []
+    for dim, valor in (filtros or {}).items():
+        tabla = tabla[tabla[dim].isin(valor if isinstance(valor, (list, tuple, set)) else [valor])]
+    tabla['semana'] = _semana(tabla['fecha']) if len(tabla) else []
+    return tabla
+
+
+def _con_terminos(almacen, tabla):
+    vocab = almacen['vocabulario'].drop_duplicates('hash').set_index('hash')['termino']
+    return tabla.assign(termino=tabla['hash'].map(vocab))
+
+
+# ============================================================
+# CONSULTAS
+# ============================================================
+
+def top_terminos(almacen, ngrama=1, por=None, n=20, desde=None, hasta=None, filtros=None):
+    """
+    Términos más frecuentes por grupo.
+
+    Args:
+        ngrama: 0 (pregunta completa), 1 (palabras) o 2 (bigramas)
+        por: Columnas de agrupación (semana, fecha, REGIONAL, category)
+        n: Top por grupo (None = todos)
+
+    Returns:
+        DataFrame: [por...], termino, conteo (ordenado desc dentro de cada grupo)
+    """
+    por = list(por or [])
+    tabla = cargar_conteos(almacen, desde, hasta, ngrama, filtros)
+    agregado = tabla.groupby(por + ['hash'], sort=False)['conteo'].sum().reset_index()
+    agregado = agregado.sort_values(por + ['conteo'], ascending=[True] * len(por) + [False], kind='stable')
+    if n is not None:
+        agregado = agregado.groupby(por).head(n) if por else agregado.head(n)
+    return _con_terminos(almacen, agregado)[por + ['termino', 'conteo']].reset_index(drop=True)
+
+
+def conteo_preguntas(almacen, desde=None, hasta=None, filtros=None):
+    """Equivalente a df['pregunta_normalizada'].value_counts() de flujo (celda 75), sin las filas sin fecha."""
+    top = top_terminos(almacen, ngrama=0, n=None, desde=desde, hasta=hasta, filtros=filtros)
+    return top.set_index('termino')['conteo'].rename('count').rename_axis('pregunta_normalizada')
+
+
+def terminos_emergentes(almacen, semana=None, ngrama=1, n=20, min_conteo=5, por=None, filtros=None):
+    """
+    Términos que más crecen frente a la semana anterior.
+
+    El crecimiento compara la participación del término en cada semana
+    (suavizado +1) para no confundir más volumen total con un tema emergente.
+
+    Args:
+        semana: Lunes 'YYYY-MM-DD' de la semana a evaluar (None = última semana con datos)
+        min_conteo: Conteo mínimo en la semana evaluada
+
+    Returns:
+        DataFrame: [por...], termino, conteo, conteo_anterior, crecimiento (veces), nuevo
+    """
+    por = list(por or [])
+    dias = sorted(almacen['manifest']['dias'])
+    if not dias:
+        return pd.DataFrame()
+    semana = semana or _semana(pd.Series([dias[-1]])).iloc[0]
+    inicio = pd.Timestamp(semana)
+    anterior = (inicio - pd.Timedelta(days=7)).strftime('%Y-%m-%d')
+    fin = (inicio + pd.Timedelta(days=6)).strftime('%Y-%m-%d')
+
+    tabla = cargar_conteos(almacen, anterior, fin, ngrama, filtros)
+    tabla['periodo'] = np.where(tabla['semana'] == semana, 'conteo', 'conteo_anterior')
+    pivote = tabla.pivot_table(index=por + ['hash'], columns='periodo', values='conteo',
+                               aggfunc='sum', fill_value=0).reset_index().rename_axis(columns=None)
+    for columna in ('conteo', 'conteo_anterior'):
+        if columna not in pivote.columns:
+            pivote[columna] = 0
+
+    totales = pivote.groupby(por)[['conteo', 'conteo_anterior']].transform('sum') if por \
+        else pivote[['conteo', 'conteo_anterior']].sum()
+    participacion = (pivote['conteo'] + 1) / (totales['conteo'] + 1)
+    participacion_anterior = (pivote['conteo_anterior'] + 1) / (totales['conteo_anterior'] + 1)
+    pivote['crecimiento'] = (participacion / participacion_anterior).round(2)
+    pivote['nuevo'] = pivote['conteo_anterior'] == 0
+
+    emergentes = pivote[pivote['conteo'] >= min_conteo].sort_values(
+        por + ['crecimiento', 'conteo'], ascending=[True] * len(por) + [False, False])
+    emergentes = emergentes.groupby(por).head(n) if por else emergentes.head(n)
+    columnas = por + ['termino', 'conteo', 'conteo_anterior', 'crecimiento', 'nuevo']
+    return _con_terminos(almacen, emergentes)[columnas].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Frecuencias incrementales de términos en preguntas')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_a = sub.add_parser('actualizar', help='Agrega los días nuevos de un CSV de interacciones')
+    p_a.add_argument('csv')
+    p_a.add_argument('--columna-fecha', default='fecha_hora_inicio')
+    p_a.add_argument('--recalcular', action='store_true')
+    p_t = sub.add_parser('top', help='Top de términos por grupo')
+    p_t.add_argument('--ngrama', type=int, default=1, choices=NGRAMAS)
+    p_t.add_argument('--por', nargs='*', default=['semana'])
+    p_t.add_argument('--n', type=int, default=10)
+    p_t.add_argument('--desde')
+    p_t.add_argument('--hasta')
+    p_e = sub.add_parser('emergentes', help='Términos emergentes vs la semana anterior')
+    p_e.add_argument('--semana')
+    p_e.add_argument('--ngrama', type=int, default=1, choices=NGRAMAS)
+    p_e.add_argument('--n', type=int, default=20)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("FRECUENCIA DE TÉRMINOS EN PREGUNTAS")
+    print("=" * 80)
+
+    almacen = cargar_almacen()
+    if args.comando == 'actualizar':
+        actualizar_conteos(pd.read_csv(args.csv, low_memory=False), almacen,
+                           columna_fecha=args.columna_fecha, recalcular=args.recalcular)
+        print(f"   Días en el almacén: {len(almacen['manifest']['dias']):,} | "
+              f"Vocabulario: {len(almacen['vocabulario']):,} términos")
+    elif args.comando == 'top':
+        tabla = top_terminos(almacen, args.ngrama, args.por, args.n, args.desde, args.hasta)
+        print(tabla.to_string(index=False))
+    else:
+        tabla = terminos_emergentes(almacen, args.semana, args.ngrama, args.n)
+        print(tabla.to_string(index=False))
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Índice persistente de conversation_id ya evaluados (Conecta+).
+
+Reemplaza la recarga de df_resultados.csv / resultados_paralelo_parcial.csv
+y los filtros `isin` para decidir qué conversaciones faltan por clasificar.
+
+Se mantienen dos índices independientes:
+- RUTA_INDICE (consolidados): ids ya guardados en df_resultados. De aquí sale df_nuevos.
+- RUTA_INDICE_CLASIFICADOS: ids con resultado en resultados_paralelo_parcial.csv
+  (corridas parciales). De aquí salen los pendientes a enviar al modelo.
+
+Estructura en disco de cada índice:
+- manifest.json            versiones registradas (etiqueta, archivo, ids nuevos, fecha)
+                           y el nombre del bitmap vigente
+- delta_0001_<etiqueta>.npy ids NUEVOS de cada snapshot (int64 ordenado, único)
+- bitmap_0001.npy          unión materializada de los deltas hasta esa versión (1 bit por id)
+
+El bitmap se abre con memmap y la pertenencia de un id es O(1):
+bitmap[id >> 3] & (1 << (id & 7)). Cada corrida semanal agrega sólo un delta
+pequeño en lugar de una copia completa del CSV histórico. Delta y bitmap se
+escriben (con fsync) antes que el manifest, y el bitmap de cada versión es un
+archivo nuevo: si la corrida se corta a mitad, el manifest sigue apuntando al
+bitmap anterior, que es consistente con sus deltas.
+
+Uso:
+    python indice_evaluados.py init df_resultados.csv [otros.csv ...]
+    python indice_evaluados.py init resultados_paralelo_parcial.csv --clasificados
+    python indice_evaluados.py agregar resultados_paralelo_parcial.csv --etiqueta parcial --clasificados
+    python indice_evaluados.py info [--clasificados]
+"""
+
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RUTA_INDICE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Resultados_Historicos', 'indice_evaluados'
+)
+RUTA_INDICE_CLASIFICADOS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Resultados_Historicos', 'indice_clasificados'
+)
+MANIFEST = 'manifest.json'
+PATRON_BITMAP = re.compile(r'^bitmap(_\d+)?\.npy$')
+FORMATO = 1
+
+
+def _normalizar_ids(ids):
+    """
+    Convierte ids (lista, Serie, array; int, float o str) a int64 ordenado y único.
+
+    Los valores nulos o no numéricos se descartan (p. ej. conversation_id
+    guardado como float en conecta_summary_*.csv).
+    """
+    serie = pd.to_numeric(pd.Series(np.asarray(ids).ravel()), errors='coerce').dropna()
+    valores = np.unique(serie.to_numpy(dtype=np.int64))
+    if len(valores) and valores[0] < 0:
+        raise ValueError(f"conversation_id negativo no soportado: {valores[0]}")
+    return valores
+
+
+def _bits_desde_ids(ids, n_bytes):
+    bitmap = np.zeros(n_bytes, dtype=np.uint8)
+    if len(ids):
+        np.bitwise_or.at(bitmap, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+    return bitmap
+
+
+def _guardar_atomico(ruta, guardar):
+    """Escribe a un archivo temporal, lo sincroniza a disco y lo renombra."""
+    temporal = ruta + '.tmp'
+    guardar(temporal)
+    with open(temporal, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _guardar_npy(ruta, arreglo):
+    def guardar(destino):
+        with open(destino, 'wb') as f:
+            np.save(f, arreglo)
+    _guardar_atomico(ruta, guardar)
+
+
+def _nombre_bitmap(version):
+    return f"bitmap_{version:04d}.npy"
+
+
+def _limpiar_bitmaps(ruta, vigente):
+    """Borra bitmaps de versiones anteriores (o de corridas interrumpidas)."""
+    for archivo in os.listdir(ruta):
+        if PATRON_BITMAP.match(archivo) and archivo != vigente:
+            os.remove(os.path.join(ruta, archivo))
+
+
+def _leer_manifest(ruta):
+    ruta_manifest = os.path.join(ruta, MANIFEST)
+    if not os.path.exists(ruta_manifest):
+        return {'formato': FORMATO, 'versiones': []}
+    with open(ruta_manifest, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _escribir_manifest(ruta, manifest):
+    def guardar(destino):
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+    _guardar_atomico(os.path.join(ruta, MANIFEST), guardar)
+
+
+def _cargar_delta(ruta, version):
+    return np.load(os.path.join(ruta, version['archivo']), mmap_mode='r')
+
+
+def _reconstruir_bitmap(ruta, versiones):
+    """Une los deltas indicados en un bitmap en memoria."""
+    deltas = [np.asarray(_cargar_delta(ruta, v)) for v in versiones]
+    ids = np.concatenate(deltas) if deltas else np.empty(0, dtype=np.int64)
+    max_id = int(ids.max()) if len(ids) else -1
+    return _bits_desde_ids(ids, (max_id >> 3) + 1)
+
+
+def cargar_indice(ruta=RUTA_INDICE, version=None):
+    """
+    Abre el índice de conversaciones evaluadas.
+
+    Args:
+        ruta: Carpeta del índice (se crea vacía si no existe)
+        version: Número de versión a reproducir (None = última). Con una versión
+                 anterior el bitmap se reconstruye en memoria desde los deltas.
+
+    Returns:
+        dict: ruta, manifest, version, bitmap (memmap de solo lectura) y total de ids
+    """
+    os.makedirs(ruta, exist_ok=True)
+    manifest = _leer_manifest(ruta)
+    versiones = manifest['versiones']
+    ultima = versiones[-1]['version'] if versiones else 0
+
+    if version is not None and version != ultima:
+        if not any(v['version'] == version for v in versiones):
+            raise KeyError(f"Versión {version} no existe en {ruta} (última: {ultima})")
+        seleccion = [v for v in versiones if v['version'] <= version]
+        bitmap = _reconstruir_bitmap(ruta, seleccion)
+        total = sum(v['nuevos'] for v in seleccion)
+        return {'ruta': ruta, 'manifest': manifest, 'version': version,
+                'bitmap': bitmap, 'total': total, 'solo_lectura': True}
+
+    total = sum(v['nuevos'] for v in versiones)
+    archivo_bitmap = manifest.get('bitmap')
+    if versiones and (archivo_bitmap != _nombre_bitmap(ultima)
+                      or not os.path.exists(os.path.join(ruta, archivo_bitmap))
+                      or manifest.get('total') != total):
+        # Bitmap ausente o desalineado con el manifest: se regenera desde los deltas
+        archivo_bitmap = _nombre_bitmap(ultima)
+        _guardar_npy(os.path.join(ruta, archivo_bitmap), _reconstruir_bitmap(ruta, versiones))
+        manifest.update({'bitmap': archivo_bitmap, 'total': total})
+        _escribir_manifest(ruta, manifest)
+
+    if versiones:
+        _limpiar_bitmaps(ruta, archivo_bitmap)
+        bitmap = np.load(os.path.join(ruta, archivo_bitmap), mmap_mode='r')
+    else:
+        bitmap = np.zeros(0, dtype=np.uint8)
+
+    return {'ruta': ruta, 'manifest': manifest, 'version': ultima,
+            'bitmap': bitmap, 'total': total, 'solo_lectura': False}
+
+
+def contiene(indice, ids):
+    """
+    Pertenencia vectorizada O(1) por id.
+
+    Args:
+        indice: Índice devuelto por cargar_indice
+        ids: Lista, Serie o array de conversation_id
+
+    Returns:
+        np.ndarray[bool]: True si el id ya fue evaluado (nulos -> False)
+    """
+    valores = pd.to_numeric(pd.Series(np.asarray(ids).ravel()), errors='coerce')
+    validos = valores.notna().to_numpy()
+    ids_int = np.zeros(len(valores), dtype=np.int64)
+    ids_int[validos] = valores[validos].to_numpy(dtype=np.int64)
+
+    bitmap = indice['bitmap']
+    dentro = validos & (ids_int >= 0) & ((ids_int >> 3) < len(bitmap))
+    resultado = np.zeros(len(ids_int), dtype=bool)
+    sel = ids_int[dentro]
+    resultado[dentro] = (np.asarray(bitmap[sel >> 3]) >> (sel & 7)) & 1 == 1
+    return resultado
+
+
+def filtrar_pendientes(indice, df, columna='fk_tbl_conversaciones_conecta2'):
+    """
+    Devuelve las filas de df cuyo id aún no está en el índice.
+
+    Args:
+        indice: Índice devuelto por cargar_indice
+        df: DataFrame de interacciones (p. ej. df_merged_final / df_nuevos)
+        columna: Columna con el conversation_id
+
+    Returns:
+        DataFrame: Filas pendientes por evaluar
+    """
+    return df[~contiene(indice, df[columna])]
+
+
+def agregar_delta(indice, ids, etiqueta=None):
+    """
+    Registra un nuevo snapshot: guarda sólo los ids que no estaban en el índice.
+
+    Args:
+        indice: Índice devuelto por cargar_indice (se actualiza en sitio)
+        ids: conversation_id evaluados en el snapshot
+        etiqueta: Nombre del snapshot (p. ej. 'semana_20251114'); por defecto la fecha
+
+    Returns:
+        int: Cantidad de ids nuevos agregados (0 si no hubo delta)
+    """
+    if indice.get('solo_lectura'):
+        raise ValueError("No se puede agregar un delta sobre una versión histórica del índice")
+
+    ids = _normalizar_ids(ids)
+    nuevos = ids[~contiene(indice, ids)]
+    if len(nuevos) == 0:
+        return 0
+
+    ruta = indice['ruta']
+    manifest = indice['manifest']
+    version = indice['version'] + 1
+    etiqueta = etiqueta or datetime.now().strftime('%Y%m%d')
+    archivo = f"delta_{version:04d}_{re.sub(r'[^0-9A-Za-z_-]+', '_', etiqueta)}.npy"
+
+    _guardar_npy(os.path.join(ruta, archivo), nuevos)
+
+    # Nuevo bitmap = bitmap anterior (ampliado si hace falta) | bits del delta.
+    # Se escribe en un archivo nuevo: el manifest sólo lo referencia después.
+    n_bytes = max(len(indice['bitmap']), (int(nuevos[-1]) >> 3) + 1)
+    bitmap = _bits_desde_ids(nuevos, n_bytes)
+    bitmap[:len(indice['bitmap'])] |= np.asarray(indice['bitmap'])
+    archivo_bitmap = _nombre_bitmap(version)
+    ruta_bitmap = os.path.join(ruta, archivo_bitmap)
+    _guardar_npy(ruta_bitmap, bitmap)
+
+    manifest['versiones'].append({
+        'version': version,
+        'etiqueta': etiqueta,
+        'archivo': archivo,
+        'nuevos': int(len(nuevos)),
+        'min_id': int(nuevos[0]),
+        'max_id': int(nuevos[-1]),
+        'creado': datetime.now().isoformat(timespec='seconds'),
+    })
+    manifest['total'] = indice['total'] + int(len(nuevos))
+    manifest['bitmap'] = archivo_bitmap
+    _escribir_manifest(ruta, manifest)
+    _limpiar_bitmaps(ruta, archivo_bitmap)
+
+    indice.update({
+        'version': version,
+        'bitmap': np.load(ruta_bitmap, mmap_mode='r'),
+        'total': manifest['total'],
+    })
+    return int(len(nuevos))
+
+
+def ids_evaluados(indice):
+    """Devuelve todos los conversation_id del índice como int64 ordenado."""
+    bits = np.unpackbits(np.asarray(indice['bitmap']), bitorder='little')
+    return np.flatnonzero(bits).astype(np.int64)
+
+
+def inicializar_desde_csv(rutas_csv, ruta=RUTA_INDICE, columna='conversation_id'):
+    """
+    Migración única: registra como deltas los ids de los CSV históricos.
+
+    Args:
+        rutas_csv: Lista de CSV (df_resultados.csv, resultados_paralelo_parcial.csv, ...);
+                   los que no existen se omiten
+        ruta: Carpeta del índice
+        columna: Columna con el conversation_id
+
+    Returns:
+        dict: Índice actualizado
+    """
+    indice = cargar_indice(ruta)
+    for ruta_csv in rutas_csv:
+        if not os.path.exists(ruta_csv):
+            print(f"   {ruta_csv}: no existe, se omite")
+            continue
+        ids = pd.read_csv(ruta_csv, usecols=[columna])[columna]
+        etiqueta = os.path.splitext(os.path.basename(ruta_csv))[0]
+        agregados = agregar_delta(indice, ids, etiqueta=etiqueta)
+        print(f"   {ruta_csv}: {ids.nunique():,} ids ({agregados:,} nuevos)")
+    return indice
+
+
+def imprimir_resumen(indice):
+    print(f"📁 Índice: {indice['ruta']}")
+    print(f"   Versión: {indice['version']} | Ids evaluados: {indice['total']:,} | "
+          f"Bitmap: {len(indice['bitmap']):,} bytes")
+    for v in indice['manifest']['versiones']:
+        print(f"   v{v['version']:>3}  {v['creado']}  {v['etiqueta']:<40} +{v['nuevos']:,}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    ruta = RUTA_INDICE
+    if '--clasificados' in args:
+        args.remove('--clasificados')
+        ruta = RUTA_INDICE_CLASIFICADOS
+    comando = args[0] if args else 'info'
+
+    print("=" * 80)
+    print("ÍNDICE DE CONVERSACIONES EVALUADAS")
+    print("=" * 80)
+
+    if comando == 'init':
+        print("\n📥 Registrando CSV históricos...")
+        indice = inicializar_desde_csv(args[1:] or ['df_resultados.csv'], ruta=ruta)
+    elif comando == 'agregar':
+        etiqueta = None
+        if '--etiqueta' in args:
+            pos = args.index('--etiqueta')
+            etiqueta = args[pos + 1]
+            args = args[:pos] + args[pos + 2:]
+        indice = cargar_indice(ruta)
+        for ruta_csv in args[1:]:
+            ids = pd.read_csv(ruta_csv, usecols=['conversation_id'])['conversation_id']
+            agregados = agregar_delta(indice, ids, etiqueta=etiqueta or os.path.splitext(os.path.basename(ruta_csv))[0])
+            print(f"\n✅ {ruta_csv}: {agregados:,} ids nuevos")
+    elif comando == 'info':
+        indice = cargar_indice(ruta)
+    else:
+        print(f"❌ Comando desconocido: {comando} (usar init | agregar | info)")
+        sys.exit(1)
+
+    print()
+    imprimir_resumen(indice)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Motor de KPIs semanales de embudo, autogestión y adopción (flujo, celdas 66-71 y 102).
+
+Antes cada KPI tenía su propio groupby + lambda sobre df_merged_final
+(resumen_autogestion, clasificación de 3 grupos, clasificar_conversacion con
+apply(axis=1), adopción) y recalculaba el inicio de semana. Aquí se hace UNA
+sola agregación a una tabla de hechos y todos los KPIs salen de ella con
+operaciones vectorizadas:
+
+- hechos['conversacion_semana']: conversación × inicio de semana con
+  motivo_experto presente, suma/máximo de flg_experto, regional y claves de
+  usuario (grano de resumen_autogestion, donde una conversación que cruza
+  semanas cuenta en cada una).
+- hechos['conversaciones']: una fila por conversación (semana de inicio,
+  regional, banderas), derivada de la anterior sin volver a las interacciones.
+
+El día de inicio de semana es configurable (0=lunes ... 6=domingo); con el
+valor por defecto los CSV resumen_semanal_autogestion.csv y
+distribucion_regional.csv quedan idénticos a los del flujo.
+
+Uso:
+    python kpis_autogestion.py interacciones.csv [--dia-inicio-semana 0] [--salida .]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from dimensiones_usuarios import adopcion_por_regional
+
+COLUMNA_CONVERSACION = 'fk_tbl_conversaciones_conecta2'
+CLASES_SEMANALES = ['Conecta Retuvo', 'Puerta experto', 'Experto']
+CLASES_REGIONALES = ['Autogestión', 'Puerta Experto', 'Experto']
+ARCHIVO_SEMANAL = 'resumen_semanal_autogestion.csv'
+ARCHIVO_REGIONAL = 'distribucion_regional.csv'
+
+
+# ============================================================
+# TABLA DE HECHOS
+# ============================================================
+
+def inicio_semana(fechas, dia_inicio=0):
+    """
+    Inicio de semana de cada fecha (equivale a calcula_incio_semana).
+
+    Args:
+        fechas: Serie datetime
+        dia_inicio: Día en que empieza la semana (0=lunes ... 6=domingo)
+
+    Returns:
+        Serie: Fecha normalizada del último dia_inicio <= fecha
+    """
+    dias = (fechas.dt.weekday - dia_inicio) % 7
+    return fechas.dt.normalize() - pd.to_timedelta(dias, unit='D')
+
+
+def construir_hechos(df, dia_inicio_semana=0, columna_conversacion=COLUMNA_CONVERSACION, columna_fecha='fecha'):
+    """
+    Agrega las interacciones en una sola pasada.
+
+    Args:
+        df: df_merged_final (fecha, motivo_experto, flg_experto, REGIONAL; opcional usuario_key/regional_key)
+        dia_inicio_semana: 0=lunes ... 6=domingo
+
+    Returns:
+        dict: conversacion_semana, conversaciones (DataFrames), dia_inicio_semana
+    """
+    fechas = pd.to_datetime(df[columna_fecha], errors='coerce')
+    base = pd.DataFrame({
+        'conversacion': df[columna_conversacion].to_numpy(),
+        'week_start': inicio_semana(fechas, dia_inicio_semana).to_numpy(),
+        'motivo': df['motivo_experto'].notna().to_numpy(),
+        'flg': df['flg_experto'].to_numpy(),
+        'regional': df['REGIONAL'].to_numpy(),
+        # Posición de la primera fila con regional: reproduce ('REGIONAL', 'first') por conversación
+        'fila': np.where(df['REGIONAL'].notna(), np.arange(len(df)), np.nan),
+    })
+    agregaciones = {
+        'motivo_experto_presente': ('motivo', 'any'),
+        'flg_experto_suma': ('flg', 'sum'),
+        'flg_experto_max': ('flg', 'max'),
+        'regional': ('regional', 'first'),
+        'fila': ('fila', 'min'),
+    }
+    for clave in ('usuario_key', 'regional_key'):
+        if clave in df.columns:
+            base[clave] = df[clave].to_numpy()
+            agregaciones[clave] = (clave, 'first')
+
+    # Única pasada sobre las interacciones. Las filas sin fecha se conservan (week_start NaT)
+    # para la clasificación regional; los KPIs semanales las excluyen como el groupby original.
+    base = base[base['conversacion'].notna()]
+    conversacion_semana = (
+        base.groupby(['conversacion', 'week_start'], sort=True, dropna=False)
+        .agg(**agregaciones)
+        .reset_index()
+    )
+
+    # Grano conversación: derivado de la tabla anterior (semana de inicio = semana de la primera fecha)
+    por_fila = conversacion_semana.sort_values('fila', kind='stable', na_position='last')
+    conversaciones = conversacion_semana.groupby('conversacion', sort=True).agg(
+        week_start=('week_start', 'min'),
+        motivo_experto_presente=('motivo_experto_presente', 'any'),
+        flg_experto_suma=('flg_experto_suma', 'sum'),
+        flg_experto_max=('flg_experto_max', 'max'),
+    )
+    for columna in ['regional'] + [c for c in ('usuario_key', 'regional_key') if c in conversacion_semana.columns]:
+        conversaciones[columna] = por_fila.groupby('conversacion')[columna].first()
+    conversaciones = conversaciones.reset_index()
+
+    return {
+        'conversacion_semana': conversacion_semana,
+        'conversaciones': conversaciones,
+        'dia_inicio_semana': dia_inicio_semana,
+    }
+
+
+# ============================================================
+# KPIs
+# ============================================================
+
+def _autogestion_simple(conversacion_semana, indicador):
+    """Tabla de resumen_autogestion (Conecta Retuvo vs Experto por semana)."""
+    clasificacion = np.where(indicador, 'Experto', 'Conecta Retuvo')
+    resumen = (
+        pd.crosstab(conversacion_semana['week_start'], clasificacion)
+        .rename_axis(index='fecha', columns='clasificacion')
+        .reindex(columns=['Conecta Retuvo', 'Experto'], fill_value=0)
+        .reset_index()
+        .sort_values('fecha')
+    )
+    resumen['Grand Total'] = resumen['Conecta Retuvo'] + resumen['Experto']
+    resumen['Autogestión'] = (resumen['Conecta Retuvo'] / resumen['Grand Total'] * 100).round(2)
+    return resumen
+
+
+def _resumen_semanal(conversaciones):
+    """Clasificación de 3 grupos por semana de inicio (resumen_semanal de la celda 67)."""
+    motivo = conversaciones['motivo_experto_presente']
+    suma = conversaciones['flg_experto_suma']
+    clasificacion = np.select(
+        [~motivo, motivo & (suma == 0), motivo & (suma >= 1)],
+        CLASES_SEMANALES, default='Otro',
+    )
+    resumen = (
+        pd.crosstab(conversaciones['week_start'], pd.Series(clasificacion, name='clasificacion'))
+        .reset_index()
+        .sort_values('week_start')
+    )
+    for col in CLASES_SEMANALES:
+        if col not in resumen.columns:
+            resumen[col] = 0
+    resumen['total_conversaciones'] = resumen['Conecta Retuvo'] + resumen['Puerta experto'] + resumen['Experto']
+    resumen['autogestion_acida'] = (resumen['Conecta Retuvo'] / resumen['total_conversaciones'] * 100).round(2)
+    resumen['autogestion_confirmada'] = (
+        (resumen['Conecta Retuvo'] + resumen['Puerta experto']) / resumen['total_conversaciones'] * 100
+    ).round(2)
+    return resumen
+
+
+def _estado_regional(conversaciones):
+    """Clasificación por conversación de la celda 69 (flg_experto máximo + motivo_experto)."""
+    maximo = conversaciones['flg_experto_max']
+    estado = conversaciones[['conversacion', 'flg_experto_max', 'motivo_experto_presente', 'regional']].rename(
+        columns={'conversacion': COLUMNA_CONVERSACION, 'flg_experto_max': 'flg_experto_final'}
+    )
+    estado['clasificacion'] = np.select(
+        [maximo == 1, (maximo == 0) & conversaciones['motivo_experto_presente']],
+        ['Experto', 'Puerta Experto'], default='Autogestión',
+    )
+    return estado
+
+
+def calcular_kpis(hechos, dim_usuarios=None, dim_regional=None):
+    """
+    Todos los KPIs de embudo, autogestión y adopción a partir de la tabla de hechos.
+
+    Args:
+        hechos: Resultado de construir_hechos
+        dim_usuarios, dim_regional: Dimensiones de dimensiones_usuarios (opcional, para adopción)
+
+    Returns:
+        dict: autogestion_confirmada, autogestion_acida (celda 66), resumen_semanal (67),
+              df_conv_estado, conteo_regional, conteo_percent (69), df_adopcion (70),
+              distribucion_regional (71)
+    """
+    semana = hechos['conversacion_semana']
+    semana = semana[semana['week_start'].notna()].reset_index(drop=True)
+    conversaciones = hechos['conversaciones']
+    con_semana = conversaciones[conversaciones['week_start'].notna()].reset_index(drop=True)
+
+    df_conv_estado = _estado_regional(conversaciones)
+    conteo_regional = (
+        pd.crosstab(df_conv_estado['regional'], df_conv_estado['clasificacion'])
+        .reindex(columns=CLASES_REGIONALES, fill_value=0)
+    )
+    conteo_percent = conteo_regional.div(conteo_regional.sum(axis=1), axis=0) * 100
+
+    distribucion = conteo_regional.join(conteo_percent.rename(columns=lambda x: f"{x}_%"))
+    distribucion['Total_Conversaciones'] = distribucion[CLASES_REGIONALES].sum(axis=1)
+    distribucion = distribucion.reset_index()[
+        ['regional'] + CLASES_REGIONALES + ['Total_Conversaciones'] + [f"{c}_%" for c in CLASES_REGIONALES]
+    ]
+
+    # Adopción: usuario_key/regional_key son atributos de la conversación, basta el grano conversación
+    df_adopcion = None
+    if dim_usuarios is not None and 'usuario_key' in conversaciones.columns:
+        df_adopcion = adopcion_por_regional(conversaciones, dim_usuarios, dim_regional)
+
+    return {
+        'autogestion_confirmada': _autogestion_simple(semana, semana['flg_experto_suma'] > 0),
+        'autogestion_acida': _autogestion_simple(semana, semana['motivo_experto_presente']),
+        'resumen_semanal': _resumen_semanal(con_semana),
+        'df_conv_estado': df_conv_estado,
+        'conteo_regional': conteo_regional,
+        'conteo_percent': conteo_percent,
+        'df_adopcion': df_adopcion,
+        'distribucion_regional': distribucion,
+    }
+
+
+def uso_conecta_semanal(df_conecta2, df_conecta1, semanas_habilitadas,
+                        columna_fecha2='fecha', columna_fecha1='Fecha', columna_regional='REGIONAL'):
+    """
+    Correos que usaron Conecta 1, Conecta 2 o ambos por semana ISO (celda 102).
+
+    Sólo cuentan las regionales habilitadas en cada semana (None = todas). Si
+    df_conecta1 no tiene columna de regional no se filtra.
+
+    Args:
+        df_conecta2: Resultados de Conecta 2 (fecha, correo, REGIONAL)
+        df_conecta1: Consultas de Conecta 1 (Fecha, correo)
+        semanas_habilitadas: {semana ISO: [regionales] o None}
+
+    Returns:
+        DataFrame: semana, Conecta 1, Conecta 2, Ambos (%), total_correos, n_Conecta1, n_Conecta2, n_Ambos
+    """
+    habilitadas = pd.DataFrame(
+        [(s, r) for s, regionales in semanas_habilitadas.items() if regionales is not None for r in regionales],
+        columns=['semana', columna_regional],
+    )
+    abiertas = [s for s, regionales in semanas_habilitadas.items() if regionales is None]
+
+    def correos_semana(df, columna_fecha, origen):
+        datos = pd.DataFrame({
+            'semana': pd.to_datetime(df[columna_fecha]).dt.isocalendar().week.to_numpy(),
+            'correo': df['correo'].str.strip().str.lower().to_numpy(),
+        })
+        datos = datos[datos['semana'].isin(list(semanas_habilitadas)) & datos['correo'].notna()]
+        datos['semana'] = datos['semana'].astype(int)
+        if columna_regional in df.columns:
+            datos[columna_regional] = df[columna_regional].to_numpy()[datos.index]
+            en_regional = datos.merge(habilitadas, on=['semana', columna_regional], how='left', indicator=True)
+            datos = datos[(en_regional['_merge'] == 'both').to_numpy() | datos['semana'].isin(abiertas).to_numpy()]
+        return datos[['semana', 'correo']].drop_duplicates().assign(**{origen: True})
+
+    uso = correos_semana(df_conecta1, columna_fecha1, 'c1').merge(
+        correos_semana(df_conecta2, columna_fecha2, 'c2'), on=['semana', 'correo'], how='outer'
+    )
+    uso['c1'] = uso['c1'].astype('boolean').fillna(False).astype(bool)
+    uso['c2'] = uso['c2'].astype('boolean').fillna(False).astype(bool)
+    uso['grupo'] = np.select([uso['c1'] & uso['c2'], uso['c1']], ['n_Ambos', 'n_Conecta1'], default='n_Conecta2')
+
+    resumen = (
+        pd.crosstab(uso['semana'], uso['grupo'])
+        .reindex(index=sorted(semanas_habilitadas), columns=['n_Conecta1', 'n_Conecta2', 'n_Ambos'], fill_value=0)
+        .rename_axis(index='semana', columns=None)
+        .reset_index()
+    )
+    resumen['total_correos'] = resumen[['n_Conecta1', 'n_Conecta2', 'n_Ambos']].sum(axis=1)
+    total = resumen['total_correos'].where(resumen['total_correos'] > 0)
+    for columna, conteo in (('Conecta 1', 'n_Conecta1'), ('Conecta 2', 'n_Conecta2'), ('Ambos', 'n_Ambos')):
+        resumen[columna] = (resumen[conteo] / total * 100).fillna(0.0)
+    return resumen[['semana', 'Conecta 1', 'Conecta 2', 'Ambos', 'total_correos', 'n_Conecta1', 'n_Conecta2', 'n_Ambos']]
+
+
+def exportar_kpis(kpis, ruta='.'):
+    """Escribe resumen_semanal_autogestion.csv y distribucion_regional.csv (sep=';')."""
+    rutas = (os.path.join(ruta, ARCHIVO_SEMANAL), os.path.join(ruta, ARCHIVO_REGIONAL))
+    kpis['resumen_semanal'].to_csv(rutas[0], index=False, sep=';', decimal='.')
+    kpis['distribucion_regional'].to_csv(rutas[1], index=False, sep=';', decimal='.')
+    return rutas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='KPIs semanales de autogestión y embudo')
+    parser.add_argument('csv', help='CSV de interacciones (df_merged_final)')
+    parser.add_argument('--dia-inicio-semana', type=int, default=0, choices=range(7),
+                        help='0=lunes ... 6=domingo')
+    parser.add_argument('--salida', default='.')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("KPIs DE AUTOGESTIÓN")
+    print("=" * 80)
+
+    interacciones = pd.read_csv(args.csv, low_memory=False)
+    hechos = construir_hechos(interacciones, args.dia_inicio_semana)
+    kpis = calcular_kpis(hechos)
+    print(f"📊 Conversaciones: {len(hechos['conversaciones']):,} | "
+          f"Semanas: {hechos['conversaciones']['week_start'].nunique():,}")
+    print(kpis['resumen_semanal'].to_string(index=False))
+    for ruta in exportar_kpis(kpis, args.salida):
+        print(f"💾 {ruta}")
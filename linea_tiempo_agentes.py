@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Línea de tiempo por sesión y ruta crítica de los agentes de main_graph.
+
+Reconstruye cada ejecución de main_graph a partir del export de observaciones
+(langfuse_generations_*.csv: id, traceId, type, name, startTime, endTime,
+metadata con checkpoint_ns) y la atribuye a los agentes del grafo:
+coordinator, information_agent, grader_agent, humanizer y advisor.
+
+- Índice: observaciones ordenadas por traceId + offsets por traza y trazas
+  ordenadas por sesión (export de trazas: id, sessionId, timestamp, latency).
+- Pasos LLM: cada generación con inicio, fin y duración relativos a la traza.
+- Bloques de agente: llamadas consecutivas del mismo agente; self-time = tiempo
+  del bloque no cubierto por llamadas LLM (recuperación, herramientas, código).
+- Ruta crítica: recorrido hacia atrás desde el fin de la traza eligiendo el
+  paso que termina más tarde; los graders en paralelo sólo aportan el más
+  lento y los huecos sin paso se atribuyen a 'orquestacion'.
+- Percentiles diarios por agente (P50/P95/P99 del tiempo en ruta crítica y
+  participación en la latencia) para decidir qué agente optimizar.
+
+Uso:
+    python linea_tiempo_agentes.py langfuse_generations.csv [muestra_langfuse.csv]
+    python linea_tiempo_agentes.py langfuse_generations.csv trazas.csv --sesion <sessionId>
+    python linea_tiempo_agentes.py langfuse_generations.csv trazas.csv --sesiones Archivos/langfuse_sessions_with_errors.csv --min-latencia 18
+"""
+
+import argparse
+import ast
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RUTA_SALIDA = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'LineaTiempo'
+)
+
+AGENTES = ['coordinator', 'information_agent', 'grader_agent', 'humanizer', 'advisor']
+ORQUESTACION = 'orquestacion'
+
+# node_type (clasificación del notebook de cubos) -> agente de main_graph
+NODO_A_AGENTE = {
+    'COORDINATOR': 'coordinator',
+    'INFORMATION_AGENT': 'information_agent',
+    'INFORMATION_AGENT_RERANKER': 'information_agent',
+    'INFORMATION_AGENT_GRADER': 'grader_agent',
+    'HUMANIZER': 'humanizer',
+    'ADVISOR': 'advisor',
+}
+
+
+# ============================================================
+# CLASIFICACIÓN DE OBSERVACIONES
+# ============================================================
+
+def _parse(valor):
+    if isinstance(valor, (dict, list)):
+        return valor
+    if not isinstance(valor, str):
+        return {}
+    try:
+        return json.loads(valor)
+    except json.JSONDecodeError:
+        try:
+            return ast.literal_eval(valor)
+        except (ValueError, SyntaxError):
+            return {}
+
+
+def clasificar_nodo(metadata, input_data=None):
+    """
+    Tipo de nodo de una observación (misma lógica que classify_node_type del notebook de cubos).
+
+    Args:
+        metadata: dict o string con checkpoint_ns / grader_evaluation
+        input_data: Mensajes de entrada (para distinguir el reranker)
+
+    Returns:
+        str: COORDINATOR, INFORMATION_AGENT, INFORMATION_AGENT_RERANKER,
+             INFORMATION_AGENT_GRADER, HUMANIZER, ADVISOR o UNKNOWN
+    """
+    meta = _parse(metadata)
+    if not isinstance(meta, dict):
+        meta = {}
+    if meta.get('grader_evaluation', False) is True:
+        return 'INFORMATION_AGENT_GRADER'
+
+    checkpoint_ns = str(meta.get('checkpoint_ns', '')).lower()
+    if 'coordinator' in checkpoint_ns:
+        return 'COORDINATOR'
+    if 'humanizer' in checkpoint_ns:
+        return 'HUMANIZER'
+    if 'advisor' in checkpoint_ns:
+        return 'ADVISOR'
+    if 'information_agent' in checkpoint_ns:
+        mensajes = _parse(input_data)
+        if isinstance(mensajes, list) and mensajes and isinstance(mensajes[0], dict) \
+                and str(mensajes[0].get('content', '')).startswith('You are RankGPT'):
+            return 'INFORMATION_AGENT_RERANKER'
+        return 'INFORMATION_AGENT'
+    return 'UNKNOWN'
+
+
+def preparar_observaciones(df_obs):
+    """
+    Normaliza el export de observaciones a pasos con agente e intervalos.
+
+    Returns:
+        DataFrame: traceId, id, name, type, node_type, agente, inicio, fin, duracion
+    """
+    obs = df_obs.copy()
+    if 'node_type' not in obs.columns:
+        entrada = obs['input'] if 'input' in obs.columns else pd.Series(None, index=obs.index)
+        obs['node_type'] = [clasificar_nodo(m, i) for m, i in zip(obs['metadata'], entrada)]
+
+    obs['inicio'] = pd.to_datetime(obs['startTime'], format='mixed', errors='coerce', utc=True)
+    obs['fin'] = pd.to_datetime(obs['endTime'], format='mixed', errors='coerce', utc=True)
+    if 'latency' in obs.columns:
+        # Sin endTime: inicio + latencia
+        sin_fin = obs['fin'].isna() & obs['latency'].notna()
+        obs.loc[sin_fin, 'fin'] = obs.loc[sin_fin, 'inicio'] + pd.to_timedelta(obs.loc[sin_fin, 'latency'], unit='s')
+
+    obs = obs.dropna(subset=['traceId', 'inicio', 'fin'])
+    obs['agente'] = obs['node_type'].map(NODO_A_AGENTE).fillna('otro')
+    obs['duracion'] = (obs['fin'] - obs['inicio']).dt.total_seconds().clip(lower=0)
+    columnas = ['traceId', 'id', 'name', 'type', 'node_type', 'agente', 'inicio', 'fin', 'duracion']
+    return obs[[c for c in columnas if c in obs.columns]]
+
+
+# ============================================================
+# ÍNDICE
+# ============================================================
+
+def construir_indice(df_obs, df_trazas=None):
+    """
+    Indexa observaciones por traza y trazas por sesión.
+
+    Args:
+        df_obs: Export de observaciones (crudo o ya preparado)
+        df_trazas: Export de trazas (id, name, sessionId, timestamp, latency);
+                   sin él, inicio/fin de la traza salen de sus observaciones
+
+    Returns:
+        dict: pasos (ordenados por traceId, inicio), offsets {traceId: (i0, i1)},
+              trazas (traceId, sessionId, inicio, fin, latency, date),
+              sesiones {sessionId: [traceId ordenados por inicio]}
+    """
+    pasos = df_obs if 'agente' in df_obs.columns else preparar_observaciones(df_obs)
+    pasos = pasos.sort_values(['traceId', 'inicio'], kind='stable').reset_index(drop=True)
+
+    ids = pasos['traceId'].to_numpy()
+    cortes = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    inicios = np.concatenate([[0], cortes])
+    finales = np.concatenate([cortes, [len(ids)]])
+    offsets = {ids[i0]: (i0, i1) for i0, i1 in zip(inicios, finales)} if len(ids) else {}
+
+    limites = pasos.groupby('traceId').agg(inicio=('inicio', 'min'), fin=('fin', 'max'))
+    if df_trazas is not None:
+        trazas = df_trazas.copy()
+        if 'name' in trazas.columns:
+            trazas = trazas[trazas['name'].astype(str).str.endswith('main_graph')]
+        trazas = trazas.rename(columns={'id': 'traceId'})
+        trazas['inicio'] = pd.to_datetime(trazas['timestamp'], format='mixed', errors='coerce', utc=True)
+        trazas['fin'] = trazas['inicio'] + pd.to_timedelta(trazas['latency'].fillna(0), unit='s')
+        trazas = trazas[trazas['traceId'].isin(offsets)]
+        # La traza cubre al menos a sus observaciones
+        trazas = trazas.set_index('traceId')
+        ini_obs = limites['inicio'].reindex(trazas.index)
+        fin_obs = limites['fin'].reindex(trazas.index)
+        trazas['inicio'] = trazas['inicio'].where(trazas['inicio'] <= ini_obs, ini_obs)
+        trazas['fin'] = trazas['fin'].where(trazas['fin'] >= fin_obs, fin_obs)
+        trazas = trazas.reset_index()[['traceId', 'sessionId', 'inicio', 'fin']]
+    else:
+        trazas = limites.reset_index()
+        trazas['sessionId'] = trazas['traceId']
+
+    trazas['latency'] = (trazas['fin'] - trazas['inicio']).dt.total_seconds()
+    trazas['date'] = trazas['inicio'].dt.strftime('%Y-%m-%d')
+    trazas = trazas.sort_values(['sessionId', 'inicio']).reset_index(drop=True)
+    sesiones = trazas.groupby('sessionId', sort=False)['traceId'].agg(list).to_dict()
+
+    return {'pasos': pasos, 'offsets': offsets, 'trazas': trazas, 'sesiones': sesiones}
+
+
+def _pasos_traza(indice, trace_id):
+    i0, i1 = indice['offsets'].get(trace_id, (0, 0))
+    return indice['pasos'].iloc[i0:i1]
+
+
+# ============================================================
+# LÍNEA DE TIEMPO Y RUTA CRÍTICA
+# ============================================================
+
+def _union(intervalos):
+    """Longitud de la unión de intervalos [(inicio, fin), ...]."""
+    total, fin_actual = 0.0, -np.inf
+    for ini, fin in sorted(intervalos):
+        if fin <= fin_actual:
+            continue
+        total += fin - max(ini, fin_actual)
+        fin_actual = fin
+    return total
+
+
+def bloques_agente(inicio, fin, agentes):
+    """
+    Agrupa pasos consecutivos (por inicio) del mismo agente en bloques.
+
+    Returns:
+        list[dict]: agente, inicio, fin, duracion, llm_s, self_s, llamadas
+    """
+    bloques = []
+    for ini, fi, agente in zip(inicio, fin, agentes):
+        if bloques and bloques[-1]['agente'] == agente:
+            bloque = bloques[-1]
+            bloque['fin'] = max(bloque['fin'], fi)
+            bloque['_intervalos'].append((ini, fi))
+        else:
+            bloques.append({'agente': agente, 'inicio': ini, 'fin': fi, '_intervalos': [(ini, fi)]})
+    for bloque in bloques:
+        intervalos = bloque.pop('_intervalos')
+        bloque['duracion'] = bloque['fin'] - bloque['inicio']
+        bloque['llm_s'] = _union(intervalos)
+        bloque['self_s'] = bloque['duracion'] - bloque['llm_s']
+        bloque['llamadas'] = len(intervalos)
+    return bloques
+
+
+def ruta_critica(inicio, fin, etiquetas, t_inicio, t_fin):
+    """
+    Atribuye la latencia de una traza a sus pasos recorriendo hacia atrás desde el final.
+
+    En cada punto se elige el paso que termina más tarde antes del cursor; su
+    tramo [inicio, cursor] va a su etiqueta y el cursor salta a su inicio.
+
+    Args:
+        inicio, fin: Arreglos de segundos relativos al inicio de la traza
+        etiquetas: Agente (u otra etiqueta) de cada paso
+        t_inicio, t_fin: Límites de la traza en segundos relativos
+
+    Returns:
+        dict: {etiqueta: segundos en ruta crítica}, incluye ORQUESTACION para huecos
+    """
+    atribucion = {}
+    orden = np.argsort(fin)[::-1]
+    cursor = t_fin
+    for i in orden:
+        if cursor <= t_inicio:
+            break
+        if inicio[i] >= cursor:
+            continue  # contenido en un tramo ya atribuido (paralelo)
+        fin_efectivo = min(fin[i], cursor)
+        if fin_efectivo < cursor:
+            atribucion[ORQUESTACION] = atribucion.get(ORQUESTACION, 0.0) + cursor - fin_efectivo
+        tramo = fin_efectivo - max(inicio[i], t_inicio)
+        atribucion[etiquetas[i]] = atribucion.get(etiquetas[i], 0.0) + tramo
+        cursor = max(inicio[i], t_inicio)
+    if cursor > t_inicio:
+        atribucion[ORQUESTACION] = atribucion.get(ORQUESTACION, 0.0) + cursor - t_inicio
+    return atribucion
+
+
+def linea_tiempo_traza(indice, trace_id):
+    """
+    Pasos LLM de una traza con tiempos relativos y su participación en la ruta crítica.
+
+    Returns:
+        DataFrame: agente, node_type, name, inicio_s, fin_s, duracion, critico_s
+    """
+    pasos = _pasos_traza(indice, trace_id)
+    traza = indice['trazas'].set_index('traceId').loc[trace_id]
+    origen = traza['inicio']
+    inicio = (pasos['inicio'] - origen).dt.total_seconds().to_numpy()
+    fin = (pasos['fin'] - origen).dt.total_seconds().to_numpy()
+
+    # Ruta crítica a nivel de paso: cada paso es su propia etiqueta
+    critico = ruta_critica(inicio, fin, np.arange(len(pasos)), 0.0, traza['latency'])
+    return pd.DataFrame({
+        'agente': pasos['agente'].to_numpy(),
+        'node_type': pasos['node_type'].to_numpy(),
+        'name': pasos['name'].to_numpy() if 'name' in pasos.columns else None,
+        'inicio_s': inicio,
+        'fin_s': fin,
+        'duracion': fin - inicio,
+        'critico_s': [critico.get(i, 0.0) for i in range(len(pasos))],
+    })
+
+
+def linea_tiempo_sesion(indice, session_id):
+    """
+    Línea de tiempo de una sesión: bloques de agente de cada traza, relativos al inicio de la sesión.
+
+    Returns:
+        DataFrame: traceId, agente, inicio_s, fin_s, duracion, llm_s, self_s, llamadas
+    """
+    trazas = indice['trazas'].set_index('traceId')
+    ids = indice['sesiones'].get(session_id, [])
+    if not ids:
+        return pd.DataFrame()
+    origen = trazas.loc[ids[0], 'inicio']
+    filas = []
+    for trace_id in ids:
+        pasos = _pasos_traza(indice, trace_id)
+        inicio = (pasos['inicio'] - origen).dt.total_seconds().to_numpy()
+        fin = (pasos['fin'] - origen).dt.total_seconds().to_numpy()
+        for bloque in bloques_agente(inicio, fin, pasos['agente'].to_numpy()):
+            filas.append({'traceId': trace_id, **bloque})
+    tabla = pd.DataFrame(filas).rename(columns={'inicio': 'inicio_s', 'fin': 'fin_s'})
+    return tabla
+
+
+def analizar_trazas(indice, trace_ids=None):
+    """
+    Ruta crítica y tiempos por agente para cada traza.
+
+    Args:
+        indice: Índice de construir_indice
+        trace_ids: Subconjunto de trazas (None = todas)
+
+    Returns:
+        DataFrame: traceId, sessionId, date, latency, agente, critico_s, llm_s, self_s, llamadas
+    """
+    trazas = indice['trazas']
+    if trace_ids is not None:
+        trazas = trazas[trazas['traceId'].isin(set(trace_ids))]
+
+    pasos = indice['pasos']
+    # Segundos absolutos (float) una sola vez para todo el índice
+    epoca = pd.Timestamp(0, tz='UTC')
+    t_ini = (pasos['inicio'] - epoca).dt.total_seconds().to_numpy()
+    t_fin = (pasos['fin'] - epoca).dt.total_seconds().to_numpy()
+    agentes = pasos['agente'].to_numpy()
+
+    filas = []
+    for traza in trazas.itertuples(index=False):
+        i0, i1 = indice['offsets'][traza.traceId]
+        origen = traza.inicio.timestamp()
+        inicio, fin, agente = t_ini[i0:i1] - origen, t_fin[i0:i1] - origen, agentes[i0:i1]
+
+        critico = ruta_critica(inicio, fin, agente, 0.0, traza.latency)
+        por_agente = {}
+        for bloque in bloques_agente(inicio, fin, agente):
+            acumulado = por_agente.setdefault(bloque['agente'], {'llm_s': 0.0, 'self_s': 0.0, 'llamadas': 0})
+            acumulado['llm_s'] += bloque['llm_s']
+            acumulado['self_s'] += bloque['self_s']
+            acumulado['llamadas'] += bloque['llamadas']
+
+        for nombre in set(critico) | set(por_agente):
+            filas.append({
+                'traceId': traza.traceId, 'sessionId': traza.sessionId, 'date': traza.date,
+                'latency': traza.latency, 'agente': nombre, 'critico_s': critico.get(nombre, 0.0),
+                **por_agente.get(nombre, {'llm_s': 0.0, 'self_s': 0.0, 'llamadas': 0}),
+            })
+    return pd.DataFrame(filas)
+
+
+# ============================================================
+# AGREGADOS
+# ============================================================
+
+def percentiles_diarios(analisis):
+    """
+    Percentiles diarios por agente del tiempo en ruta crítica.
+
+    Returns:
+        DataFrame: date, agente, trazas, critico_p50/p95/p99, critico_mean,
+                   participacion (% de la latencia total del día), llm_p95, self_p95
+    """
+    if analisis.empty:
+        return pd.DataFrame()
+    latencia_dia = analisis.drop_duplicates('traceId').groupby('date')['latency'].sum()
+    grupos = analisis.groupby(['date', 'agente'])
+    tabla = grupos.agg(
+        trazas=('traceId', 'nunique'),
+        critico_mean=('critico_s', 'mean'),
+        critico_total=('critico_s', 'sum'),
+    )
+    cuantiles = grupos['critico_s'].quantile([0.5, 0.95, 0.99]).unstack()
+    cuantiles.columns = ['critico_p50', 'critico_p95', 'critico_p99']
+    tabla = tabla.join(cuantiles)
+    tabla['llm_p95'] = grupos['llm_s'].quantile(0.95)
+    tabla['self_p95'] = grupos['self_s'].quantile(0.95)
+    tabla['participacion'] = (
+        tabla['critico_total'] / latencia_dia.reindex(tabla.index.get_level_values('date')).to_numpy() * 100
+    )
+    return tabla.drop(columns='critico_total').reset_index().round(3)
+
+
+def percentiles_pasos(indice):
+    """P50/P95/P99 diarios de la duración de cada llamada LLM por agente y node_type."""
+    pasos = indice['pasos'].assign(date=indice['pasos']['inicio'].dt.strftime('%Y-%m-%d'))
+    grupos = pasos.groupby(['date', 'agente', 'node_type'])['duracion']
+    tabla = grupos.quantile([0.5, 0.95, 0.99]).unstack()
+    tabla.columns = ['duracion_p50', 'duracion_p95', 'duracion_p99']
+    tabla.insert(0, 'llamadas', grupos.size())
+    return tabla.reset_index().round(3)
+
+
+def resumen_agentes(analisis):
+    """Participación total de cada agente en la ruta crítica (para priorizar optimizaciones)."""
+    latencia_total = analisis.drop_duplicates('traceId')['latency'].sum()
+    resumen = analisis.groupby('agente').agg(
+        critico_total=('critico_s', 'sum'),
+        critico_p95=('critico_s', lambda x: x.quantile(0.95)),
+        llm_total=('llm_s', 'sum'),
+        self_total=('self_s', 'sum'),
+        llamadas=('llamadas', 'sum'),
+    )
+    resumen['participacion'] = resumen['critico_total'] / latencia_total * 100
+    return resumen.sort_values('critico_total', ascending=False).reset_index()
+
+
+def imprimir_resumen(resumen, n_trazas):
+    print(f"\n⏱️  Ruta crítica por agente ({n_trazas:,} trazas main_graph):")
+    print(f"   {'Agente':<20} {'% latencia':>10} {'P95 crítico':>12} {'LLM total':>11} {'Self total':>11} {'Llamadas':>9}")
+    for _, fila in resumen.iterrows():
+        print(f"   {fila['agente']:<20} {fila['participacion']:>9.1f}% {fila['critico_p95']:>11.2f}s "
+              f"{fila['llm_total']:>10.0f}s {fila['self_total']:>10.0f}s {int(fila['llamadas']):>9,}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Línea de tiempo y ruta crítica de agentes')
+    parser.add_argument('observaciones', help='Export de observaciones/generaciones de Langfuse')
+    parser.add_argument('trazas', nargs='?', help='Export de trazas (sessionId, latency)')
+    parser.add_argument('--sesion', help='Imprime la línea de tiempo de una sesión')
+    parser.add_argument('--sesiones', help='CSV de sesiones (p. ej. langfuse_sessions_with_errors.csv)')
+    parser.add_argument('--min-latencia', type=float, default=0.0,
+                        help='Con --sesiones: sólo sesiones con avg_latency >= este valor')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("LÍNEA DE TIEMPO Y RUTA CRÍTICA DE AGENTES (main_graph)")
+    print("=" * 80)
+
+    df_obs = pd.read_csv(args.observaciones, low_memory=False)
+    df_trazas = pd.read_csv(args.trazas, low_memory=False) if args.trazas else None
+    print(f"\n📂 Observaciones: {len(df_obs):,}" + (f" | Trazas: {len(df_trazas):,}" if df_trazas is not None else ''))
+    indice = construir_indice(df_obs, df_trazas)
+    print(f"📇 Índice: {len(indice['offsets']):,} trazas en {len(indice['sesiones']):,} sesiones")
+
+    if args.sesion:
+        print(f"\n🧵 Sesión {args.sesion}:")
+        print(linea_tiempo_sesion(indice, args.sesion).round(3).to_string(index=False))
+    else:
+        trace_ids = None
+        if args.sesiones:
+            sesiones = pd.read_csv(args.sesiones)
+            sesiones = sesiones[sesiones['avg_latency'] >= args.min_latencia]['sessionId']
+            trace_ids = [t for s in sesiones for t in indice['sesiones'].get(s, [])]
+            print(f"🔎 Sesiones con latencia promedio ≥ {args.min_latencia}s: {len(sesiones):,} ({len(trace_ids):,} trazas)")
+
+        analisis = analizar_trazas(indice, trace_ids)
+        if analisis.empty:
+            print("⚠️  No hay trazas para analizar")
+        else:
+            imprimir_resumen(resumen_agentes(analisis), analisis['traceId'].nunique())
+            os.makedirs(RUTA_SALIDA, exist_ok=True)
+            analisis.to_csv(os.path.join(RUTA_SALIDA, 'ruta_critica_trazas.csv'), index=False)
+            percentiles_diarios(analisis).to_csv(os.path.join(RUTA_SALIDA, 'ruta_critica_diaria.csv'), index=False)
+            percentiles_pasos(indice).to_csv(os.path.join(RUTA_SALIDA, 'pasos_diarios.csv'), index=False)
+            print(f"\n💾 Resultados en: {RUTA_SALIDA}")
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Modo de consulta aproximada: muestras estratificadas persistentes + intervalos bootstrap.
+
+Para preguntas exploratorias ("¿cómo se movió el P95 del humanizer esta
+semana?") no hace falta cargar todo el histórico de trazas. Este módulo:
+
+1. Construye una muestra estratificada por día × node_type × model (trazas) o
+   por fecha × REGIONAL (df_resultados), con a lo sumo k filas por estrato.
+   Cada fila lleva una clave aleatoria: la muestra de un estrato son las k
+   claves más pequeñas (bottom-k), así que al llegar trazas nuevas la muestra
+   se refresca sin releer el histórico y sigue siendo uniforme.
+2. Persiste la muestra, los tamaños de estrato (N_h) y el hash de los ids ya
+   ingeridos en Archivos/Muestras/. Las exportaciones son acumulativas: al
+   refrescar, las filas cuyo id ya se ingirió se descartan antes de sumar N_h.
+3. Estima media, P95/P99, tasa de error y % de autogestión con pesos N_h/n_h
+   e intervalos de confianza por bootstrap estratificado.
+4. Advierte cuando un grupo tiene muestra insuficiente para el estadístico
+   pedido o cuando el intervalo supera la precisión solicitada.
+
+Uso:
+    python muestreo_aproximado.py muestrear trazas muestra_langfuse.csv --k 200
+    python muestreo_aproximado.py muestrear resultados df_resultados.csv --k 100
+    python muestreo_aproximado.py consultar trazas latency p95 --por week node_type
+    python muestreo_aproximado.py consultar resultados autogestion_acida porcentaje --por week REGIONAL
+
+La muestra se refresca sola al precalcular el tablero (dashboard_latencias.py
+precalcular) y al guardar df_resultados en el flujo semanal.
+"""
+
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+RUTA_MUESTRAS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Muestras'
+)
+
+# Estratos por tipo de fuente
+ESTRATOS = {
+    'trazas': ['date', 'node_type', 'model'],
+    'resultados': ['fecha', 'REGIONAL'],
+}
+# Id único de fila por fuente (para no contar dos veces exportaciones solapadas)
+IDS = {
+    'trazas': 'id',
+    'resultados': 'conversation_id',
+}
+K_POR_DEFECTO = 200
+SEMILLA = 42
+
+# Tamaño mínimo de muestra por grupo según el estadístico
+N_MINIMO_MEDIA = 30
+COLA_MINIMA_CUANTIL = 10  # observaciones esperadas por encima del cuantil
+
+
+# ============================================================
+# PREPARACIÓN DE FUENTES
+# ============================================================
+
+def preparar_trazas(df):
+    """
+    Agrega date, model, node_type y error (0/1) a las trazas.
+
+    Reutiliza la extracción de modelo y errores del tablero local.
+    """
+    from dashboard_latencias import preparar_trazas as _preparar
+
+    df = _preparar(df)
+    if 'date' not in df.columns:
+        time_col = 'startTime' if 'startTime' in df.columns else 'timestamp'
+        df['date'] = pd.to_datetime(df[time_col], format='mixed', errors='coerce').dt.strftime('%Y-%m-%d')
+    return df
+
+
+def preparar_resultados(df):
+    """
+    Agrega las banderas de autogestión a df_resultados (una fila por conversación).
+
+    - autogestion_acida: sin motivo de paso a experto (celda 67: Conecta Retuvo)
+    - autogestion_confirmada: Conecta Retuvo + Puerta experto (no llegó a experto)
+    """
+    df = df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha'], format='mixed', errors='coerce').dt.strftime('%Y-%m-%d')
+    df['REGIONAL'] = df['REGIONAL'].fillna('SIN REGIONAL')
+    motivo = pd.to_numeric(df['motivo_experto_flag'], errors='coerce').fillna(0) > 0
+    experto = pd.to_numeric(df['flg_experto_flag'], errors='coerce').fillna(0) > 0
+    df['autogestion_acida'] = (~motivo).astype(int)
+    df['autogestion_confirmada'] = (~(motivo & experto)).astype(int)
+    return df
+
+
+PREPARADORES = {'trazas': preparar_trazas, 'resultados': preparar_resultados}
+
+
+# ============================================================
+# MUESTRA ESTRATIFICADA PERSISTENTE (bottom-k por estrato)
+# ============================================================
+
+def _rutas(nombre, ruta):
+    return (os.path.join(ruta, f'{nombre}_muestra.csv'),
+            os.path.join(ruta, f'{nombre}_estratos.csv'))
+
+
+def _ruta_ids(nombre, ruta):
+    return os.path.join(ruta, f'{nombre}_ids.npy')
+
+
+def _hash_ids(ids):
+    """
+    Hash uint64 de los ids de fila.
+
+    Los ids numéricos se normalizan a entero (conversation_id llega como
+    float en algunos CSV) para que 123 y 123.0 sean el mismo id.
+    """
+    numericos = pd.to_numeric(ids, errors='coerce')
+    if len(ids) and numericos.notna().all():
+        ids = numericos.astype('int64')
+    return pd.util.hash_array(ids.astype(str).to_numpy(dtype=object))
+
+
+def _ids_ingeridos(nombre, muestra_actual, ruta):
+    """Hashes de los ids ya ingeridos (ordenados); sin archivo se parte de la muestra guardada."""
+    ruta_ids = _ruta_ids(nombre, ruta)
+    if os.path.exists(ruta_ids):
+        return np.load(ruta_ids)
+    if len(muestra_actual):
+        print(f"⚠️  Muestra '{nombre}' sin registro de ids ingeridos: sólo se reconocen los ids muestreados. "
+              f"Regenerarla desde la exportación completa para un N_h exacto.")
+    columna = IDS[nombre]
+    if columna not in muestra_actual.columns:
+        return np.empty(0, dtype=np.uint64)
+    return np.unique(_hash_ids(muestra_actual[columna]))
+
+
+def _bottom_k(df, estratos, k):
+    """Conserva las k filas de menor clave aleatoria en cada estrato."""
+    df = df.sort_values('_clave')
+    return df[df.groupby(estratos, dropna=False).cumcount() < k]
+
+
+def construir_muestra(df, estratos, k=K_POR_DEFECTO, semilla=SEMILLA):
+    """
+    Muestra estratificada sin reemplazo: hasta k filas por estrato.
+
+    Args:
+        df: DataFrame preparado (con las columnas de estrato)
+        estratos: Columnas que definen el estrato
+        k: Máximo de filas por estrato
+        semilla: Semilla del generador de claves aleatorias
+
+    Returns:
+        tuple: (muestra con columna _clave, tamaños de estrato con columna N)
+    """
+    rng = np.random.default_rng(semilla)
+    df = df.assign(_clave=rng.random(len(df)))
+    poblacion = df.groupby(estratos, dropna=False).size().reset_index(name='N')
+    return _bottom_k(df, estratos, k).reset_index(drop=True), poblacion
+
+
+def guardar_muestra(nombre, muestra, poblacion, ruta=RUTA_MUESTRAS):
+    os.makedirs(ruta, exist_ok=True)
+    ruta_muestra, ruta_estratos = _rutas(nombre, ruta)
+    muestra.to_csv(ruta_muestra, index=False)
+    poblacion.to_csv(ruta_estratos, index=False)
+
+
+def cargar_muestra(nombre, ruta=RUTA_MUESTRAS):
+    """
+    Carga una muestra persistida.
+
+    Returns:
+        dict: muestra, poblacion (N por estrato), estratos
+    """
+    ruta_muestra, ruta_estratos = _rutas(nombre, ruta)
+    if not os.path.exists(ruta_muestra):
+        raise FileNotFoundError(
+            f"No existe la muestra '{nombre}' en {ruta}. "
+            f"Generarla con: python muestreo_aproximado.py muestrear {nombre} <csv>"
+        )
+    estratos = ESTRATOS[nombre]
+    tipos = {col: str for col in estratos}
+    return {
+        'muestra': pd.read_csv(ruta_muestra, dtype=tipos, low_memory=False),
+        'poblacion': pd.read_csv(ruta_estratos, dtype=tipos),
+        'estratos': estratos,
+    }
+
+
+def actualizar_muestra(nombre, df_nuevo, k=K_POR_DEFECTO, semilla=None, ruta=RUTA_MUESTRAS):
+    """
+    Refresca la muestra persistida con filas NUEVAS (p. ej. la última exportación de trazas).
+
+    Las filas cuyo id (IDS[nombre]) ya se ingirió se descartan, igual que los
+    ids repetidos dentro de df_nuevo. Las restantes reciben claves aleatorias y
+    compiten con las ya guardadas por los k lugares de su estrato; sus N_h se
+    suman. No se relee el histórico.
+
+    Args:
+        nombre: 'trazas' o 'resultados'
+        df_nuevo: Filas crudas (puede ser una exportación acumulativa que solapa con las anteriores)
+        k: Máximo de filas por estrato
+        semilla: Semilla para las claves de las filas nuevas (None = aleatoria)
+
+    Returns:
+        dict: Muestra actualizada (mismo formato que cargar_muestra)
+    """
+    estratos = ESTRATOS[nombre]
+    try:
+        actual = cargar_muestra(nombre, ruta)
+    except FileNotFoundError:
+        actual = None
+
+    # Sólo filas con id no ingerido antes (ni repetido en esta exportación)
+    vistos = _ids_ingeridos(nombre, actual['muestra'] if actual else pd.DataFrame(), ruta)
+    claves = _hash_ids(df_nuevo[IDS[nombre]])
+    nuevas = ~np.isin(claves, vistos) & ~pd.Series(claves).duplicated().to_numpy()
+    omitidas = len(df_nuevo) - int(nuevas.sum())
+    if omitidas:
+        print(f"   Muestra '{nombre}': {omitidas:,} filas ya ingeridas se omiten")
+
+    nuevo = PREPARADORES[nombre](df_nuevo[nuevas])
+    muestra_nueva, poblacion_nueva = construir_muestra(nuevo, estratos, k, semilla)
+    if actual is None:
+        actual = {'muestra': muestra_nueva.iloc[:0], 'poblacion': poblacion_nueva.iloc[:0]}
+
+    muestra = _bottom_k(pd.concat([actual['muestra'], muestra_nueva], ignore_index=True), estratos, k)
+    poblacion = (
+        pd.concat([actual['poblacion'], poblacion_nueva], ignore_index=True)
+        .groupby(estratos, dropna=False)['N'].sum()
+        .reset_index()
+    )
+    guardar_muestra(nombre, muestra.reset_index(drop=True), poblacion, ruta)
+    np.save(_ruta_ids(nombre, ruta), np.union1d(vistos, claves[nuevas]))
+    return cargar_muestra(nombre, ruta)
+
+
+def cargar_aproximado(nombre, ruta_csv=None, k=K_POR_DEFECTO, ruta=RUTA_MUESTRAS):
+    """
+    Cargador en modo aproximado: usa la muestra persistida; si no existe, la crea desde ruta_csv.
+
+    Returns:
+        dict: muestra, poblacion, estratos
+    """
+    try:
+        return cargar_muestra(nombre, ruta)
+    except FileNotFoundError:
+        if ruta_csv is None:
+            raise
+        return actualizar_muestra(nombre, pd.read_csv(ruta_csv), k=k, semilla=SEMILLA, ruta=ruta)
+
+
+# ============================================================
+# ESTIMACIÓN CON BOOTSTRAP ESTRATIFICADO
+# ============================================================
+
+def _n_minimo(estadistico):
+    if estadistico.startswith('p') and estadistico[1:].isdigit():
+        q = int(estadistico[1:]) / 100
+        return math.ceil(COLA_MINIMA_CUANTIL / (1 - q))
+    return N_MINIMO_MEDIA
+
+
+def _estadistico_ponderado(valores, pesos, estadistico):
+    """
+    Estadístico ponderado por fila (vectorizado sobre la primera dimensión).
+
+    Args:
+        valores, pesos: arreglos (B, n)
+        estadistico: 'media', 'tasa', 'porcentaje' o 'pXX'
+    """
+    if estadistico in ('media', 'tasa', 'porcentaje'):
+        resultado = (valores * pesos).sum(axis=1) / pesos.sum(axis=1)
+        return resultado * 100 if estadistico == 'porcentaje' else resultado
+    if estadistico.startswith('p') and estadistico[1:].isdigit():
+        q = int(estadistico[1:]) / 100
+        orden = np.argsort(valores, axis=1)
+        v = np.take_along_axis(valores, orden, axis=1)
+        acumulado = np.cumsum(np.take_along_axis(pesos, orden, axis=1), axis=1)
+        posicion = (acumulado >= q * acumulado[:, -1:]).argmax(axis=1)
+        return v[np.arange(len(v)), posicion]
+    raise ValueError(f"Estadístico no soportado: {estadistico!r} (media, tasa, porcentaje, pXX)")
+
+
+def estimar(muestra, poblacion, estratos, columna, estadistico, n_bootstrap=500, nivel=0.95,
+            precision_relativa=0.10, semilla=SEMILLA):
+    """
+    Estimación ponderada con intervalo de confianza por bootstrap estratificado.
+
+    Args:
+        muestra: Filas muestreadas (ya filtradas al dominio de interés)
+        poblacion: N por estrato
+        estratos: Columnas de estrato
+        columna: Medida (p. ej. 'latency', 'error', 'autogestion_acida')
+        estadistico: 'media', 'tasa', 'porcentaje' o 'pXX' (p50, p95, p99...)
+        n_bootstrap: Réplicas bootstrap
+        nivel: Nivel de confianza del intervalo
+        precision_relativa: Semiamplitud máxima aceptada relativa a la estimación
+
+    Returns:
+        dict: estimacion, ic_inf, ic_sup, n_muestra, N_poblacion, exacto, advertencias
+    """
+    datos = muestra[estratos + [columna]].copy()
+    datos[columna] = pd.to_numeric(datos[columna], errors='coerce')
+    datos = datos.dropna(subset=[columna])
+
+    advertencias = []
+    if datos.empty:
+        return {'estimacion': np.nan, 'ic_inf': np.nan, 'ic_sup': np.nan, 'n_muestra': 0,
+                'N_poblacion': 0, 'exacto': False, 'advertencias': ['Sin datos en la muestra para el filtro']}
+
+    # Peso de cada fila = N_h / n_h
+    tamanos = datos.groupby(estratos, dropna=False).size().reset_index(name='n')
+    tamanos = tamanos.merge(poblacion, on=estratos, how='left')
+    tamanos['N'] = tamanos['N'].fillna(tamanos['n'])
+    datos = datos.merge(tamanos, on=estratos, how='left').sort_values(estratos, kind='stable')
+    valores = datos[columna].to_numpy(dtype=float)
+    pesos = (datos['N'] / datos['n']).to_numpy(dtype=float)
+
+    estimacion = _estadistico_ponderado(valores[None, :], pesos[None, :], estadistico)[0]
+    exacto = bool((tamanos['n'] >= tamanos['N']).all())
+    n_muestra, n_poblacion = len(datos), int(tamanos['N'].sum())
+
+    if exacto:
+        ic_inf = ic_sup = estimacion
+    else:
+        # Bootstrap estratificado: se remuestrea con reemplazo dentro de cada estrato
+        rng = np.random.default_rng(semilla)
+        codigos = datos.groupby(estratos, dropna=False, sort=False).ngroup().to_numpy()
+        n_h = np.bincount(codigos)
+        inicio = (np.cumsum(n_h) - n_h)[codigos]
+        tam = n_h[codigos]
+        replicas = []
+        lote = max(1, 5_000_000 // max(n_muestra, 1))
+        for desde in range(0, n_bootstrap, lote):
+            b = min(lote, n_bootstrap - desde)
+            indices = inicio + np.floor(rng.random((b, n_muestra)) * tam).astype(np.int64)
+            replicas.append(_estadistico_ponderado(valores[indices], np.broadcast_to(pesos, (b, n_muestra)), estadistico))
+        replicas = np.concatenate(replicas)
+        alfa = (1 - nivel) / 2
+        ic_inf, ic_sup = np.quantile(replicas, [alfa, 1 - alfa])
+
+        n_min = _n_minimo(estadistico)
+        if n_muestra < n_min:
+            advertencias.append(
+                f"Muestra insuficiente para {estadistico}: n={n_muestra} < {n_min}. "
+                f"Aumentar k o usar el modo completo."
+            )
+        pequenos = tamanos[(tamanos['n'] < 2) & (tamanos['n'] < tamanos['N'])]
+        if len(pequenos):
+            advertencias.append(
+                f"{len(pequenos)} estrato(s) con 1 fila muestreada: su variabilidad no se refleja en el IC."
+            )
+        if estimacion and abs((ic_sup - ic_inf) / 2 / estimacion) > precision_relativa:
+            advertencias.append(
+                f"IC más ancho que la precisión pedida (±{precision_relativa:.0%}): "
+                f"[{ic_inf:.4g}, {ic_sup:.4g}]"
+            )
+
+    return {'estimacion': estimacion, 'ic_inf': ic_inf, 'ic_sup': ic_sup, 'n_muestra': n_muestra,
+            'N_poblacion': n_poblacion, 'exacto': exacto, 'advertencias': advertencias}
+
+
+def _aplicar_filtros(df, filtros):
+    if not filtros:
+        return df
+    mascara = pd.Series(True, index=df.index)
+    for columna, valor in filtros.items():
+        if isinstance(valor, (list, tuple, set)):
+            mascara &= df[columna].isin(valor)
+        else:
+            mascara &= df[columna] == valor
+    return df[mascara]
+
+
+def consultar(fuente, columna, estadistico, por=None, filtros=None, desde=None, hasta=None, **opciones):
+    """
+    Consulta aproximada agrupada con IC por grupo.
+
+    Args:
+        fuente: dict de cargar_muestra / cargar_aproximado
+        columna: Medida a estimar
+        estadistico: 'media', 'tasa', 'porcentaje' o 'pXX'
+        por: Columnas de agrupación (admite 'week', derivada de la fecha del estrato)
+        filtros: {columna: valor o lista}
+        desde, hasta: Rango de fechas 'YYYY-MM-DD' sobre la fecha del estrato
+        **opciones: n_bootstrap, nivel, precision_relativa
+
+    Returns:
+        DataFrame: grupo, estimacion, ic_inf, ic_sup, n_muestra, N_poblacion, exacto, advertencias
+    """
+    estratos = fuente['estratos']
+    col_fecha = estratos[0]
+    muestra, poblacion = fuente['muestra'], fuente['poblacion']
+
+    def con_semana(df):
+        fechas = pd.to_datetime(df[col_fecha], errors='coerce')
+        return df.assign(week=(fechas - pd.to_timedelta(fechas.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d'))
+
+    muestra, poblacion = con_semana(muestra), con_semana(poblacion)
+    if desde:
+        muestra, poblacion = muestra[muestra[col_fecha] >= desde], poblacion[poblacion[col_fecha] >= desde]
+    if hasta:
+        muestra, poblacion = muestra[muestra[col_fecha] <= hasta], poblacion[poblacion[col_fecha] <= hasta]
+    muestra = _aplicar_filtros(muestra, filtros)
+
+    por = list(por or [])
+    grupos = muestra.groupby(por, dropna=False) if por else [((), muestra)]
+    filas = []
+    for clave, grupo in grupos:
+        resultado = estimar(grupo, poblacion, estratos, columna, estadistico, **opciones)
+        clave = clave if isinstance(clave, tuple) else (clave,)
+        filas.append({**dict(zip(por, clave)), **resultado,
+                      'advertencias': ' | '.join(resultado['advertencias'])})
+    return pd.DataFrame(filas)
+
+
+def imprimir_consulta(tabla, columna, estadistico):
+    print(f"\n📊 {estadistico} de {columna} (modo aproximado):")
+    for _, fila in tabla.iterrows():
+        grupo = ' / '.join(str(fila[c]) for c in tabla.columns
+                           if c not in ('estimacion', 'ic_inf', 'ic_sup', 'n_muestra', 'N_poblacion', 'exacto', 'advertencias'))
+        marca = ' (exacto)' if fila['exacto'] else ''
+        print(f"   {grupo or 'Total':<40} {fila['estimacion']:.4g} "
+              f"[{fila['ic_inf']:.4g}, {fila['ic_sup']:.4g}]  n={fila['n_muestra']:,}/{fila['N_poblacion']:,}{marca}")
+        if fila['advertencias']:
+            print(f"      ⚠️  {fila['advertencias']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consultas aproximadas con muestras estratificadas')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_m = sub.add_parser('muestrear', help='Crea o refresca la muestra con filas nuevas')
+    p_m.add_argument('fuente', choices=list(ESTRATOS))
+    p_m.add_argument('csv')
+    p_m.add_argument('--k', type=int, default=K_POR_DEFECTO)
+    p_c = sub.add_parser('consultar', help='Estimación con IC bootstrap')
+    p_c.add_argument('fuente', choices=list(ESTRATOS))
+    p_c.add_argument('columna')
+    p_c.add_argument('estadistico')
+    p_c.add_argument('--por', nargs='*', default=[])
+    p_c.add_argument('--desde')
+    p_c.add_argument('--hasta')
+    p_c.add_argument('--node_type')
+    p_c.add_argument('--model')
+    p_c.add_argument('--regional')
+    p_c.add_argument('--precision', type=float, default=0.10)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("MODO APROXIMADO: MUESTRAS ESTRATIFICADAS E INTERVALOS BOOTSTRAP")
+    print("=" * 80)
+
+    if args.comando == 'muestrear':
+        fuente = actualizar_muestra(args.fuente, pd.read_csv(args.csv), k=args.k)
+        print(f"\n✅ Muestra '{args.fuente}': {len(fuente['muestra']):,} filas de "
+              f"{int(fuente['poblacion']['N'].sum()):,} ({len(fuente['poblacion']):,} estratos) en {RUTA_MUESTRAS}")
+    else:
+        fuente = cargar_muestra(args.fuente)
+        filtros = {col: valor for col, valor in (('node_type', args.node_type), ('model', args.model),
+                                                  ('REGIONAL', args.regional)) if valor}
+        tabla = consultar(fuente, args.columna, args.estadistico, por=args.por, filtros=filtros,
+                          desde=args.desde, hasta=args.hasta, precision_relativa=args.precision)
+        imprimir_consulta(tabla, args.columna, args.estadistico)
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Pre-clasificador local (reglas + TF-IDF/regresión logística) delante de classify_with_gemini.
+
+Las interacciones cuya etiqueta es predecible se etiquetan localmente en
+microsegundos; sólo las de baja confianza se envían al LLM. El modelo se
+entrena offline con las etiquetas históricas (resultados_paralelo_parcial.csv,
+columna category) unidas a las interacciones por conversation_id + orden
+dentro de la conversación, igual que la auditoría del flujo.
+
+- Reglas: respuesta vacía o "no encontré información" -> 'Sin información',
+  petición de asesor -> 'Solicitud Paso Experto', pregunta vacía ->
+  'Pregunta no valida'. Cada regla sólo se activa si su precisión contra las
+  etiquetas históricas alcanza UMBRAL_REGLAS.
+- Modelo: TF-IDF de unigramas y bigramas (pregunta y respuesta por separado) +
+  regresión logística multiclase entrenada con numpy (CPU, sin dependencias).
+- Reporte: cobertura local, precisión y desvío del embudo (% No Gestionada
+  Conecta por conversación) sobre un conjunto de prueba por conversación.
+
+Uso:
+    python preclasificador.py entrenar interacciones.csv resultados_paralelo_parcial.csv [--umbral 0.95]
+    python preclasificador.py info
+"""
+
+import argparse
+import json
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+RUTA_MODELO = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'Archivos', 'Preclasificador'
+)
+
+UMBRAL_POR_DEFECTO = 0.95
+UMBRAL_REGLAS = 0.95
+TOLERANCIA_EMBUDO_PP = 0.5
+UMBRALES_REPORTE = (0.80, 0.85, 0.90, 0.95, 0.97, 0.99)
+CATEGORIAS_NO_GESTIONADA = {'Sin información', 'Solicitud Paso Experto', 'Pregunta no valida'}
+
+PATRON_SIN_INFORMACION = re.compile(
+    r'no (encontre|encuentro|tengo|cuento con|dispongo de|hay) (la )?informacion'
+)
+PATRON_ASESOR = re.compile(
+    r'\b(asesor|asesora|asesores|humano|ejecutivo|persona real|'
+    r'hablar con (un|una|el|la)? ?(persona|agente|experto))\b'
+)
+
+# Regla -> (categoría, condición sobre pregunta/respuesta normalizadas)
+REGLAS = {
+    'pregunta_vacia': ('Pregunta no valida', lambda p, r: not p),
+    'respuesta_vacia': ('Sin información', lambda p, r: not r),
+    'respuesta_sin_informacion': ('Sin información', lambda p, r: bool(PATRON_SIN_INFORMACION.search(r))),
+    'pide_asesor': ('Solicitud Paso Experto', lambda p, r: bool(PATRON_ASESOR.search(p))),
+}
+
+MIN_DF = 2
+MAX_TERMINOS = 50000
+MAX_CARACTERES_RESPUESTA = 400
+SESGO = '__sesgo__'
+PREFIJO_RATIONALE = 'Preclasificador local'
+
+
+# ============================================================
+# TEXTO Y REGLAS
+# ============================================================
+
+def normalizar(texto):
+    """Minúsculas sin tildes; nulos y marcadores '[... vacía]' -> ''."""
+    if texto is None or (isinstance(texto, float) and np.isnan(texto)):
+        return ''
+    texto = str(texto).strip().lower()
+    if texto in ('', 'nan', '[pregunta vacía]', '[respuesta vacía]'):
+        return ''
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def aplicar_reglas(pregunta, respuesta, reglas_activas=None):
+    """
+    Devuelve (categoria, regla) de la primera regla que aplica, o (None, None).
+
+    Args:
+        pregunta, respuesta: Texto normalizado
+        reglas_activas: Nombres de reglas habilitadas (None = todas)
+    """
+    for nombre, (categoria, condicion) in REGLAS.items():
+        if reglas_activas is not None and nombre not in reglas_activas:
+            continue
+        if condicion(pregunta, respuesta):
+            return categoria, nombre
+    return None, None
+
+
+def _tokens(texto, prefijo):
+    palabras = re.findall(r'[a-z0-9ñ]{2,}', texto)
+    if not palabras:
+        return [f'{prefijo}:__vacia__']
+    bigramas = [f'{a}_{b}' for a, b in zip(palabras, palabras[1:])]
+    return [f'{prefijo}:{t}' for t in palabras + bigramas]
+
+
+def _documento(pregunta, respuesta):
+    return _tokens(pregunta, 'p') + _tokens(respuesta[:MAX_CARACTERES_RESPUESTA], 'r') + [SESGO]
+
+
+# ============================================================
+# TF-IDF + REGRESIÓN LOGÍSTICA (matriz dispersa CSR en numpy)
+# ============================================================
+
+def _matriz(documentos, vocabulario, idf):
+    """Construye la matriz TF-IDF normalizada (L2) en formato CSR: (indptr, indices, datos)."""
+    indptr, indices, datos = [0], [], []
+    for doc in documentos:
+        conteo = Counter(vocabulario[t] for t in doc if t in vocabulario)
+        ids = np.fromiter(conteo.keys(), dtype=np.int64, count=len(conteo))
+        pesos = np.fromiter(conteo.values(), dtype=float, count=len(conteo)) * idf[ids]
+        pesos /= np.linalg.norm(pesos)
+        indices.append(ids)
+        datos.append(pesos)
+        indptr.append(indptr[-1] + len(ids))
+    return np.asarray(indptr), np.concatenate(indices), np.concatenate(datos)
+
+
+def _puntajes(X, W):
+    indptr, indices, datos = X
+    return np.add.reduceat(datos[:, None] * W[indices], indptr[:-1], axis=0)
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _ajustar_logistica(X, y, n_clases, n_terminos, iteraciones=300, tasa=1.0, l2=1e-4):
+    """Regresión logística multiclase por descenso de gradiente (Adagrad, lote completo)."""
+    indptr, indices, datos = X
+    filas = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    Y = np.eye(n_clases)[y]
+    W = np.zeros((n_terminos, n_clases))
+    acumulado = np.full_like(W, 1e-8)
+    for _ in range(iteraciones):
+        G = (_softmax(_puntajes(X, W)) - Y) / len(y)
+        grad = l2 * W
+        for k in range(n_clases):
+            grad[:, k] += np.bincount(indices, weights=datos * G[filas, k], minlength=n_terminos)
+        acumulado += grad ** 2
+        W -= tasa * grad / np.sqrt(acumulado)
+    return W
+
+
+# ============================================================
+# ENTRENAMIENTO Y PREDICCIÓN
+# ============================================================
+
+def unir_etiquetas(df_interacciones, df_etiquetas, columna_id='fk_tbl_conversaciones_conecta2'):
+    """
+    Une etiquetas (conversation_id, category) a interacciones por id + orden en la conversación.
+
+    Las etiquetas puestas por el propio pre-clasificador se descartan después de
+    numerar, para no reentrenar con sus propias predicciones.
+
+    Returns:
+        DataFrame: conversation_id, pregunta, respuesta, category
+    """
+    etiquetas = df_etiquetas.copy()
+    etiquetas['merge_idx'] = etiquetas.groupby('conversation_id').cumcount()
+    if 'rationale' in etiquetas.columns:
+        etiquetas = etiquetas[~etiquetas['rationale'].astype(str).str.startswith(PREFIJO_RATIONALE)]
+    interacciones = df_interacciones[[columna_id, 'pregunta', 'respuesta']].copy()
+    interacciones['merge_idx'] = interacciones.groupby(columna_id).cumcount()
+    unidas = etiquetas.merge(
+        interacciones, left_on=['conversation_id', 'merge_idx'],
+        right_on=[columna_id, 'merge_idx'], how='inner'
+    )
+    return unidas[['conversation_id', 'pregunta', 'respuesta', 'category']].reset_index(drop=True)
+
+
+def _textos(df):
+    return [normalizar(p) for p in df['pregunta']], [normalizar(r) for r in df['respuesta']]
+
+
+def entrenar(df, umbral=UMBRAL_POR_DEFECTO, umbral_reglas=UMBRAL_REGLAS):
+    """
+    Entrena reglas + modelo con interacciones etiquetadas.
+
+    Args:
+        df: DataFrame con pregunta, respuesta, category
+        umbral: Confianza mínima del modelo para etiquetar localmente
+        umbral_reglas: Precisión mínima (contra las etiquetas) para activar una regla
+
+    Returns:
+        dict: Modelo (vocabulario, idf, W, clases, reglas_activas, umbral)
+    """
+    preguntas, respuestas = _textos(df)
+    categorias = df['category'].astype(str).str.strip().to_numpy()
+
+    # Reglas: se activan sólo si las etiquetas históricas las respaldan
+    reglas_activas, precision_reglas = [], {}
+    for nombre, (categoria, condicion) in REGLAS.items():
+        aplica = np.array([condicion(p, r) for p, r in zip(preguntas, respuestas)])
+        if aplica.any():
+            precision = float((categorias[aplica] == categoria).mean())
+            precision_reglas[nombre] = {'aplica': int(aplica.sum()), 'precision': precision}
+            if precision >= umbral_reglas:
+                reglas_activas.append(nombre)
+
+    documentos = [_documento(p, r) for p, r in zip(preguntas, respuestas)]
+    frecuencia = Counter(t for doc in documentos for t in set(doc))
+    terminos = [t for t, n in frecuencia.most_common(MAX_TERMINOS) if n >= MIN_DF or t == SESGO]
+    vocabulario = {t: i for i, t in enumerate(terminos)}
+    idf = np.log((1 + len(documentos)) / (1 + np.array([frecuencia[t] for t in terminos]))) + 1
+
+    clases = sorted(set(categorias))
+    y = np.searchsorted(clases, categorias)
+    W = _ajustar_logistica(_matriz(documentos, vocabulario, idf), y, len(clases), len(terminos))
+
+    return {'terminos': terminos, 'vocabulario': vocabulario, 'idf': idf, 'W': W, 'clases': clases,
+            'reglas_activas': reglas_activas, 'precision_reglas': precision_reglas, 'umbral': umbral}
+
+
+def predecir(modelo, df, umbral=None):
+    """
+    Etiqueta localmente y marca qué filas deben ir al LLM.
+
+    Args:
+        modelo: Modelo de entrenar / cargar_modelo
+        df: DataFrame con pregunta y respuesta
+        umbral: Confianza mínima (None = la del modelo)
+
+    Returns:
+        DataFrame (mismo índice): categoria_local, confianza_local, origen_local, enviar_llm
+    """
+    umbral = modelo['umbral'] if umbral is None else umbral
+    preguntas, respuestas = _textos(df)
+    X = _matriz([_documento(p, r) for p, r in zip(preguntas, respuestas)], modelo['vocabulario'], modelo['idf'])
+    probabilidades = _softmax(_puntajes(X, modelo['W']))
+    categoria = np.asarray(modelo['clases'], dtype=object)[probabilidades.argmax(axis=1)]
+    confianza = probabilidades.max(axis=1)
+    origen = np.full(len(df), 'modelo', dtype=object)
+
+    for i, (p, r) in enumerate(zip(preguntas, respuestas)):
+        categoria_regla, regla = aplicar_reglas(p, r, modelo['reglas_activas'])
+        if regla:
+            categoria[i], confianza[i], origen[i] = categoria_regla, 1.0, f'regla:{regla}'
+
+    return pd.DataFrame({
+        'categoria_local': categoria,
+        'confianza_local': confianza,
+        'origen_local': origen,
+        'enviar_llm': confianza < umbral,
+    }, index=df.index)
+
+
+def anotar_pendientes(modelo, pendientes, umbral=None):
+    """Agrega a las interacciones pendientes las columnas de predecir()."""
+    return pendientes.join(predecir(modelo, pendientes, umbral))
+
+
+def resultado_local(row):
+    """Resultado con el mismo formato que classify_with_gemini para una fila anotada."""
+    return {
+        'conversation_id': int(row['fk_tbl_conversaciones_conecta2']),
+        'category': row['categoria_local'],
+        'rationale': f"{PREFIJO_RATIONALE} ({row['origen_local']}, confianza {row['confianza_local']:.2f})",
+    }
+
+
+# ============================================================
+# REPORTE DE PRECISIÓN
+# ============================================================
+
+def _tasa_no_gestionada(conversation_id, categorias):
+    no_gestionada = pd.Series(np.isin(categorias, list(CATEGORIAS_NO_GESTIONADA)))
+    return no_gestionada.groupby(np.asarray(conversation_id)).any().mean() * 100
+
+
+def reporte_precision(modelo, df_prueba, umbrales=UMBRALES_REPORTE):
+    """
+    Compara las etiquetas locales con las históricas para varios umbrales.
+
+    Las filas enviadas al LLM se suponen etiquetadas como en el histórico, así
+    que el desvío del embudo se debe sólo a errores del pre-clasificador.
+
+    Returns:
+        DataFrame: umbral, cobertura_local (%), precision_local (%),
+                   desvio_no_gestionada_pp, desvio_max_categoria_pp
+    """
+    reales = df_prueba['category'].astype(str).str.strip().to_numpy()
+    base_no_gestionada = _tasa_no_gestionada(df_prueba['conversation_id'], reales)
+    base_dist = pd.Series(reales).value_counts(normalize=True)
+    filas = []
+    for umbral in umbrales:
+        pred = predecir(modelo, df_prueba, umbral)
+        local = ~pred['enviar_llm'].to_numpy()
+        finales = np.where(local, pred['categoria_local'].to_numpy(), reales)
+        dist = pd.Series(finales).value_counts(normalize=True)
+        filas.append({
+            'umbral': umbral,
+            'cobertura_local': local.mean() * 100,
+            'precision_local': (finales[local] == reales[local]).mean() * 100 if local.any() else np.nan,
+            'desvio_no_gestionada_pp': _tasa_no_gestionada(df_prueba['conversation_id'], finales) - base_no_gestionada,
+            'desvio_max_categoria_pp': dist.sub(base_dist, fill_value=0).abs().max() * 100,
+        })
+    return pd.DataFrame(filas)
+
+
+def umbral_recomendado(reporte, tolerancia_pp=TOLERANCIA_EMBUDO_PP):
+    """Menor umbral (mayor cobertura) cuyo desvío del embudo está dentro de la tolerancia."""
+    dentro = reporte[(reporte['desvio_no_gestionada_pp'].abs() <= tolerancia_pp)
+                     & (reporte['desvio_max_categoria_pp'] <= tolerancia_pp)]
+    return float(dentro['umbral'].min()) if len(dentro) else None
+
+
+def separar_prueba(df, fraccion=0.2):
+    """Separa por conversation_id (hash estable) para no mezclar interacciones de una conversación."""
+    cubeta = df['conversation_id'].map(lambda c: zlib.crc32(str(c).encode()) % 100)
+    prueba = cubeta < fraccion * 100
+    return df[~prueba], df[prueba]
+
+
+def imprimir_reporte(modelo, reporte):
+    print(f"\n📋 Reglas (precisión contra etiquetas históricas, activas si ≥ {UMBRAL_REGLAS:.0%}):")
+    for nombre, m in modelo['precision_reglas'].items():
+        estado = '✅' if nombre in modelo['reglas_activas'] else '❌'
+        print(f"   {estado} {nombre:<28} aplica a {m['aplica']:,} | precisión {m['precision']:.1%}")
+    print(f"\n📊 Reporte sobre conjunto de prueba:")
+    print(f"   {'Umbral':>7} {'Local %':>8} {'Precisión %':>12} {'Δ NoGest pp':>12} {'Δ máx cat pp':>13}")
+    for _, f in reporte.iterrows():
+        print(f"   {f['umbral']:>7.2f} {f['cobertura_local']:>8.1f} {f['precision_local']:>12.1f} "
+              f"{f['desvio_no_gestionada_pp']:>12.2f} {f['desvio_max_categoria_pp']:>13.2f}")
+
+
+# ============================================================
+# PERSISTENCIA
+# ============================================================
+
+def guardar_modelo(modelo, ruta=RUTA_MODELO, metricas=None):
+    os.makedirs(ruta, exist_ok=True)
+    np.savez_compressed(os.path.join(ruta, 'modelo.npz'), W=modelo['W'], idf=modelo['idf'])
+    meta = {k: modelo[k] for k in ('terminos', 'clases', 'reglas_activas', 'precision_reglas', 'umbral')}
+    meta['umbral_recomendado'] = modelo.get('umbral_recomendado')
+    meta['metricas'] = metricas
+    with open(os.path.join(ruta, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def cargar_modelo(ruta=RUTA_MODELO):
+    """
+    Carga el modelo persistido.
+
+    Returns:
+        dict: Modelo, o None si aún no se ha entrenado
+    """
+    ruta_meta = os.path.join(ruta, 'modelo.json')
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, encoding='utf-8') as f:
+        modelo = json.load(f)
+    arreglos = np.load(os.path.join(ruta, 'modelo.npz'))
+    modelo.update(W=arreglos['W'], idf=arreglos['idf'],
+                  vocabulario={t: i for i, t in enumerate(modelo['terminos'])})
+    return modelo
+
+
+def entrenar_y_reportar(df_etiquetado, umbral=UMBRAL_POR_DEFECTO, ruta=RUTA_MODELO):
+    """
+    Entrena con el 80% de las conversaciones, reporta sobre el 20% restante y
+    guarda el modelo reentrenado con todas las etiquetas.
+
+    El umbral recomendado (None si ninguno cumple la tolerancia del embudo) se
+    guarda en modelo['umbral_recomendado'].
+
+    Returns:
+        tuple: (modelo, reporte)
+    """
+    entrenamiento, prueba = separar_prueba(df_etiquetado)
+    print(f"📚 Entrenamiento: {len(entrenamiento):,} interacciones | Prueba: {len(prueba):,}")
+    reporte = reporte_precision(entrenar(entrenamiento, umbral), prueba)
+
+    modelo = entrenar(df_etiquetado, umbral)
+    imprimir_reporte(modelo, reporte)
+    recomendado = umbral_recomendado(reporte)
+    modelo['umbral_recomendado'] = recomendado
+    print(f"\n💡 Umbral recomendado (desvío ≤ {TOLERANCIA_EMBUDO_PP} pp): {recomendado}")
+
+    guardar_modelo(modelo, ruta, metricas=reporte.to_dict(orient='records'))
+    print(f"💾 Modelo guardado en: {ruta}")
+    return modelo, reporte
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-clasificador local delante de Gemini')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_e = sub.add_parser('entrenar', help='Entrena y reporta precisión sobre etiquetas históricas')
+    p_e.add_argument('interacciones', help='CSV con fk_tbl_conversaciones_conecta2, pregunta, respuesta')
+    p_e.add_argument('etiquetas', help='CSV con conversation_id, category')
+    p_e.add_argument('--umbral', type=float, default=UMBRAL_POR_DEFECTO)
+    sub.add_parser('info', help='Muestra reglas y métricas del modelo guardado')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("PRE-CLASIFICADOR LOCAL")
+    print("=" * 80)
+
+    if args.comando == 'entrenar':
+        df_etiquetado = unir_etiquetas(pd.read_csv(args.interacciones), pd.read_csv(args.etiquetas))
+        entrenar_y_reportar(df_etiquetado, args.umbral)
+    else:
+        modelo = cargar_modelo()
+        if modelo is None:
+            print("❌ No hay modelo entrenado. Usar: python preclasificador.py entrenar ...")
+        else:
+            imprimir_reporte(modelo, pd.DataFrame(modelo['metricas']))
+            print(f"\n   Umbral configurado: {modelo['umbral']} | recomendado: {modelo.get('umbral_recomendado')}")
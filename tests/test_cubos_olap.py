@@ -0,0 +1,66 @@
+"""
+Roll-ups del cubo OLAP: el resultado no depende de qué ancestros estén en caché.
+
+Uso:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cubos_olap import build_base_cube, query_cube  # noqa: E402
+
+METRICAS = ['latency_n', 'latency_sum', 'latency_max', 'latency_p95']
+
+
+@pytest.fixture
+def generaciones():
+    """Generaciones sintéticas con model nulo en parte de las filas (nodos sin LLM)."""
+    rng = np.random.default_rng(7)
+    n = 2000
+    return pd.DataFrame({
+        'startTime': pd.Timestamp('2025-11-10') + pd.to_timedelta(rng.integers(0, 14 * 86400, n), unit='s'),
+        'node_type': rng.choice(['humanizer', 'router', None], n, p=[0.5, 0.4, 0.1]),
+        'model': rng.choice(['gpt-4.1-mini', 'gemini-2.0-flash', None], n, p=[0.4, 0.3, 0.3]),
+        'latency': rng.exponential(2.0, n),
+    })
+
+
+def _ordenar(tabla, dims):
+    return tabla.sort_values(dims, na_position='last').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('dims, previas', [
+    (['node_type'], [['node_type', 'model']]),
+    (['node_type'], [['node_type', 'model', 'date']]),
+    (['model'], [['model', 'hour'], ['node_type', 'model']]),
+    (['date'], [['date', 'node_type', 'model']]),
+    (['week', 'node_type'], [['week', 'node_type', 'model']]),
+])
+def test_rollup_independiente_de_la_cache(generaciones, dims, previas):
+    directo = query_cube(build_base_cube(generaciones), dims, METRICAS)
+
+    cubo = build_base_cube(generaciones)
+    for anterior in previas:
+        query_cube(cubo, anterior, METRICAS)
+    desde_cache = query_cube(cubo, dims, METRICAS)
+
+    pd.testing.assert_frame_equal(_ordenar(desde_cache, dims), _ordenar(directo, dims))
+    assert desde_cache['total_calls'].sum() == len(generaciones)
+
+
+def test_grupo_nulo_conserva_las_llamadas(generaciones):
+    cubo = build_base_cube(generaciones)
+    query_cube(cubo, ['node_type', 'model'], METRICAS)
+    tabla = query_cube(cubo, ['model'], ['latency_n'])
+
+    esperado = generaciones['model'].value_counts(dropna=False)
+    obtenido = tabla.set_index('model')['total_calls']
+    assert obtenido.loc[obtenido.index.isna()].iloc[0] == esperado.loc[esperado.index.isna()].iloc[0]
+    assert obtenido.sum() == len(generaciones)